@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Fleet-scale benchmark for the patch management scripts
+
+Runs each scenario against a FleetSimulator region and reports wall time,
+API calls (and how many were throttled) and peak Python memory from
+tracemalloc:
+
+1. EC2PatchManager.generate_patch_report over iter_instances()
+2. generate_patch_compliance_report without a cache
+3. generate_patch_compliance_report with a warm patch state cache, checked
+   by the ExecutionTime sweep, then trusted by --max-age and by
+   --trust-events instead
+4. generate_patch_compliance_report in summary mode
+
+Console output from the scripts goes to /dev/null. Fleet size, simulated
+API quota and latency are set with the environment variables below.
+Requires boto3/botocore; no AWS calls are made.
+"""
+
+import contextlib
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(BENCH_DIR, '..', 'scripts')
+
+FLEET_SIZES = [int(size) for size in os.environ.get('FLEET_SIZES', '10000').split(',')]
+API_TPS = float(os.environ.get('API_TPS', '40'))
+LATENCY_MS = float(os.environ.get('LATENCY_MS', '20'))
+WORKERS = int(os.environ.get('WORKERS', '8'))
+RATE = float(os.environ.get('RATE', '40'))
+SEED = int(os.environ.get('SEED', '42'))
+
+sys.path.insert(0, SCRIPTS_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fleet_simulator import FleetSimulator  # noqa: E402
+from ec2_patch_manager import EC2PatchManager  # noqa: E402
+from patch_compliance_reporter import generate_patch_compliance_report  # noqa: E402
+
+
+def measure(simulator, func):
+    """Run func with stdout discarded; returns (seconds, peak bytes, calls, throttled)"""
+    simulator.reset_counters()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        tracemalloc.start()
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return elapsed, peak, dict(simulator.calls), dict(simulator.throttled)
+
+
+def run_patch_manager(simulator):
+    manager = EC2PatchManager(workers=WORKERS, rate=RATE, session=simulator.session())
+    manager.generate_patch_report(manager.iter_instances())
+
+
+def run_reporter(simulator, cache_path=None, summary_only=False, max_age=0, trust_events=False):
+    generate_patch_compliance_report(workers=WORKERS, rate=RATE, cache_path=cache_path, max_age=max_age,
+                                     history_path=None, session=simulator.session(),
+                                     summary_only=summary_only, trust_events=trust_events)
+
+
+def main():
+    print(f"Simulated API quota {API_TPS:.0f} TPS per API, {LATENCY_MS:.0f} ms latency; "
+          f"{WORKERS} workers at {RATE:.0f} calls/sec")
+    print(f"\n{'Scenario':<28} {'Instances':>9} {'Wall s':>8} {'API calls':>10} "
+          f"{'Throttled':>10} {'Peak MiB':>9}")
+
+    breakdowns = []
+    for size in FLEET_SIZES:
+        simulator = FleetSimulator(size, seed=SEED, api_tps=API_TPS, latency_ms=LATENCY_MS)
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_path = os.path.join(tmp, 'patch_states.db')
+            scenarios = [
+                ('ec2_patch_manager report', lambda: run_patch_manager(simulator)),
+                ('compliance report', lambda: run_reporter(simulator)),
+                ('compliance report (cached)', lambda: run_reporter(simulator, cache_path)),
+                ('cached, --max-age 3600', lambda: run_reporter(simulator, cache_path, max_age=3600)),
+                ('cached, --trust-events', lambda: run_reporter(simulator, cache_path, trust_events=True)),
+                ('compliance summary', lambda: run_reporter(simulator, summary_only=True))
+            ]
+            # Populate the cache so the cached scenario measures a repeat run
+            measure(simulator, lambda: run_reporter(simulator, cache_path))
+
+            for name, func in scenarios:
+                elapsed, peak, calls, throttled = measure(simulator, func)
+                print(f"{name:<28} {size:>9} {elapsed:>8.1f} {sum(calls.values()):>10} "
+                      f"{sum(throttled.values()):>10} {peak / 1024 / 1024:>9.1f}")
+                breakdowns.append((name, size, calls))
+
+    print("\nAPI calls by operation:")
+    for name, size, calls in breakdowns:
+        detail = ', '.join(f"{op} {count}" for op, count in sorted(calls.items()))
+        print(f"   {name} ({size}): {detail}")
+
+
+if __name__ == "__main__":
+    main()
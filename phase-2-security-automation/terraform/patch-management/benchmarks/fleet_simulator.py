@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""
+Simulated EC2/SSM fleet for offline patch management testing
+
+FleetSimulator synthesises a region of N instances (10k-100k is fine)
+and hands out fake ec2/ssm/sts clients through FakeSession, which the
+scripts accept in place of a boto3 session. The fakes enforce the real API
+page and batch limits (raising ValidationException when exceeded), return
+NextToken pagination, add per-call latency and throttle each API with a
+token bucket, raising the same ThrottlingException botocore does. Every
+call is counted so benchmarks can report API usage.
+
+Instance attributes are derived from compact per-instance byte arrays, so
+the fleet itself costs a few bytes per instance and response dicts are
+only built for the page being returned.
+"""
+
+import random
+import threading
+import time
+from collections import Counter, namedtuple
+from datetime import datetime, timedelta, timezone
+
+from botocore.exceptions import ClientError
+
+DEFAULT_API_TPS = 40.0
+DEFAULT_LATENCY_MS = 20.0
+
+# Per-instance flags
+RUNNING = 1
+MANAGED = 2
+HAS_PATCH_DATA = 4
+ONLINE = 8
+
+ENVIRONMENTS = ('prod', 'staging', 'dev')
+AVAILABILITY_ZONES = ('a', 'b', 'c')
+PATCH_GROUPS = ('web', 'api', 'batch', 'db')
+
+PAGE_LIMITS = {
+    'DescribeInstances': 1000,
+    'DescribeInstanceInformation': 50,
+    'DescribeInstancePatchStates': 50,
+    'DescribeInstancePatches': 50,
+    'ListResourceComplianceSummaries': 100,
+    'ListComplianceSummaries': 50,
+    'ListCommandInvocations': 50
+}
+
+
+SimCommand = namedtuple('SimCommand', ['started', 'instance_ids', 'requested', 'document', 'comment'])
+
+
+def client_error(code, message, operation):
+    return ClientError({'Error': {'Code': code, 'Message': message}}, operation)
+
+
+class ApiThrottle:
+    """Token bucket per API, like the per-account/region SSM quotas"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def allow(self, operation):
+        if not self.rate:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self.buckets.get(operation, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            self.buckets[operation] = (tokens - 1 if allowed else tokens, now)
+            return allowed
+
+
+class FleetSimulator:
+    """One simulated account/region of EC2 instances managed by SSM"""
+
+    def __init__(self, size=10000, region='us-east-1', seed=42, running_ratio=0.95,
+                 managed_ratio=0.9, patch_data_ratio=0.95, compliant_ratio=0.7,
+                 api_tps=DEFAULT_API_TPS, latency_ms=DEFAULT_LATENCY_MS,
+                 command_duration=2.0):
+        rng = random.Random(seed)
+        self.size = size
+        self.region = region
+        self.latency = latency_ms / 1000.0
+        self.throttle = ApiThrottle(api_tps)
+        self.command_duration = command_duration
+        self.calls = Counter()
+        self.throttled = Counter()
+        self.commands = {}
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+        self.flags = bytearray(size)
+        self.missing = bytearray(size)
+        self.tags = bytearray(size)
+        for i in range(size):
+            flags = RUNNING if rng.random() < running_ratio else 0
+            if rng.random() < managed_ratio:
+                flags |= MANAGED | (ONLINE if rng.random() < 0.97 else 0)
+                if rng.random() < patch_data_ratio:
+                    flags |= HAS_PATCH_DATA
+            self.flags[i] = flags
+            self.missing[i] = 0 if rng.random() < compliant_ratio else rng.randint(1, 30)
+            self.tags[i] = rng.randrange(len(ENVIRONMENTS) * len(AVAILABILITY_ZONES) * len(PATCH_GROUPS))
+        self.base_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    # Instance attributes
+
+    def instance_id(self, i):
+        return f"i-{i:017x}"
+
+    def index(self, instance_id):
+        try:
+            i = int(instance_id[2:], 16)
+        except ValueError:
+            return None
+        return i if 0 <= i < self.size else None
+
+    def environment(self, i):
+        return ENVIRONMENTS[self.tags[i] % len(ENVIRONMENTS)]
+
+    def availability_zone(self, i):
+        return self.region + AVAILABILITY_ZONES[self.tags[i] // len(ENVIRONMENTS) % len(AVAILABILITY_ZONES)]
+
+    def patch_group(self, i):
+        return PATCH_GROUPS[self.tags[i] // (len(ENVIRONMENTS) * len(AVAILABILITY_ZONES))]
+
+    def tag_value(self, i, key):
+        return {'Name': f"sim-{i}", 'Environment': self.environment(i),
+                'Patch Group': self.patch_group(i)}.get(key)
+
+    def operation_end_time(self, i):
+        return self.base_time + timedelta(minutes=i % 1440)
+
+    def indexes_with(self, flag):
+        """Sorted indexes of instances with flag set (computed once per flag)"""
+        indexes = self._indexes.get(flag)
+        if indexes is None:
+            indexes = self._indexes[flag] = [i for i in range(self.size) if self.flags[i] & flag]
+        return indexes
+
+    # Call accounting
+
+    def call(self, operation):
+        """Count, throttle and delay one API call"""
+        with self._lock:
+            self.calls[operation] += 1
+        if not self.throttle.allow(operation):
+            with self._lock:
+                self.throttled[operation] += 1
+            raise client_error('ThrottlingException', 'Rate exceeded', operation)
+        if self.latency:
+            time.sleep(self.latency)
+
+    def page_size(self, operation, requested):
+        limit = PAGE_LIMITS[operation]
+        if requested is None:
+            return limit
+        if requested > limit:
+            raise client_error('ValidationException', f"MaxResults must be <= {limit}", operation)
+        return requested
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def reset_counters(self):
+        self.calls.clear()
+        self.throttled.clear()
+
+    def session(self):
+        return FakeSession(self)
+
+
+def paginate(items, next_token, page_size):
+    """Slice items into a page; returns (page, next_token)"""
+    start = int(next_token) if next_token else 0
+    page = items[start:start + page_size]
+    end = start + page_size
+    return page, (str(end) if end < len(items) else None)
+
+
+class FakeEC2:
+    def __init__(self, simulator):
+        self.sim = simulator
+        self.meta = type('Meta', (), {'region_name': simulator.region})()
+        self._matches = (None, None)
+
+    def _matching(self, filters):
+        # Paginated calls repeat the same filters; evaluate them once
+        cache_key = repr(filters)
+        if self._matches[0] == cache_key:
+            return self._matches[1]
+        sim = self.sim
+        indexes = range(sim.size)
+        for f in filters or []:
+            values = set(f['Values'])
+            if f['Name'] == 'instance-state-name':
+                state = lambda i: 'running' if sim.flags[i] & RUNNING else 'stopped'
+                indexes = [i for i in indexes if state(i) in values]
+            elif f['Name'].startswith('tag:'):
+                tag_key = f['Name'][4:]
+                indexes = [i for i in indexes if sim.tag_value(i, tag_key) in values]
+            elif f['Name'] == 'instance-id':
+                indexes = [i for i in map(sim.index, values) if i is not None]
+            elif f['Name'] == 'availability-zone':
+                indexes = [i for i in indexes if sim.availability_zone(i) in values]
+        indexes = list(indexes)
+        self._matches = (cache_key, indexes)
+        return indexes
+
+    def describe_instances(self, Filters=None, MaxResults=None, NextToken=None):
+        sim = self.sim
+        sim.call('DescribeInstances')
+        page, token = paginate(self._matching(Filters), NextToken,
+                               sim.page_size('DescribeInstances', MaxResults))
+        instances = [{
+            'InstanceId': sim.instance_id(i),
+            'State': {'Name': 'running' if sim.flags[i] & RUNNING else 'stopped'},
+            'Placement': {'AvailabilityZone': sim.availability_zone(i)},
+            'Tags': [{'Key': key, 'Value': sim.tag_value(i, key)}
+                     for key in ('Name', 'Environment', 'Patch Group')]
+        } for i in page]
+        response = {'Reservations': [{'Instances': instances}] if instances else []}
+        if token:
+            response['NextToken'] = token
+        return response
+
+    def get_paginator(self, name):
+        if name != 'describe_instances':
+            raise NotImplementedError(name)
+        return FakePaginator(self.describe_instances)
+
+    def describe_regions(self):
+        self.sim.call('DescribeRegions')
+        return {'Regions': [{'RegionName': self.sim.region}]}
+
+
+class FakePaginator:
+    """botocore-style paginator over a NextToken API (no retries, like the real one)"""
+
+    def __init__(self, method):
+        self.method = method
+
+    def paginate(self, PaginationConfig=None, **kwargs):
+        page_size = (PaginationConfig or {}).get('PageSize')
+        if page_size:
+            kwargs['MaxResults'] = page_size
+        while True:
+            page = self.method(**kwargs)
+            yield page
+            if not page.get('NextToken'):
+                return
+            kwargs['NextToken'] = page['NextToken']
+
+
+class FakeSSM:
+    def __init__(self, simulator):
+        self.sim = simulator
+        self.meta = type('Meta', (), {'region_name': simulator.region})()
+
+    def describe_instance_information(self, Filters=None, MaxResults=None, NextToken=None):
+        sim = self.sim
+        sim.call('DescribeInstanceInformation')
+        indexes = sim.indexes_with(MANAGED)
+        for f in Filters or []:
+            if f['Key'].startswith('tag:'):
+                values = set(f['Values'])
+                indexes = [i for i in indexes if sim.tag_value(i, f['Key'][4:]) in values]
+        page, token = paginate(indexes, NextToken, sim.page_size('DescribeInstanceInformation', MaxResults))
+        response = {'InstanceInformationList': [{
+            'InstanceId': sim.instance_id(i),
+            'PingStatus': 'Online' if sim.flags[i] & ONLINE else 'ConnectionLost',
+            'PlatformType': 'Linux',
+            'PlatformName': 'Amazon Linux',
+            'ResourceType': 'EC2Instance'
+        } for i in page]}
+        if token:
+            response['NextToken'] = token
+        return response
+
+    def _patch_state(self, i):
+        sim = self.sim
+        return {
+            'InstanceId': sim.instance_id(i),
+            'PatchGroup': sim.patch_group(i),
+            'BaselineId': 'pb-0123456789abcdef0',
+            'InstalledCount': 120,
+            'MissingCount': sim.missing[i],
+            'FailedCount': 0,
+            'OperationStartTime': sim.operation_end_time(i) - timedelta(minutes=5),
+            'OperationEndTime': sim.operation_end_time(i),
+            'Operation': 'Scan'
+        }
+
+    def describe_instance_patch_states(self, InstanceIds, MaxResults=None, NextToken=None):
+        sim = self.sim
+        sim.call('DescribeInstancePatchStates')
+        if len(InstanceIds) > PAGE_LIMITS['DescribeInstancePatchStates']:
+            raise client_error('ValidationException', 'Too many instance IDs', 'DescribeInstancePatchStates')
+        indexes = [i for i in map(sim.index, InstanceIds)
+                   if i is not None and sim.flags[i] & HAS_PATCH_DATA]
+        page, token = paginate(indexes, NextToken,
+                               sim.page_size('DescribeInstancePatchStates', MaxResults))
+        response = {'InstancePatchStates': [self._patch_state(i) for i in page]}
+        if token:
+            response['NextToken'] = token
+        return response
+
+    def describe_instance_patches(self, InstanceId, Filters=None, MaxResults=None, NextToken=None):
+        sim = self.sim
+        sim.call('DescribeInstancePatches')
+        i = sim.index(InstanceId)
+        if i is None:
+            raise client_error('InvalidInstanceId', InstanceId, 'DescribeInstancePatches')
+        patches = [{'Title': f"KB{i % 9000 + n}", 'KBId': f"KB{i % 9000 + n}", 'Classification': 'Security',
+                    'Severity': ('Critical', 'Important', 'Medium')[n % 3], 'State': 'Missing',
+                    'InstalledTime': sim.base_time}
+                   for n in range(sim.missing[i])]
+        patches += [{'Title': f"pkg-{n}", 'KBId': f"pkg-{n}", 'Classification': 'Bugfix',
+                     'Severity': 'Low', 'State': 'Installed', 'InstalledTime': sim.base_time}
+                    for n in range(120)]
+        for f in Filters or []:
+            values = set(f['Values'])
+            patches = [p for p in patches if p.get(f['Key']) in values]
+        page, token = paginate(patches, NextToken,
+                               sim.page_size('DescribeInstancePatches', MaxResults))
+        response = {'Patches': page}
+        if token:
+            response['NextToken'] = token
+        return response
+
+    def list_resource_compliance_summaries(self, Filters=None, MaxResults=None, NextToken=None):
+        sim = self.sim
+        sim.call('ListResourceComplianceSummaries')
+        indexes = sim.indexes_with(HAS_PATCH_DATA)
+        for f in Filters or []:
+            if f['Key'] == 'Status':
+                indexes = [i for i in indexes if self._status(i) in f['Values']]
+        page, token = paginate(indexes, NextToken,
+                               sim.page_size('ListResourceComplianceSummaries', MaxResults))
+        response = {'ResourceComplianceSummaryItems': [{
+            'ComplianceType': 'Patch',
+            'ResourceType': 'ManagedInstance',
+            'ResourceId': sim.instance_id(i),
+            'Status': self._status(i),
+            'OverallSeverity': self._severity(i),
+            'ExecutionSummary': {'ExecutionTime': sim.operation_end_time(i)},
+            'NonCompliantSummary': {'NonCompliantCount': sim.missing[i]}
+        } for i in page]}
+        if token:
+            response['NextToken'] = token
+        return response
+
+    def _status(self, i):
+        return 'COMPLIANT' if not self.sim.missing[i] else 'NON_COMPLIANT'
+
+    def _severity(self, i):
+        # Matches describe_instance_patches: the first missing patch is Critical
+        return 'CRITICAL' if self.sim.missing[i] else 'UNSPECIFIED'
+
+    def list_compliance_summaries(self, Filters=None, MaxResults=None, NextToken=None):
+        sim = self.sim
+        sim.call('ListComplianceSummaries')
+        sim.page_size('ListComplianceSummaries', MaxResults)
+        indexes = sim.indexes_with(HAS_PATCH_DATA)
+        non_compliant = sum(1 for i in indexes if sim.missing[i])
+        return {'ComplianceSummaryItems': [{
+            'ComplianceType': 'Patch',
+            'CompliantSummary': {'CompliantCount': len(indexes) - non_compliant,
+                                 'SeveritySummary': {'UnspecifiedCount': len(indexes) - non_compliant}},
+            'NonCompliantSummary': {'NonCompliantCount': non_compliant,
+                                    'SeveritySummary': {'CriticalCount': non_compliant}}
+        }]}
+
+    def send_command(self, DocumentName, InstanceIds=None, Targets=None, **kwargs):
+        sim = self.sim
+        sim.call('SendCommand')
+        if InstanceIds and len(InstanceIds) > 50:
+            raise client_error('ValidationException', 'Too many instance IDs', 'SendCommand')
+        if Targets:
+            key = Targets[0]['Key'][4:]
+            values = set(Targets[0]['Values'])
+            InstanceIds = [sim.instance_id(i) for i in sim.indexes_with(MANAGED) if sim.tag_value(i, key) in values]
+        with sim._lock:
+            command_id = f"sim-{len(sim.commands) + 1:08d}"
+            sim.commands[command_id] = SimCommand(time.monotonic(), list(InstanceIds or []),
+                                                  datetime.now(timezone.utc), DocumentName, kwargs.get('Comment', ''))
+        return {'Command': {'CommandId': command_id, 'Status': 'Pending'}}
+
+    def _command_progress(self, command_id):
+        command = self.sim.commands[command_id]
+        started, instance_ids = command.started, command.instance_ids
+        elapsed = time.monotonic() - started
+        done = min(len(instance_ids), int(len(instance_ids) * elapsed / self.sim.command_duration))
+        return started, instance_ids, done
+
+    def list_commands(self, CommandId=None, Filters=None, MaxResults=None, NextToken=None):
+        sim = self.sim
+        sim.call('ListCommands')
+        command_ids = [c for c in ([CommandId] if CommandId else sorted(sim.commands)) if c in sim.commands]
+        for f in Filters or []:
+            if f['key'] == 'DocumentName':
+                command_ids = [c for c in command_ids if sim.commands[c].document == f['value']]
+            elif f['key'] == 'InvokedAfter':
+                after = datetime.strptime(f['value'], '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+                command_ids = [c for c in command_ids if sim.commands[c].requested >= after]
+        commands = []
+        for command_id in command_ids:
+            command = sim.commands[command_id]
+            _, instance_ids, done = self._command_progress(command_id)
+            commands.append({
+                'CommandId': command_id,
+                'DocumentName': command.document,
+                'Comment': command.comment,
+                'RequestedDateTime': command.requested,
+                'Status': 'Success' if done == len(instance_ids) else 'InProgress',
+                'TargetCount': len(instance_ids),
+                'CompletedCount': done,
+                'ErrorCount': 0
+            })
+        return {'Commands': commands}
+
+    def list_command_invocations(self, CommandId, MaxResults=None, NextToken=None, **kwargs):
+        sim = self.sim
+        sim.call('ListCommandInvocations')
+        started, instance_ids, done = self._command_progress(CommandId)
+        positions = list(range(len(instance_ids)))
+        page, token = paginate(positions, NextToken,
+                               sim.page_size('ListCommandInvocations', MaxResults))
+        requested = datetime.now(timezone.utc) - timedelta(seconds=time.monotonic() - started)
+        response = {'CommandInvocations': [{
+            'CommandId': CommandId,
+            'InstanceId': instance_ids[n],
+            'Status': 'Success' if n < done else 'InProgress',
+            'RequestedDateTime': requested
+        } for n in page]}
+        if token:
+            response['NextToken'] = token
+        return response
+
+
+class FakeSTS:
+    def __init__(self, simulator):
+        self.sim = simulator
+
+    def get_caller_identity(self):
+        self.sim.call('GetCallerIdentity')
+        return {'Account': '123456789012'}
+
+
+class FakeSession:
+    """Stands in for boto3.Session; every client shares one simulator"""
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+        self.region_name = simulator.region
+
+    def client(self, service_name, region_name=None, config=None):
+        clients = {'ec2': FakeEC2, 'ssm': FakeSSM, 'sts': FakeSTS}
+        if service_name not in clients:
+            raise NotImplementedError(f"No simulated {service_name} client")
+        return clients[service_name](self.simulator)
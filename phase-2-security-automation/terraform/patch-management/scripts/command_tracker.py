@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Run Command status tracking
+
+CommandTracker follows any number of SSM commands without per-instance API
+calls. Each poll makes one list_commands call per unfinished command and,
+only when that command's completed/error counts have moved, pages through
+list_command_invocations 50 invocations at a time. The poll interval backs
+off while nothing changes, so thousands of invocations cost a handful of
+calls per minute. Every instance has a small state machine, and each
+transition is yielded as a TrackerEvent for streaming progress.
+"""
+
+import statistics
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from concurrent_scan import call_with_backoff, paginate_with_backoff
+
+INVOCATION_PAGE_SIZE = 50
+
+DEFAULT_POLL_INTERVAL = 5.0
+MAX_POLL_INTERVAL = 60.0
+POLL_BACKOFF = 1.5
+
+# Invocation states: Pending -> InProgress/Delayed -> one terminal state
+PENDING = 'Pending'
+IN_PROGRESS = 'InProgress'
+TERMINAL_STATUSES = {'Success', 'Failed', 'Cancelled', 'TimedOut', 'DeliveryTimedOut',
+                     'ExecutionTimedOut', 'Undeliverable', 'Terminated', 'InvalidPlatform',
+                     'AccessDenied'}
+COMMAND_TERMINAL_STATUSES = {'Success', 'Failed', 'Cancelled', 'TimedOut'}
+
+TrackerEvent = namedtuple('TrackerEvent', ['command_id', 'instance_id', 'previous', 'status', 'at'])
+
+
+class InvocationState:
+    """Lifecycle of one instance's invocation of a command"""
+
+    def __init__(self, command_id, instance_id):
+        self.command_id = command_id
+        self.instance_id = instance_id
+        self.status = PENDING
+        self.requested = None
+        self.started = None
+        self.finished = None
+
+    @property
+    def done(self):
+        return self.status in TERMINAL_STATUSES
+
+    @property
+    def duration(self):
+        """Seconds from request to the poll that observed completion"""
+        if self.finished is None or self.requested is None:
+            return None
+        return max(0.0, self.finished - self.requested)
+
+    def transition(self, status, now):
+        """Move to status; returns the previous status, or None if unchanged"""
+        if status == self.status or self.done:
+            return None
+        previous, self.status = self.status, status
+        if status not in TERMINAL_STATUSES and status != PENDING and self.started is None:
+            self.started = now
+        if status in TERMINAL_STATUSES:
+            self.finished = now
+        return previous
+
+
+def to_epoch(value):
+    """botocore datetime (or None) to epoch seconds"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+
+class CommandTracker:
+    """Track SSM commands and their per-instance invocations in bulk"""
+
+    def __init__(self, ssm, limiter=None, poll_interval=DEFAULT_POLL_INTERVAL,
+                 max_poll_interval=MAX_POLL_INTERVAL):
+        self.ssm = ssm
+        self.limiter = limiter
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max(poll_interval, max_poll_interval)
+        self.invocations = {}
+        self.commands = {}
+        self._counts = {}
+
+    def track(self, command_id, instance_ids=()):
+        """Start tracking a command; instance IDs are optional for tag targets"""
+        self.commands[command_id] = PENDING
+        for instance_id in instance_ids:
+            self.invocations[(command_id, instance_id)] = InvocationState(command_id, instance_id)
+
+    def command_status(self, command_id):
+        return self.commands.get(command_id)
+
+    @property
+    def pending_commands(self):
+        return [c for c, status in self.commands.items() if status not in COMMAND_TERMINAL_STATUSES]
+
+    def poll(self):
+        """One polling pass over every unfinished command; returns new events"""
+        events = []
+        for command_id in self.pending_commands:
+            response = call_with_backoff(self.limiter, self.ssm.list_commands, CommandId=command_id)
+            commands = response.get('Commands', [])
+            if not commands:
+                continue
+            command = commands[0]
+            self.commands[command_id] = command['Status']
+
+            counts = (command.get('TargetCount'), command.get('CompletedCount'),
+                      command.get('ErrorCount'), command.get('DeliveryTimedOutCount'))
+            if counts == self._counts.get(command_id) and command['Status'] not in COMMAND_TERMINAL_STATUSES:
+                continue
+            self._counts[command_id] = counts
+            events.extend(self._poll_invocations(command_id))
+        return events
+
+    def _poll_invocations(self, command_id):
+        now = time.time()
+        events = []
+        pages = paginate_with_backoff(self.limiter, self.ssm.list_command_invocations,
+                                      CommandId=command_id, MaxResults=INVOCATION_PAGE_SIZE)
+        for page in pages:
+            for invocation in page.get('CommandInvocations', []):
+                key = (command_id, invocation['InstanceId'])
+                state = self.invocations.get(key)
+                if state is None:
+                    state = self.invocations[key] = InvocationState(command_id, invocation['InstanceId'])
+                if state.requested is None:
+                    state.requested = to_epoch(invocation.get('RequestedDateTime')) or now
+                previous = state.transition(invocation['Status'], now)
+                if previous is not None:
+                    events.append(TrackerEvent(command_id, state.instance_id, previous, state.status, now))
+        return events
+
+    def events(self, timeout=None):
+        """Yield TrackerEvents until every tracked command has finished.
+
+        The poll interval grows by POLL_BACKOFF while nothing changes and
+        resets after any transition.
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        interval = self.poll_interval
+        while self.pending_commands:
+            new_events = self.poll()
+            yield from new_events
+            if not self.pending_commands:
+                return
+            if deadline and time.monotonic() >= deadline:
+                return
+            interval = self.poll_interval if new_events else min(self.max_poll_interval, interval * POLL_BACKOFF)
+            time.sleep(interval)
+
+    def summary(self):
+        """Counts per status and duration statistics across all invocations"""
+        by_status = {}
+        for state in self.invocations.values():
+            by_status[state.status] = by_status.get(state.status, 0) + 1
+        durations = sorted(s.duration for s in self.invocations.values() if s.duration is not None)
+        summary = {
+            'commands': dict(self.commands),
+            'invocations': len(self.invocations),
+            'by_status': by_status,
+            'failed_instances': sorted(s.instance_id for s in self.invocations.values()
+                                       if s.done and s.status != 'Success')
+        }
+        if durations:
+            summary['duration'] = {
+                'min': durations[0],
+                'median': statistics.median(durations),
+                'p95': durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+                'max': durations[-1]
+            }
+        return summary
+
+
+def format_event(event):
+    return f"   {event.instance_id}: {event.previous} → {event.status}"
+
+
+def print_summary(summary):
+    """Print a tracker summary"""
+    print(f"\n📊 COMMAND SUMMARY: {len(summary['commands'])} commands, "
+          f"{summary['invocations']} invocations")
+    for status, count in sorted(summary['by_status'].items()):
+        print(f"   {status}: {count}")
+    if 'duration' in summary:
+        d = summary['duration']
+        print(f"   Duration: min {d['min']:.0f}s, median {d['median']:.0f}s, "
+              f"p95 {d['p95']:.0f}s, max {d['max']:.0f}s")
+    if summary['failed_instances']:
+        print(f"   ❌ Failed: {', '.join(summary['failed_instances'])}")
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Event-driven patch compliance updates
+
+Instead of re-running the reporter over the whole fleet, consume the SSM
+events EventBridge already publishes and update the patch state cache
+(patch_state_cache.py) for just the instances they mention:
+
+- "Configuration Compliance State Change" with compliance-type Patch records
+  the new compliance status and refetches that instance's patch state.
+- "EC2 Command Invocation Status-change Notification" for
+  AWS-RunPatchBaseline records the command status, and refetches the patch
+  state once the invocation has finished.
+
+Refetches are batched 50 instances per describe_instance_patch_states call
+and go through the shared limiter. The compliance ExecutionTime stored with
+each refetched state comes from one list_resource_compliance_summaries
+sweep (100 instances per call, PatchStateCache.execution_times), taken at
+most every --sweep-interval seconds rather than per instance. A sweep older
+than the refetch only stores an older ExecutionTime, which costs that
+instance one extra refetch on the next report, never a wrong state. The
+terraform in ../terraform routes these events to an SQS queue
+(enable_compliance_events = true).
+
+    python compliance_events.py consume --queue-url https://sqs...
+    python compliance_events.py replay ../events/sample_events.ndjson --offline
+    python compliance_events.py status
+"""
+
+import argparse
+import json
+import time
+
+import boto3
+from botocore.config import Config
+
+from concurrent_scan import DEFAULT_SSM_RATE, TokenBucket
+from ec2_patch_manager import PATCH_STATE_BATCH_SIZE, chunked
+from patch_state_cache import DEFAULT_CACHE_PATH, PatchStateCache
+
+COMPLIANCE_CHANGE = 'Configuration Compliance State Change'
+COMMAND_STATUS_CHANGE = 'EC2 Command Invocation Status-change Notification'
+PATCH_DOCUMENT = 'AWS-RunPatchBaseline'
+
+# Invocation statuses after which the instance's patch state may have changed
+FINISHED_COMMAND_STATUSES = {'Success', 'Failed', 'TimedOut', 'Cancelled'}
+
+# SQS returns at most 10 messages per receive
+SQS_BATCH_SIZE = 10
+SQS_WAIT_SECONDS = 20
+
+REPLAY_BATCH_SIZE = 100
+
+# Seconds an ExecutionTime sweep is reused across event batches
+DEFAULT_SWEEP_INTERVAL = 300
+
+
+def parse_event(event, scope_region=None, scope_account=None):
+    """(instance_id, fields, needs_refresh) for a relevant event, else None"""
+    if event.get('source') != 'aws.ssm':
+        return None
+    if scope_region and event.get('region') != scope_region:
+        return None
+    if scope_account and event.get('account') != scope_account:
+        return None
+
+    detail = event.get('detail', {})
+    event_time = event.get('time')
+    if event.get('detail-type') == COMPLIANCE_CHANGE:
+        if detail.get('compliance-type') != 'Patch' or detail.get('resource-type') != 'managed-instance':
+            return None
+        instance_id = detail.get('resource-id', '')
+        fields = {'compliance_status': detail.get('compliance-status'), 'event_time': event_time}
+        return instance_id, fields, True
+
+    if event.get('detail-type') == COMMAND_STATUS_CHANGE:
+        if detail.get('document-name') != PATCH_DOCUMENT:
+            return None
+        instance_id = detail.get('instance-id', '')
+        status = detail.get('status')
+        fields = {'command_id': detail.get('command-id'), 'command_status': status, 'event_time': event_time}
+        return instance_id, fields, status in FINISHED_COMMAND_STATUSES
+
+    return None
+
+
+class ComplianceEventConsumer:
+    """Apply batches of EventBridge events to one PatchStateCache scope.
+
+    The cache scope is 'region' or 'account/region', as written by the
+    reporter, and events from other regions/accounts are skipped. With
+    offline=True, affected instances are only invalidated, so no AWS calls
+    are made and the next report refetches them. The ExecutionTime sweep
+    is repeated once it is sweep_interval seconds old.
+    """
+
+    def __init__(self, cache, ssm=None, limiter=None, offline=False, sweep_interval=DEFAULT_SWEEP_INTERVAL):
+        self.cache = cache
+        self.ssm = ssm
+        self.limiter = limiter
+        self.offline = offline
+        self.sweep_interval = sweep_interval
+        self.swept_at = None
+        account, _, region = cache.scope.rpartition('/')
+        self.scope_account = account or None
+        self.scope_region = region if region != 'default' else None
+        self.applied = 0
+        self.skipped = 0
+        self.invalidated = 0
+
+    def apply(self, events):
+        """Record a batch of events and refresh the instances they changed"""
+        updates, to_refresh = [], []
+        for event in events:
+            parsed = parse_event(event, self.scope_region, self.scope_account)
+            if not parsed or not parsed[0].startswith('i-'):
+                self.skipped += 1
+                continue
+            instance_id, fields, needs_refresh = parsed
+            updates.append((instance_id, fields))
+            if needs_refresh and instance_id not in to_refresh:
+                to_refresh.append(instance_id)
+            self.applied += 1
+
+        self.cache.record_events(updates)
+        if not to_refresh:
+            return
+        if self.offline:
+            self.cache.invalidate(to_refresh)
+            self.invalidated += len(to_refresh)
+            return
+        execution_times = self.execution_times()
+        for batch in chunked(to_refresh, PATCH_STATE_BATCH_SIZE):
+            self.cache.refresh(self.ssm, batch, execution_times, self.limiter)
+
+    def execution_times(self):
+        """The cache's ExecutionTime sweep, taken again once sweep_interval has passed"""
+        now = time.monotonic()
+        if self.swept_at is None or now - self.swept_at >= self.sweep_interval:
+            self.cache.start_pass()
+            self.swept_at = now
+        return self.cache.execution_times(self.ssm, self.limiter)
+
+    def describe(self):
+        text = f"📨 {self.applied} events applied, {self.skipped} skipped, "
+        text += (f"{self.invalidated} instances invalidated" if self.offline
+                 else f"{self.cache.refreshed} instances refreshed")
+        if self.limiter:
+            text += f", {self.limiter.calls} SSM calls"
+        return text
+
+
+def consume_queue(sqs, queue_url, consumer, max_batches=None):
+    """Long-poll an SQS queue of EventBridge events, deleting each batch once applied"""
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        messages = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=SQS_BATCH_SIZE,
+                                       WaitTimeSeconds=SQS_WAIT_SECONDS).get('Messages', [])
+        if not messages:
+            continue
+        batches += 1
+        events = []
+        for message in messages:
+            try:
+                events.append(json.loads(message['Body']))
+            except ValueError:
+                print(f"⚠️  Skipping malformed message {message['MessageId']}")
+        consumer.apply(events)
+        sqs.delete_message_batch(QueueUrl=queue_url, Entries=[
+            {'Id': str(n), 'ReceiptHandle': message['ReceiptHandle']} for n, message in enumerate(messages)
+        ])
+        print(consumer.describe())
+
+
+def read_events(path):
+    """Events from a recorded file: NDJSON, or a single JSON array"""
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def replay(paths, consumer, batch_size=REPLAY_BATCH_SIZE):
+    """Apply recorded events in file order"""
+    for path in paths:
+        events = read_events(path)
+        for start in range(0, len(events), batch_size):
+            consumer.apply(events[start:start + batch_size])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the patch state cache from SSM EventBridge events")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, metavar='PATH',
+                        help="SQLite patch state cache to update")
+    parser.add_argument('--scope', help="Cache scope: REGION or ACCOUNT/REGION (default: current region)")
+    parser.add_argument('--rate', type=float, default=DEFAULT_SSM_RATE,
+                        help="Maximum SSM API calls per second")
+    parser.add_argument('--sweep-interval', type=int, default=DEFAULT_SWEEP_INTERVAL, metavar='SECONDS',
+                        help="How long a compliance ExecutionTime sweep is reused across event batches")
+    commands = parser.add_subparsers(dest='command', required=True)
+    consume = commands.add_parser('consume', help="Consume events from an SQS queue")
+    consume.add_argument('--queue-url', required=True)
+    replay_parser = commands.add_parser('replay', help="Apply recorded events from files")
+    replay_parser.add_argument('files', nargs='+', help="NDJSON or JSON array of EventBridge events")
+    replay_parser.add_argument('--offline', action='store_true',
+                               help="Only invalidate changed instances; make no AWS calls")
+    commands.add_parser('status', help="Compliance counts from the cache")
+    args = parser.parse_args()
+
+    offline = args.command == 'status' or getattr(args, 'offline', False)
+    session = None if offline else boto3.Session()
+    scope = args.scope or (session.region_name if session else None) or 'default'
+    cache = PatchStateCache(args.cache, scope)
+
+    if args.command == 'status':
+        counts = cache.status_counts()
+        total = sum(counts.values())
+        print(f"📊 {scope}: {total} instances")
+        for status, count in sorted(counts.items()):
+            print(f"   {status}: {count}")
+        cache.close()
+        return
+
+    # call_with_backoff retries throttles and transient errors, not botocore
+    ssm = None if offline else session.client('ssm', config=Config(retries={'mode': 'standard', 'max_attempts': 1}))
+    consumer = ComplianceEventConsumer(cache, ssm, None if offline else TokenBucket(args.rate), offline,
+                                       args.sweep_interval)
+    started = time.perf_counter()
+    try:
+        if args.command == 'consume':
+            consume_queue(session.client('sqs'), args.queue_url, consumer)
+        else:
+            replay(args.files, consumer)
+    except KeyboardInterrupt:
+        print("\nℹ️  Stopped")
+    finally:
+        print(consumer.describe())
+        print(f"⏱️  {time.perf_counter() - started:.2f}s")
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
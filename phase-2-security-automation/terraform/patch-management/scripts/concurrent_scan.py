@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Concurrency helpers for fleet-wide SSM scans
+
+TokenBucket is shared by every worker thread so the combined call rate stays
+under the SSM API quota. call_with_backoff retries ThrottlingException with
+jittered exponential backoff and halves the bucket rate on each throttle,
+recovering gradually on success, so a scan settles at whatever rate the
+account can actually sustain. Transient errors (5xx responses, timeouts,
+dropped connections) are retried with the same backoff but leave the rate
+alone, for read-only calls only: a write like send_command may have taken
+effect before the failure, so idempotent=False retries throttles alone.
+Clients are built with botocore retries off so this is the only retry
+layer. ordered_map runs work on a thread pool while
+yielding results in input order, keeping reports deterministic.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, HTTPClientError
+
+# SSM Describe* APIs are throttled at low double-digit TPS per account/region
+DEFAULT_SSM_RATE = 10.0
+DEFAULT_SSM_BURST = 20
+DEFAULT_WORKERS = 8
+
+THROTTLE_ERROR_CODES = {
+    'ThrottlingException',
+    'Throttling',
+    'ThrottledException',
+    'TooManyRequestsException',
+    'RequestLimitExceeded'
+}
+
+TRANSIENT_ERROR_CODES = {
+    'InternalError',
+    'InternalFailure',
+    'InternalServerError',
+    'ServiceUnavailable',
+    'ServiceUnavailableException',
+    'RequestTimeout',
+    'RequestTimeoutException'
+}
+
+
+class TokenBucket:
+    """Thread-safe token bucket with multiplicative slow-down on throttling"""
+
+    def __init__(self, rate=DEFAULT_SSM_RATE, burst=DEFAULT_SSM_BURST, min_rate=0.5):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = min(min_rate, self.rate)
+        self.capacity = float(burst or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.throttles = 0
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Block until a call is allowed"""
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.calls += 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_throttle(self):
+        """Halve the rate after a throttling error"""
+        with self._lock:
+            self.throttles += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+
+    def on_success(self):
+        """Creep back towards the configured rate"""
+        if self.rate < self.max_rate:
+            with self._lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+def is_throttle_error(error):
+    """True if a botocore error is an API throttling response"""
+    return (isinstance(error, ClientError)
+            and error.response.get('Error', {}).get('Code') in THROTTLE_ERROR_CODES)
+
+
+def is_transient_error(error):
+    """True if a botocore error is a 5xx response or a connection/timeout failure"""
+    if isinstance(error, (BotoConnectionError, HTTPClientError)):
+        return True
+    if not isinstance(error, ClientError):
+        return False
+    status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode') or 0
+    return status >= 500 or error.response.get('Error', {}).get('Code') in TRANSIENT_ERROR_CODES
+
+
+def call_with_backoff(limiter, func, max_attempts=8, base_delay=0.5, max_delay=20.0, idempotent=True,
+                      **kwargs):
+    """Call func(**kwargs) through the limiter, retrying throttled and transient failures.
+
+    A throttled call was never run, so it is always retried. Transient
+    failures are only retried when idempotent is True; otherwise they are
+    raised for the caller to check whether the call took effect.
+    """
+    for attempt in range(max_attempts):
+        if limiter:
+            limiter.acquire()
+        try:
+            result = func(**kwargs)
+        except (ClientError, BotoConnectionError, HTTPClientError) as e:
+            throttled = is_throttle_error(e)
+            retryable = throttled or (idempotent and is_transient_error(e))
+            if not retryable or attempt == max_attempts - 1:
+                raise
+            if limiter and throttled:
+                limiter.on_throttle()
+            # Full jitter keeps workers from retrying in lockstep
+            time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+            continue
+        if limiter:
+            limiter.on_success()
+        return result
+
+
+def paginate_with_backoff(limiter, func, **kwargs):
+    """Yield every page of a NextToken-paginated API through the limiter"""
+    while True:
+        page = call_with_backoff(limiter, func, **kwargs)
+        yield page
+        next_token = page.get('NextToken')
+        if not next_token:
+            return
+        kwargs['NextToken'] = next_token
+
+
+def ordered_map(func, iterable, workers=DEFAULT_WORKERS, max_in_flight=None):
+    """Like map() on a thread pool, yielding results in input order.
+
+    At most max_in_flight items are pending at once, so a streamed input is
+    never fully materialised.
+    """
+    max_in_flight = max_in_flight or workers * 2
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for item in iterable:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class ScanStats:
+    """Wall time and throughput for a scan"""
+
+    def __init__(self, limiter=None):
+        self.limiter = limiter
+        self.instances = 0
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def instances_per_second(self):
+        return self.instances / self.elapsed if self.elapsed > 0 else 0.0
+
+    def describe(self):
+        text = (f"⚡ Scanned {self.instances} instances in {self.elapsed:.1f}s "
+                f"({self.instances_per_second:.1f} instances/sec)")
+        if self.limiter:
+            text += f", {self.limiter.calls} SSM calls, {self.limiter.throttles} throttled"
+        return text
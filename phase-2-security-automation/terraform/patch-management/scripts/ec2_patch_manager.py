@@ -4,28 +4,252 @@ Ultra Simple EC2 Patch Management Script
 Handles scanning and patching EC2 instances with SSM
 """
 
+import argparse
 import boto3
 import json
+from botocore.config import Config
 from datetime import datetime, timedelta
 
+from concurrent_scan import (
+    DEFAULT_SSM_RATE,
+    DEFAULT_WORKERS,
+    ScanStats,
+    TokenBucket,
+    call_with_backoff,
+    ordered_map,
+    paginate_with_backoff
+)
+from command_tracker import CommandTracker, print_summary
+from patch_daemon import DEFAULT_INTERVAL, DEFAULT_JITTER, PatchPolicy, run_cycle, run_daemon
+from patch_state_cache import DEFAULT_CACHE_PATH, PatchStateCache
+from patch_rollout import (
+    DEFAULT_COMMAND_TIMEOUT,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_MAX_ERRORS,
+    DEFAULT_WAVE_BY,
+    MAX_COMMAND_TARGETS,
+    plan_waves,
+    run_rollout
+)
+
+# describe_instances accepts up to 1000 results per page
+INSTANCE_PAGE_SIZE = 1000
+
+# describe_instance_information returns at most 50 results per page
+SSM_PAGE_SIZE = 50
+
+# describe_instance_patch_states accepts at most 50 instance IDs per call
+PATCH_STATE_BATCH_SIZE = 50
+
+# describe_instance_patches returns at most 50 patches per page
+PATCH_DETAIL_PAGE_SIZE = 50
+
+MISSING_PATCH_STATES = ('Missing', 'Failed')
+
+
+def chunked(iterable, size):
+    """Yield lists of up to size items from any iterable"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def parse_tag_filters(tag_args):
+    """Turn ['Env=prod', 'Role=web,api'] into {'Env': ['prod'], 'Role': ['web', 'api']}"""
+    tag_filters = {}
+    for tag_arg in tag_args or []:
+        key, sep, values = tag_arg.partition('=')
+        if not sep or not key:
+            raise ValueError(f"Invalid tag filter '{tag_arg}', expected KEY=VALUE[,VALUE...]")
+        tag_filters.setdefault(key, []).extend(v for v in values.split(',') if v)
+    return tag_filters
+
+
+def split_values(value):
+    """'a,b' -> ['a', 'b']; None for an empty option"""
+    return [item.strip() for item in value.split(',') if item.strip()] if value else None
+
+
+def build_instance_filters(tag_filters=None):
+    """EC2 API filters for running instances, optionally narrowed by tags"""
+    filters = [{'Name': 'instance-state-name', 'Values': ['running']}]
+    for key, values in (tag_filters or {}).items():
+        filters.append({'Name': f'tag:{key}', 'Values': list(values)})
+    return filters
+
+
+def iter_running_instances(ec2, tag_filters=None):
+    """Yield running instances one page at a time.
+
+    State and tag filtering happen server-side, and only one page of results
+    is held in memory, so this scales to very large accounts.
+    """
+    paginator = ec2.get_paginator('describe_instances')
+    pages = paginator.paginate(
+        Filters=build_instance_filters(tag_filters),
+        PaginationConfig={'PageSize': INSTANCE_PAGE_SIZE}
+    )
+    for page in pages:
+        for reservation in page['Reservations']:
+            yield from reservation['Instances']
+
+
+def get_ssm_managed_instances(ssm, limiter=None):
+    """Snapshot of every SSM-managed EC2 instance in the region.
+
+    Returns {instance_id: {'PingStatus', 'PlatformType', 'PlatformName'}},
+    built with one paginated call per 50 instances instead of one call per
+    instance.
+    """
+    managed = {}
+    pages = paginate_with_backoff(
+        limiter, ssm.describe_instance_information,
+        Filters=[{'Key': 'ResourceType', 'Values': ['EC2Instance']}],
+        MaxResults=SSM_PAGE_SIZE
+    )
+    for page in pages:
+        for info in page['InstanceInformationList']:
+            managed[info['InstanceId']] = {
+                'PingStatus': info.get('PingStatus'),
+                'PlatformType': info.get('PlatformType'),
+                'PlatformName': info.get('PlatformName')
+            }
+    return managed
+
+
+def get_tag_members(ssm, key, value, limiter=None):
+    """IDs of every SSM-managed node tagged key=value, i.e. what a tag Target reaches"""
+    pages = paginate_with_backoff(
+        limiter, ssm.describe_instance_information,
+        Filters=[{'Key': f'tag:{key}', 'Values': [value]}],
+        MaxResults=SSM_PAGE_SIZE
+    )
+    return {info['InstanceId'] for page in pages for info in page['InstanceInformationList']}
+
+
+def get_patch_states(ssm, instance_ids, limiter=None):
+    """Patch state summaries for instance IDs: {instance_id: state}
+
+    Each state already carries MissingCount, FailedCount, InstalledCount and
+    OperationEndTime, so no per-patch records are transferred. Instances that
+    have never run a patch scan are absent from the result.
+    """
+    states = {}
+    for batch in chunked(instance_ids, PATCH_STATE_BATCH_SIZE):
+        pages = paginate_with_backoff(limiter, ssm.describe_instance_patch_states,
+                                      InstanceIds=batch, MaxResults=PATCH_STATE_BATCH_SIZE)
+        for page in pages:
+            for state in page['InstancePatchStates']:
+                states[state['InstanceId']] = state
+    return states
+
+
+def count_missing_patches(patch_state):
+    """Missing plus failed patches from a patch state summary"""
+    return patch_state.get('MissingCount', 0) + patch_state.get('FailedCount', 0)
+
+
+def build_patch_filters(states=MISSING_PATCH_STATES, severities=None, classifications=None):
+    """describe_instance_patches Filters; values within one filter are ORed"""
+    filters = []
+    for key, values in (('State', states), ('Severity', severities), ('Classification', classifications)):
+        if values:
+            filters.append({'Key': key, 'Values': list(values)})
+    return filters
+
+
+def iter_instance_patches(ssm, instance_id, patch_filters=None, limiter=None):
+    """Lazily yield every patch for an instance matching patch_filters.
+
+    Filtering happens server-side and all pages are followed, so long
+    missing-patch lists are complete and installed patches are never
+    transferred. patch_filters defaults to Missing and Failed patches.
+    """
+    pages = paginate_with_backoff(
+        limiter, ssm.describe_instance_patches,
+        InstanceId=instance_id,
+        Filters=build_patch_filters() if patch_filters is None else patch_filters,
+        MaxResults=PATCH_DETAIL_PAGE_SIZE
+    )
+    for page in pages:
+        yield from page.get('Patches', [])
+
+
+def list_missing_patches(ssm, instance_id, limiter=None, patch_filters=None):
+    """Per-patch detail for one instance: patches in Missing or Failed state"""
+    return list(iter_instance_patches(ssm, instance_id, patch_filters, limiter))
+
+
+def scan_patch_states(ssm, instances, ssm_instances, limiter=None,
+                      workers=DEFAULT_WORKERS, stats=None, cache=None):
+    """Fetch patch states for a stream of instances on a thread pool.
+
+    Yields (instance, ssm_info, patch_state, failed) in the same order as the
+    input. Batches of 50 managed instances are fetched concurrently through
+    the shared limiter; failed is True when that batch's call errored. With a
+    PatchStateCache, only instances with a new patch operation are fetched.
+    """
+    fetch_patch_states = cache.get_patch_states if cache else get_patch_states
+
+    def fetch(batch):
+        managed_ids = [i['InstanceId'] for i in batch if i['InstanceId'] in ssm_instances]
+        if not managed_ids:
+            return batch, {}, False
+        try:
+            return batch, fetch_patch_states(ssm, managed_ids, limiter), False
+        except Exception as e:
+            print(f"❌ Error getting patch states: {e}")
+            return batch, {}, True
+
+    for batch, patch_states, failed in ordered_map(fetch, chunked(instances, PATCH_STATE_BATCH_SIZE), workers):
+        for instance in batch:
+            if stats:
+                stats.instances += 1
+            instance_id = instance['InstanceId']
+            yield instance, ssm_instances.get(instance_id), patch_states.get(instance_id), failed
+
+
+def get_instance_name(instance):
+    """Return the Name tag of an instance, or 'Unnamed'"""
+    for tag in instance.get('Tags', []):
+        if tag['Key'] == 'Name':
+            return tag['Value']
+    return "Unnamed"
+
+
 class EC2PatchManager:
-    def __init__(self):
-        """Initialize AWS clients"""
-        self.ec2 = boto3.client('ec2')
-        self.ssm = boto3.client('ssm')
+    def __init__(self, tag_filters=None, workers=DEFAULT_WORKERS, rate=DEFAULT_SSM_RATE,
+                 cache=None, session=None):
+        """Initialize AWS clients (from session, e.g. a simulated fleet, if given)"""
+        session = session or boto3.Session()
+        self.ec2 = session.client('ec2')
+        self.ssm = session.client('ssm')
+        # Scan calls go through our shared limiter, which retries throttles
+        # and transient errors, so botocore must not retry as well; size
+        # the pool for the worker threads
+        self.scan_ssm = session.client('ssm', config=Config(
+            max_pool_connections=max(10, workers),
+            retries={'mode': 'standard', 'max_attempts': 1}
+        ))
+        self.limiter = TokenBucket(rate)
+        self.workers = workers
+        self.tag_filters = tag_filters or {}
+        self.cache = cache
+        self._ssm_instances = None
         
+    def iter_instances(self):
+        """Stream running EC2 instances matching the tag filters"""
+        return iter_running_instances(self.ec2, self.tag_filters)
+    
     def get_all_instances(self):
-        """Get all EC2 instances in the region"""
+        """Get all running EC2 instances in the region"""
         try:
-            response = self.ec2.describe_instances()
-            instances = []
-            
-            for reservation in response['Reservations']:
-                for instance in reservation['Instances']:
-                    # Only include running instances
-                    if instance['State']['Name'] == 'running':
-                        instances.append(instance)
-            
+            instances = list(self.iter_instances())
             print(f"📊 Found {len(instances)} running EC2 instances")
             return instances
             
@@ -33,36 +257,27 @@ class EC2PatchManager:
             print(f"❌ Error getting instances: {e}")
             return []
     
+    def get_ssm_instances(self, refresh=False):
+        """SSM-managed instance snapshot, fetched once per run"""
+        if self._ssm_instances is None or refresh:
+            try:
+                self._ssm_instances = get_ssm_managed_instances(self.ssm)
+                print(f"🛰️  {len(self._ssm_instances)} instances are managed by SSM")
+            except Exception as e:
+                print(f"❌ Error listing SSM managed instances: {e}")
+                self._ssm_instances = {}
+        return self._ssm_instances
+    
     def is_instance_managed_by_ssm(self, instance_id):
         """Check if instance can be managed by SSM"""
-        try:
-            response = self.ssm.describe_instance_information(
-                Filters=[
-                    {
-                        'Key': 'InstanceIds',
-                        'Values': [instance_id]
-                    }
-                ]
-            )
-            return len(response['InstanceInformationList']) > 0
-        except Exception as e:
-            print(f"❌ Error checking SSM management for {instance_id}: {e}")
-            return False
+        return instance_id in self.get_ssm_instances()
     
-    def scan_instance_patches(self, instance_id):
-        """Scan instance for missing patches"""
+    def scan_instance_patches(self, instance_id, patch_filters=None):
+        """Scan instance for missing patches (optionally narrowed by patch_filters)"""
         try:
             print(f"🔍 Scanning patches for instance: {instance_id}")
             
-            response = self.ssm.describe_instance_patches(
-                InstanceId=instance_id
-            )
-            
-            # Count missing patches
-            missing_patches = []
-            for patch in response.get('Patches', []):
-                if patch.get('State') in ['Missing', 'Failed']:
-                    missing_patches.append(patch)
+            missing_patches = list_missing_patches(self.scan_ssm, instance_id, self.limiter, patch_filters)
             
             print(f"📦 Instance {instance_id} has {len(missing_patches)} missing patches")
             return missing_patches
@@ -71,8 +286,8 @@ class EC2PatchManager:
             print(f"❌ Error scanning patches for {instance_id}: {e}")
             return []
     
-    def install_missing_patches(self, instance_id):
-        """Install missing patches on instance"""
+    def install_missing_patches(self, instance_id, timeout=DEFAULT_COMMAND_TIMEOUT):
+        """Install missing patches on a single instance"""
         try:
             print(f"🚀 Installing patches on instance: {instance_id}")
             
@@ -82,7 +297,7 @@ class EC2PatchManager:
                 Parameters={
                     'Operation': ['Install']
                 },
-                TimeoutSeconds=600
+                TimeoutSeconds=timeout
             )
             
             command_id = response['Command']['CommandId']
@@ -93,65 +308,218 @@ class EC2PatchManager:
             print(f"❌ Error installing patches on {instance_id}: {e}")
             return None
     
-    def generate_patch_report(self, instances):
-        """Generate a simple patch compliance report"""
-        print("\n" + "="*50)
-        print("📋 PATCH MANAGEMENT REPORT")
-        print("="*50)
+    def install_patches_in_waves(self, instances, wave_by=DEFAULT_WAVE_BY,
+                                 wave_size=MAX_COMMAND_TARGETS, tag_targets=False,
+                                 timeout=DEFAULT_COMMAND_TIMEOUT,
+                                 max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                                 max_errors=DEFAULT_MAX_ERRORS, before_wave=None):
+        """Install missing patches wave by wave, one send_command per wave.
+
+        before_wave is passed to run_rollout. Returns (wave results,
+        tracker summary).
+        """
+        waves = plan_waves(instances, wave_by, wave_size, tag_targets,
+                           lambda key, value: get_tag_members(self.scan_ssm, key, value, self.limiter))
+        print(f"🗺️  Planned {len(waves)} waves by {wave_by}")
+        tracker = CommandTracker(self.scan_ssm, self.limiter)
+        # Sent on the no-retry client so call_with_backoff is the only retry layer
+        results = run_rollout(self.scan_ssm, waves, timeout=timeout,
+                              max_concurrency=max_concurrency, max_errors=max_errors,
+                              limiter=self.limiter, tracker=tracker, before_wave=before_wave)
+        return results, tracker.summary()
+    
+    def scan_patch_states(self, instances, stats=None):
+        """Concurrently fetch patch states; yields results in input order"""
+        return scan_patch_states(self.scan_ssm, instances, self.get_ssm_instances(),
+                                 self.limiter, self.workers, stats, self.cache)
+    
+    def generate_patch_report(self, instances, detail=False, patch_filters=None, verbose=True):
+        """Generate a simple patch compliance report
+
+        instances can be any iterable (e.g. iter_instances()), so the fleet is
+        never held in memory. Missing/failed counts come from patch state
+        summaries fetched 50 instances per call on a rate-limited thread
+        pool, printed in input order; with detail=True the
+        individual missing patches (narrowed by patch_filters, see
+        build_patch_filters) are listed for non-compliant instances.
+        verbose=False prints only the totals. Returns a summary with the
+        instance count, the SSM-managed instances (and their IDs) and their
+        missing patch counts, so callers don't need a second pass.
+        """
+        say = print if verbose else (lambda *args, **kwargs: None)
+        say("\n" + "="*50)
+        say("📋 PATCH MANAGEMENT REPORT")
+        say("="*50)
         
-        for instance in instances:
+        stats = ScanStats(self.limiter)
+        managed_instances = []
+        missing_counts = {}
+        for instance, ssm_info, patch_state, failed in self.scan_patch_states(instances, stats):
             instance_id = instance['InstanceId']
-            instance_name = "Unnamed"
+            instance_name = get_instance_name(instance)
             
-            # Try to get instance name from tags
-            for tag in instance.get('Tags', []):
-                if tag['Key'] == 'Name':
-                    instance_name = tag['Value']
-                    break
-            
-            print(f"\nInstance: {instance_name} ({instance_id})")
+            say(f"\nInstance: {instance_name} ({instance_id})")
             
             # Check SSM management
-            if self.is_instance_managed_by_ssm(instance_id):
-                patches = self.scan_instance_patches(instance_id)
-                status = "🟢 Compliant" if len(patches) == 0 else "🟡 Needs Patching"
-                print(f"  Status: {status}")
-                print(f"  Missing Patches: {len(patches)}")
-            else:
-                print(f"  Status: 🔴 Not managed by SSM")
+            if not ssm_info:
+                say(f"  Status: 🔴 Not managed by SSM")
+                continue
+            
+            managed_instances.append(instance)
+            say(f"  SSM: {ssm_info['PingStatus']} ({ssm_info['PlatformName'] or ssm_info['PlatformType']})")
+            if not patch_state:
+                if failed:
+                    say(f"  Status: ❔ Unknown (patch state lookup failed)")
+                else:
+                    say(f"  Status: ⚪ No patch data (run an AWS-RunPatchBaseline scan)")
+                continue
+            
+            missing_count = count_missing_patches(patch_state)
+            missing_counts[instance_id] = missing_count
+            status = "🟢 Compliant" if missing_count == 0 else "🟡 Needs Patching"
+            say(f"  Status: {status}")
+            say(f"  Missing Patches: {missing_count}")
+            
+            if detail and missing_count:
+                for patch in self.scan_instance_patches(instance_id, patch_filters):
+                    say(f"    - {patch.get('Title', patch.get('KBId'))} "
+                          f"({patch.get('Severity', 'Unspecified')}, {patch.get('State')})")
         
+        instance_count = stats.instances
         print("\n" + "="*50)
+        print(f"📊 Reported on {instance_count} running EC2 instances "
+              f"({len(managed_instances)} managed by SSM)")
+        print(stats.describe())
+        if self.cache:
+            print(self.cache.describe())
+        return {
+            'instance_count': instance_count,
+            'managed_instances': managed_instances,
+            'managed_instance_ids': [i['InstanceId'] for i in managed_instances],
+            'missing_counts': missing_counts
+        }
+
+def parse_args():
+    """Command line options"""
+    parser = argparse.ArgumentParser(description="Scan and patch EC2 instances with SSM")
+    parser.add_argument('--tag', action='append', metavar='KEY=VALUE[,VALUE]',
+                        help="Only include instances with this tag (repeatable)")
+    parser.add_argument('--detail', action='store_true',
+                        help="List individual missing patches for non-compliant instances")
+    parser.add_argument('--severity', metavar='SEVERITY[,SEVERITY...]',
+                        help="With --detail, only list patches of these severities (e.g. Critical,Important)")
+    parser.add_argument('--classification', metavar='CLASS[,CLASS...]',
+                        help="With --detail, only list patches of these classifications (e.g. SecurityUpdates)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help="Concurrent patch state requests")
+    parser.add_argument('--rate', type=float, default=DEFAULT_SSM_RATE,
+                        help="Maximum SSM API calls per second across all workers")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, metavar='PATH',
+                        help="SQLite patch state cache")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Fetch every patch state instead of only changed ones")
+    parser.add_argument('--max-age', type=float, default=0, metavar='SECONDS',
+                        help="Reuse cached patch states this recent without any call; older ones are "
+                             "checked with a compliance sweep (1 call per 100 instances)")
+    parser.add_argument('--trust-events', action='store_true',
+                        help="Reuse cached patch states until compliance_events.py marks them stale, "
+                             "skipping the compliance sweep")
+    parser.add_argument('--policy', metavar='FILE',
+                        help="Patch policy JSON; runs unattended instead of prompting")
+    parser.add_argument('--daemon', action='store_true',
+                        help="With --policy, repeat scan/install cycles until stopped")
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL / 3600, metavar='HOURS',
+                        help="Hours between daemon cycles")
+    parser.add_argument('--jitter', type=float, default=DEFAULT_JITTER,
+                        help="Random +/- fraction applied to each interval")
+    parser.add_argument('--max-cycles', type=int,
+                        help="Stop the daemon after this many cycles")
+    parser.add_argument('--initial-delay', type=float, metavar='MINUTES',
+                        help="Wait before the first cycle (default: random up to interval x jitter, "
+                             "none with --max-cycles 1)")
+    parser.add_argument('--quiet', action='store_true',
+                        help="Print only report totals, not every instance")
+    parser.add_argument('--wave-by', default=DEFAULT_WAVE_BY, metavar='az|patch-group|tag:KEY',
+                        help="How to group instances into rollout waves")
+    parser.add_argument('--wave-size', type=int, default=MAX_COMMAND_TARGETS,
+                        help=f"Instances per wave (at most {MAX_COMMAND_TARGETS})")
+    parser.add_argument('--tag-targets', action='store_true',
+                        help="Address each tag/patch-group wave by tag instead of instance IDs "
+                             "when the tag reaches exactly that wave's instances")
+    parser.add_argument('--max-concurrency', default=DEFAULT_MAX_CONCURRENCY,
+                        help="MaxConcurrency for each wave's command (count or percentage)")
+    parser.add_argument('--max-errors', default=DEFAULT_MAX_ERRORS,
+                        help="MaxErrors for each wave's command (count or percentage)")
+    parser.add_argument('--command-timeout', type=int, default=DEFAULT_COMMAND_TIMEOUT,
+                        help="Seconds before a patch command times out")
+    return parser.parse_args()
 
 def main():
     """Main function"""
+    args = parse_args()
     print("🚀 Starting EC2 Patch Management...")
     
     # Create patch manager
-    patch_manager = EC2PatchManager()
+    cache = None if args.no_cache else PatchStateCache(
+        args.cache, scope=boto3.Session().region_name or 'default', max_age=args.max_age,
+        trust_events=args.trust_events
+    )
+    patch_manager = EC2PatchManager(tag_filters=parse_tag_filters(args.tag),
+                                    workers=args.workers, rate=args.rate, cache=cache)
+    
+    if args.daemon and not args.policy:
+        print("❌ --daemon needs --policy")
+        return
+    if args.policy:
+        try:
+            policy = PatchPolicy.load(args.policy)
+        except (OSError, ValueError) as e:
+            print(f"❌ Invalid policy: {e}")
+            return
+        if args.daemon:
+            run_daemon(patch_manager, policy, interval=args.interval * 3600, jitter=args.jitter,
+                       max_cycles=args.max_cycles, detail=args.detail, verbose=not args.quiet,
+                       initial_delay=None if args.initial_delay is None else args.initial_delay * 60)
+        else:
+            run_cycle(patch_manager, policy, detail=args.detail, verbose=not args.quiet)
+        return
     
-    # Get all instances
-    instances = patch_manager.get_all_instances()
+    # Stream instances straight into the report
+    try:
+        patch_filters = build_patch_filters(severities=split_values(args.severity),
+                                            classifications=split_values(args.classification))
+        report = patch_manager.generate_patch_report(patch_manager.iter_instances(), detail=args.detail,
+                                                     patch_filters=patch_filters, verbose=not args.quiet)
+    except Exception as e:
+        print(f"❌ Error getting instances: {e}")
+        return
     
-    if not instances:
+    if not report['instance_count']:
         print("❌ No running EC2 instances found")
         return
     
-    # Generate report
-    patch_manager.generate_patch_report(instances)
-    
     # Ask user if they want to install patches
     choice = input("\n❓ Do you want to install missing patches? (yes/no): ").lower().strip()
     
     if choice in ['yes', 'y']:
-        for instance in instances:
-            instance_id = instance['InstanceId']
-            if patch_manager.is_instance_managed_by_ssm(instance_id):
-                patch_manager.install_missing_patches(instance_id)
-            else:
-                print(f"⚠️  Skipping {instance_id} - not managed by SSM")
+        skipped = report['instance_count'] - len(report['managed_instances'])
+        if skipped:
+            print(f"⚠️  Skipping {skipped} instances not managed by SSM")
+        
+        # Only SSM-managed instances from the report can receive commands
+        try:
+            results, summary = patch_manager.install_patches_in_waves(
+                report['managed_instances'], wave_by=args.wave_by, wave_size=args.wave_size,
+                tag_targets=args.tag_targets, timeout=args.command_timeout,
+                max_concurrency=args.max_concurrency, max_errors=args.max_errors
+            )
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
         
-        print("\n✅ Patch installation commands sent!")
-        print("💡 Check AWS Systems Manager → Run Command for status")
+        succeeded = len([r for r in results if r['status'] == 'Success'])
+        print_summary(summary)
+        print(f"\n📦 {succeeded}/{len(results)} waves succeeded")
     else:
         print("ℹ️  Patch installation skipped")
 
@@ -1,86 +1,617 @@
 #!/usr/bin/env python3
+import argparse
 import boto3
-import json
+import itertools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-def generate_patch_compliance_report():
-    ec2 = boto3.client('ec2')
-    ssm = boto3.client('ssm')
-    
-    print("🔄 Generating Patch Compliance Report...")
-    
-    # Get all instances
-    instances = ec2.describe_instances()
-    report_data = []
-    
-    for reservation in instances['Reservations']:
-        for instance in reservation['Instances']:
-            if instance['State']['Name'] == 'running':
-                instance_id = instance['InstanceId']
-                instance_name = "Unnamed"
-                
-                # Get instance name from tags
-                for tag in instance.get('Tags', []):
-                    if tag['Key'] == 'Name':
-                        instance_name = tag['Value']
-                        break
-                
-                # Check SSM management
-                try:
-                    ssm_info = ssm.describe_instance_information(
-                        Filters=[{'Key': 'InstanceIds', 'Values': [instance_id]}]
-                    )
-                    ssm_managed = len(ssm_info['InstanceInformationList']) > 0
-                except:
-                    ssm_managed = False
-                
-                # Get patch compliance
-                if ssm_managed:
-                    try:
-                        patches = ssm.describe_instance_patches(InstanceId=instance_id)
-                        missing_patches = len([p for p in patches.get('Patches', []) 
-                                             if p.get('State') in ['Missing', 'Failed']])
-                        compliance_status = "COMPLIANT" if missing_patches == 0 else "NON_COMPLIANT"
-                    except:
-                        missing_patches = "Unknown"
-                        compliance_status = "UNKNOWN"
-                else:
-                    missing_patches = "N/A"
-                    compliance_status = "NOT_MANAGED"
-                
-                report_data.append({
-                    'InstanceId': instance_id,
-                    'InstanceName': instance_name,
-                    'SSMManaged': ssm_managed,
-                    'MissingPatches': missing_patches,
-                    'ComplianceStatus': compliance_status,
-                    'LastChecked': datetime.now().isoformat()
-                })
-    
+from botocore.config import Config
+
+from concurrent_scan import (
+    DEFAULT_SSM_RATE,
+    DEFAULT_WORKERS,
+    ScanStats,
+    TokenBucket,
+    ordered_map,
+    paginate_with_backoff
+)
+from patch_history import DEFAULT_HISTORY_PATH, PatchHistory, run_scope
+from patch_report_writers import ReportSummary, abort_report_writer, open_report_writer
+from patch_state_cache import COMPLIANCE_PAGE_SIZE, DEFAULT_CACHE_PATH, PatchStateCache
+from ec2_patch_manager import (
+    PATCH_STATE_BATCH_SIZE,
+    chunked,
+    count_missing_patches,
+    get_patch_states,
+    get_instance_name,
+    get_ssm_managed_instances,
+    iter_running_instances,
+    build_patch_filters,
+    iter_instance_patches,
+    parse_tag_filters,
+    scan_patch_states,
+    split_values
+)
+
+DEFAULT_ROLE_NAME = 'OrganizationAccountAccessRole'
+DEFAULT_MAX_ACCOUNTS = 4
+DEFAULT_MAX_REGIONS_PER_ACCOUNT = 4
+
+# Rows buffered between the scan threads and the writers
+EVENT_QUEUE_SIZE = 1000
+
+# list_compliance_summaries returns at most 50 results per page
+COMPLIANCE_SUMMARY_PAGE_SIZE = 50
+
+PATCH_COMPLIANCE_FILTER = {'Key': 'ComplianceType', 'Values': ['Patch'], 'Type': 'EQUAL'}
+NON_COMPLIANT_FILTER = {'Key': 'Status', 'Values': ['NON_COMPLIANT'], 'Type': 'EQUAL'}
+
+# Severity buckets of a compliance SeveritySummary ('CriticalCount', ...)
+SEVERITIES = ('Critical', 'High', 'Medium', 'Low', 'Informational', 'Unspecified')
+
+
+def create_scan_clients(session, region=None, workers=DEFAULT_WORKERS):
+    """EC2 and SSM clients for one region of one account"""
+    ec2 = session.client('ec2', region_name=region)
+    # Throttles and transient errors are retried by call_with_backoff rather than botocore
+    ssm = session.client('ssm', region_name=region, config=Config(
+        max_pool_connections=max(10, workers),
+        retries={'mode': 'standard', 'max_attempts': 1}
+    ))
+    return ec2, ssm
+
+
+def collect_region_rows(ec2, ssm, tag_filters=None, detail=False, limiter=None,
+                        workers=DEFAULT_WORKERS, stats=None, cache=None, patch_filters=None):
+    """Yield one report row per running instance in a single account/region"""
+    # One paginated snapshot of SSM-managed instances for the whole run
+    try:
+        ssm_instances = get_ssm_managed_instances(ssm, limiter)
+    except Exception as e:
+        print(f"❌ Error listing SSM managed instances: {e}")
+        ssm_instances = {}
+
+    # Stream running instances (filtered server-side, all pages) and fetch
+    # patch state summaries for batches of 50 concurrently, in input order
+    instances = iter_running_instances(ec2, tag_filters)
+
+    for instance, ssm_info, patch_state, patch_states_failed in scan_patch_states(
+            ssm, instances, ssm_instances, limiter, workers, stats, cache):
+        instance_id = instance['InstanceId']
+        instance_name = get_instance_name(instance)
+
+        # Check SSM management
+        ssm_info = ssm_info or {}
+        ssm_managed = bool(ssm_info)
+        patch_state = patch_state or {}
+
+        # Get patch compliance
+        if not ssm_managed:
+            missing_patches = "N/A"
+            compliance_status = "NOT_MANAGED"
+        elif patch_state:
+            missing_patches = count_missing_patches(patch_state)
+            compliance_status = "COMPLIANT" if missing_patches == 0 else "NON_COMPLIANT"
+        elif patch_states_failed:
+            missing_patches = "Unknown"
+            compliance_status = "UNKNOWN"
+        else:
+            missing_patches = "N/A"
+            compliance_status = "NO_PATCH_DATA"
+
+        row = {
+            'InstanceId': instance_id,
+            'InstanceName': instance_name,
+            'SSMManaged': ssm_managed,
+            'PingStatus': ssm_info.get('PingStatus', 'N/A'),
+            'PlatformType': ssm_info.get('PlatformType', 'N/A'),
+            'MissingPatches': missing_patches,
+            'ComplianceStatus': compliance_status,
+            'OperationEndTime': str(patch_state.get('OperationEndTime', '')),
+            'LastChecked': datetime.now().isoformat()
+        }
+
+        # Per-patch detail only on request, and only where something is missing
+        if detail and compliance_status == "NON_COMPLIANT":
+            add_missing_patch_detail(ssm, row, patch_filters, limiter)
+
+        yield row
+
+
+def add_missing_patch_detail(ssm, row, patch_filters=None, limiter=None):
+    """Set row['MissingPatchDetail'] to one line per missing patch"""
+    try:
+        row['MissingPatchDetail'] = [
+            f"{p.get('Title', p.get('KBId'))} ({p.get('Severity', 'Unspecified')}, {p.get('State')})"
+            for p in iter_instance_patches(ssm, row['InstanceId'], patch_filters, limiter)
+        ]
+    except Exception as e:
+        print(f"❌ Error listing patches for {row['InstanceId']}: {e}")
+
+
+def new_rollup():
+    return {'Compliant': 0, 'NonCompliant': 0, 'Severity': dict.fromkeys(SEVERITIES, 0)}
+
+
+def merge_rollup(total, rollup):
+    """Add one region's rollup into total"""
+    total['Compliant'] += rollup['Compliant']
+    total['NonCompliant'] += rollup['NonCompliant']
+    for severity, count in rollup['Severity'].items():
+        total['Severity'][severity] += count
+    return total
+
+
+def rollup_rate(rollup):
+    reporting = rollup['Compliant'] + rollup['NonCompliant']
+    return rollup['Compliant'] / reporting * 100 if reporting else 0.0
+
+
+def get_compliance_rollup(ssm, limiter=None):
+    """Patch compliance counts for a whole region from list_compliance_summaries.
+
+    Returns {'Compliant': n, 'NonCompliant': n, 'Severity': {severity: n}},
+    where Severity breaks down the non-compliant instances. SSM aggregates
+    these server-side, so this is one call however large the fleet is. The
+    counts cover every managed instance that has reported patch compliance,
+    whatever its EC2 state or tags.
+    """
+    rollup = new_rollup()
+    pages = paginate_with_backoff(limiter, ssm.list_compliance_summaries,
+                                  Filters=[PATCH_COMPLIANCE_FILTER], MaxResults=COMPLIANCE_SUMMARY_PAGE_SIZE)
+    for page in pages:
+        for item in page.get('ComplianceSummaryItems', []):
+            if item.get('ComplianceType') != 'Patch':
+                continue
+            non_compliant = item.get('NonCompliantSummary', {})
+            rollup['Compliant'] += item.get('CompliantSummary', {}).get('CompliantCount', 0)
+            rollup['NonCompliant'] += non_compliant.get('NonCompliantCount', 0)
+            severity_summary = non_compliant.get('SeveritySummary', {})
+            for severity in SEVERITIES:
+                rollup['Severity'][severity] += severity_summary.get(f'{severity}Count', 0)
+    return rollup
+
+
+def iter_non_compliant_resources(ssm, limiter=None):
+    """Yield the Patch compliance summary of each non-compliant managed instance"""
+    pages = paginate_with_backoff(limiter, ssm.list_resource_compliance_summaries,
+                                  Filters=[PATCH_COMPLIANCE_FILTER, NON_COMPLIANT_FILTER],
+                                  MaxResults=COMPLIANCE_PAGE_SIZE)
+    for page in pages:
+        for item in page.get('ResourceComplianceSummaryItems', []):
+            if item.get('ResourceType', 'ManagedInstance') == 'ManagedInstance':
+                yield item
+
+
+def get_instances_by_id(ec2, instance_ids):
+    """{instance_id: instance} for EC2 instance IDs that still exist"""
+    if not instance_ids:
+        return {}
+    instances = {}
+    pages = ec2.get_paginator('describe_instances').paginate(
+        Filters=[{'Name': 'instance-id', 'Values': list(instance_ids)}]
+    )
+    for page in pages:
+        for reservation in page['Reservations']:
+            for instance in reservation['Instances']:
+                instances[instance['InstanceId']] = instance
+    return instances
+
+
+def collect_summary_rows(ec2, ssm, detail=False, limiter=None, workers=DEFAULT_WORKERS,
+                         stats=None, patch_filters=None):
+    """Yield report rows for the non-compliant instances only.
+
+    The instances come from list_resource_compliance_summaries, then each
+    batch of 50 gets one describe_instance_patch_states and one
+    describe_instances call for counts and names, fetched concurrently in
+    order. Compliant instances are never looked at individually.
+    """
+    def fetch(batch):
+        instance_ids = [item['ResourceId'] for item in batch]
+        try:
+            states, failed = get_patch_states(ssm, instance_ids, limiter), False
+        except Exception as e:
+            print(f"❌ Error getting patch states: {e}")
+            states, failed = {}, True
+        try:
+            instances = get_instances_by_id(ec2, [i for i in instance_ids if i.startswith('i-')])
+        except Exception as e:
+            print(f"❌ Error describing instances: {e}")
+            instances = {}
+        return batch, states, instances, failed
+
+    batches = chunked(iter_non_compliant_resources(ssm, limiter), PATCH_STATE_BATCH_SIZE)
+    for batch, states, instances, failed in ordered_map(fetch, batches, workers):
+        for item in batch:
+            instance_id = item['ResourceId']
+            patch_state = states.get(instance_id, {})
+            if patch_state:
+                missing_patches = count_missing_patches(patch_state)
+                compliance_status = "COMPLIANT" if missing_patches == 0 else "NON_COMPLIANT"
+            else:
+                # Fall back to the compliance summary's count of non-compliant patches
+                missing_patches = item.get('NonCompliantSummary', {}).get('NonCompliantCount', "Unknown")
+                compliance_status = "UNKNOWN" if failed else "NON_COMPLIANT"
+            instance = instances.get(instance_id)
+
+            row = {
+                'InstanceId': instance_id,
+                'InstanceName': get_instance_name(instance) if instance else "N/A",
+                'SSMManaged': True,
+                'PingStatus': 'N/A',
+                'PlatformType': 'N/A',
+                'MissingPatches': missing_patches,
+                'ComplianceStatus': compliance_status,
+                'OperationEndTime': str(patch_state.get('OperationEndTime', '')),
+                'LastChecked': datetime.now().isoformat()
+            }
+            if detail and compliance_status == "NON_COMPLIANT":
+                add_missing_patch_detail(ssm, row, patch_filters, limiter)
+            if stats:
+                stats.instances += 1
+            yield row
+
+
+def assume_role_session(account_id, role_name, base_session=None):
+    """boto3 session for role_name in account_id"""
+    sts = (base_session or boto3.Session()).client('sts')
+    credentials = sts.assume_role(
+        RoleArn=f"arn:aws:iam::{account_id}:role/{role_name}",
+        RoleSessionName='patch-compliance-report'
+    )['Credentials']
+    return boto3.Session(
+        aws_access_key_id=credentials['AccessKeyId'],
+        aws_secret_access_key=credentials['SecretAccessKey'],
+        aws_session_token=credentials['SessionToken']
+    )
+
+
+def get_enabled_regions(session):
+    """Regions enabled for the session's account (opted-out regions excluded)"""
+    ec2 = session.client('ec2', region_name=session.region_name or 'us-east-1')
+    return sorted(r['RegionName'] for r in ec2.describe_regions()['Regions'])
+
+
+def scan_account(account_id, role_name, regions, tag_filters, detail, workers, rate,
+                 max_regions, emit, base_session=None, cache_path=None, max_age=0,
+                 patch_filters=None, summary_only=False, trust_events=False):
+    """Scan every region of one account in parallel.
+
+    Rows are passed to emit('row', row) as they are produced, followed by
+    emit('region', (account_id, region, scan_text)) when a region finishes;
+    emit('error', (account_id, message)) reports an account that could not
+    be accessed. With summary_only, each region first emits
+    emit('rollup', (account_id, region, rollup)) and then rows for its
+    non-compliant instances only. Each region gets its own limiter because
+    SSM quotas apply per account and region.
+    """
+    try:
+        session = assume_role_session(account_id, role_name, base_session) if role_name else (base_session or boto3.Session())
+        account_regions = regions or get_enabled_regions(session)
+        # Clients are created up front - boto3 sessions are not thread-safe
+        clients = {region: create_scan_clients(session, region, workers) for region in account_regions}
+    except Exception as e:
+        print(f"❌ Error accessing account {account_id}: {e}")
+        emit('error', (account_id, str(e)))
+        return
+
+    def scan_region(region):
+        ec2, ssm = clients[region]
+        limiter = TokenBucket(rate)
+        stats = ScanStats(limiter)
+        cache = (PatchStateCache(cache_path, f"{account_id}/{region}", max_age, trust_events)
+                 if cache_path else None)
+        try:
+            if summary_only:
+                emit('rollup', (account_id, region, get_compliance_rollup(ssm, limiter)))
+                rows = collect_summary_rows(ec2, ssm, detail, limiter, workers, stats, patch_filters)
+            else:
+                rows = collect_region_rows(ec2, ssm, tag_filters, detail, limiter, workers, stats, cache,
+                                           patch_filters)
+            for row in rows:
+                row['AccountId'] = account_id
+                row['Region'] = region
+                emit('row', row)
+        except Exception as e:
+            print(f"❌ Error scanning {account_id}/{region}: {e}")
+        finally:
+            scan_text = stats.describe() + (f"\n      {cache.describe()}" if cache else "")
+            if cache:
+                cache.close()
+            emit('region', (account_id, region, scan_text))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_regions, len(account_regions)))) as executor:
+        list(executor.map(scan_region, account_regions))
+
+
+def iter_fleet_events(accounts, role_name=DEFAULT_ROLE_NAME, regions=None, tag_filters=None,
+                      detail=False, workers=DEFAULT_WORKERS, rate=DEFAULT_SSM_RATE,
+                      max_accounts=DEFAULT_MAX_ACCOUNTS, max_regions=DEFAULT_MAX_REGIONS_PER_ACCOUNT,
+                      cache_path=None, max_age=0, session=None, patch_filters=None,
+                      summary_only=False, trust_events=False):
+    """Fan out across accounts and regions, yielding (kind, payload) events.
+
+    Events are the ones passed to scan_account's emit, in the order they
+    happen: rows from one region stay in order, but regions interleave. The
+    scan threads block on a bounded queue, so memory does not grow with the
+    fleet even if the consumer is slow.
+    """
+    base_session = session or boto3.Session()
+    events = queue.Queue(maxsize=EVENT_QUEUE_SIZE)
+    done = object()
+
+    def emit(kind, payload):
+        events.put((kind, payload))
+
+    def run(account_id):
+        scan_account(account_id, role_name, regions, tag_filters, detail, workers, rate,
+                     max_regions, emit, base_session, cache_path, max_age, patch_filters, summary_only,
+                     trust_events)
+
+    def produce():
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_accounts, len(accounts)))) as executor:
+                list(executor.map(run, accounts))
+        finally:
+            events.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        event = events.get()
+        if event is done:
+            return
+        yield event
+
+
+def generate_patch_compliance_report(tag_filters=None, detail=False,
+                                     workers=DEFAULT_WORKERS, rate=DEFAULT_SSM_RATE,
+                                     accounts=None, role_name=DEFAULT_ROLE_NAME, regions=None,
+                                     max_accounts=DEFAULT_MAX_ACCOUNTS,
+                                     max_regions=DEFAULT_MAX_REGIONS_PER_ACCOUNT,
+                                     cache_path=DEFAULT_CACHE_PATH, max_age=0,
+                                     outputs=None, show_table=None,
+                                     history_path=DEFAULT_HISTORY_PATH, session=None,
+                                     patch_filters=None, summary_only=False, trust_events=False):
+    """Stream the report to the console and any outputs (paths or s3:// URLs).
+
+    Rows are never collected: each one is written to every output, printed
+    if the table is shown (by default only when there are no outputs) and
+    added to a running ReportSummary and, with a history_path, to the
+    PatchHistory store under the run's scope (accounts, regions and tag
+    filters), which its queries compare within. session overrides the
+    default boto3 session, e.g. with a simulated fleet.
+
+    summary_only takes the fleet totals from SSM's compliance summaries and
+    reports rows for non-compliant instances only. Tag filters, the patch
+    state cache and the history store don't apply to it, and the fleet
+    rollup dict is returned instead of the ReportSummary.
+    """
+    if summary_only and tag_filters:
+        raise ValueError("Summary mode covers every managed instance and can't filter by tag")
+    session = session or boto3.Session()
+    print("🔄 Generating Patch Compliance " + ("Summary..." if summary_only else "Report..."))
+    if summary_only:
+        cache_path = history_path = None
+
+    outputs = outputs or []
+    show_table = not outputs if show_table is None else show_table
+    # regions=[] (--regions all) still means a multi-region scan
+    multi_location = accounts is not None or regions is not None
+    stats = cache = None
+    scope = run_scope(tag_filters, accounts, regions)
+    if multi_location:
+        if not accounts:
+            # Current credentials only, across the requested regions
+            accounts, role_name = [session.client('sts').get_caller_identity()['Account']], None
+        events = iter_fleet_events(
+            accounts, role_name, regions, tag_filters, detail, workers, rate, max_accounts, max_regions,
+            cache_path, max_age, session, patch_filters, summary_only, trust_events
+        )
+    else:
+        ec2, ssm = create_scan_clients(session, workers=workers)
+        limiter = TokenBucket(rate)
+        stats = ScanStats(limiter)
+        cache = PatchStateCache(cache_path, ec2.meta.region_name, max_age, trust_events) if cache_path else None
+        scope = run_scope(tag_filters, regions=[ec2.meta.region_name])
+        if summary_only:
+            rollup_event = ('rollup', (None, ec2.meta.region_name, get_compliance_rollup(ssm, limiter)))
+            rows = collect_summary_rows(ec2, ssm, detail, limiter, workers, stats, patch_filters)
+            events = itertools.chain([rollup_event], (('row', row) for row in rows))
+        else:
+            events = (('row', row) for row in
+                      collect_region_rows(ec2, ssm, tag_filters, detail, limiter, workers, stats, cache,
+                                          patch_filters))
+
+    writers = [open_report_writer(output) for output in outputs]
+    summary = ReportSummary()
+    history = PatchHistory(history_path) if history_path else None
+    if history:
+        history.start_run(scope)
+    scan_notes, errors = {}, {}
+    fleet_rollup, rollups = new_rollup(), {}
+
     # Print report
-    print("\n" + "="*80)
-    print("📊 PATCH COMPLIANCE REPORT")
-    print("="*80)
-    print(f"{'Instance Name':<30} {'Instance ID':<20} {'SSM Managed':<12} {'Missing Patches':<16} {'Status':<15}")
-    print("-"*80)
-    
-    for instance in report_data:
-        print(f"{instance['InstanceName']:<30} {instance['InstanceId']:<20} "
-              f"{'Yes' if instance['SSMManaged'] else 'No':<12} "
-              f"{instance['MissingPatches']:<16} {instance['ComplianceStatus']:<15}")
-    
-    print("="*80)
-    
+    location_header = f"{'Account':<14} {'Region':<16} " if multi_location else ""
+    width = 80 + (31 if multi_location else 0)
+    if show_table:
+        print("\n" + "="*width)
+        print("📊 PATCH COMPLIANCE REPORT" + (" (NON-COMPLIANT INSTANCES)" if summary_only else ""))
+        print("="*width)
+        print(f"{location_header}{'Instance Name':<30} {'Instance ID':<20} {'SSM Managed':<12} {'Missing Patches':<16} {'Status':<15}")
+        print("-"*width)
+
+    try:
+        for kind, payload in events:
+            if kind == 'region':
+                account_id, region, scan_text = payload
+                summary.location(account_id, region)
+                scan_notes[(account_id, region)] = scan_text
+                continue
+            if kind == 'error':
+                account_id, message = payload
+                errors[account_id] = message
+                continue
+            if kind == 'rollup':
+                account_id, region, rollup = payload
+                rollups[(account_id, region)] = rollup
+                merge_rollup(fleet_rollup, rollup)
+                continue
+
+            instance = payload
+            summary.add(instance)
+            if history:
+                history.add(instance)
+            for writer in writers:
+                writer.write(instance)
+            if not show_table:
+                continue
+            location = f"{instance['AccountId']:<14} {instance['Region']:<16} " if multi_location else ""
+            print(f"{location}{instance['InstanceName']:<30} {instance['InstanceId']:<20} "
+                  f"{'Yes' if instance['SSMManaged'] else 'No':<12} "
+                  f"{instance['MissingPatches']:<16} {instance['ComplianceStatus']:<15}")
+            for patch in instance.get('MissingPatchDetail', []):
+                print(f"   🔍 {patch}")
+    except BaseException:
+        for writer in writers:
+            abort_report_writer(writer)
+        if history:
+            history.close()
+        raise
+    for writer in writers:
+        writer.close()
+    if history:
+        history.finish_run(summary)
+        regressions = history.regressions(scope=scope)
+        history.close()
+
+    if show_table:
+        print("="*width)
+    for output in outputs:
+        print(f"💾 Wrote {summary.total} rows to {output}")
+
+    if summary_only:
+        print_compliance_rollup(fleet_rollup, rollups if multi_location else {}, errors, scan_notes)
+        if stats:
+            print(f"   {stats.describe()}")
+        return fleet_rollup
+
+    # Per-account/region rollups
+    if multi_location:
+        print(f"\n🌍 ACCOUNT / REGION ROLLUP:")
+        print(f"   {'Account':<14} {'Region':<16} {'Total':>7} {'Managed':>8} {'Compliant':>10} {'Rate':>7}")
+        for account_id, message in sorted(errors.items()):
+            print(f"   {account_id:<14} {'-':<16} ❌ {message}")
+        for (account_id, region), rollup in sorted(summary.locations.items()):
+            rate_pct = rollup['Compliant'] / rollup['Total'] * 100 if rollup['Total'] else 0
+            print(f"   {account_id:<14} {region:<16} {rollup['Total']:>7} {rollup['Managed']:>8} "
+                  f"{rollup['Compliant']:>10} {rate_pct:>6.1f}%")
+            if (account_id, region) in scan_notes:
+                print(f"      {scan_notes[(account_id, region)]}")
+
     # Summary
-    total_instances = len(report_data)
-    compliant_instances = len([i for i in report_data if i['ComplianceStatus'] == 'COMPLIANT'])
-    managed_instances = len([i for i in report_data if i['SSMManaged']])
-    
     print(f"\n📈 SUMMARY:")
-    print(f"   Total Instances: {total_instances}")
-    print(f"   SSM Managed: {managed_instances}")
-    print(f"   Compliant: {compliant_instances}")
-    print(f"   Compliance Rate: {(compliant_instances/total_instances*100 if total_instances > 0 else 0):.1f}%")
+    print(f"   Total Instances: {summary.total}")
+    print(f"   SSM Managed: {summary.managed}")
+    print(f"   Compliant: {summary.compliant}")
+    print(f"   Compliance Rate: {summary.compliance_rate:.1f}%")
+    if stats:
+        print(f"   {stats.describe()}")
+    if cache:
+        print(f"   {cache.describe()}")
+        cache.close()
+    if history and regressions:
+        print(f"   ⚠️  {len(regressions)} instances regressed since the previous run "
+              f"(python patch_history.py regressions)")
+    return summary
+
+
+def print_compliance_rollup(fleet_rollup, rollups, errors, scan_notes):
+    """Print summary-mode totals, per account/region when there are several"""
+    if rollups or errors:
+        print(f"\n🌍 ACCOUNT / REGION ROLLUP:")
+        print(f"   {'Account':<14} {'Region':<16} {'Compliant':>10} {'Non-compliant':>14} {'Rate':>7}")
+        for account_id, message in sorted(errors.items()):
+            print(f"   {account_id:<14} {'-':<16} ❌ {message}")
+        for (account_id, region), rollup in sorted(rollups.items()):
+            print(f"   {account_id:<14} {region:<16} {rollup['Compliant']:>10} "
+                  f"{rollup['NonCompliant']:>14} {rollup_rate(rollup):>6.1f}%")
+            if (account_id, region) in scan_notes:
+                print(f"      {scan_notes[(account_id, region)]}")
+
+    print(f"\n📈 SUMMARY (from SSM compliance summaries):")
+    print(f"   Reporting Instances: {fleet_rollup['Compliant'] + fleet_rollup['NonCompliant']}")
+    print(f"   Compliant: {fleet_rollup['Compliant']}")
+    print(f"   Non-compliant: {fleet_rollup['NonCompliant']}")
+    print(f"   Compliance Rate: {rollup_rate(fleet_rollup):.1f}%")
+    severities = ', '.join(f"{severity} {count}" for severity, count in fleet_rollup['Severity'].items() if count)
+    if severities:
+        print(f"   Non-compliant by severity: {severities}")
 
 if __name__ == "__main__":
-    generate_patch_compliance_report()
+    parser = argparse.ArgumentParser(description="Patch compliance report for running EC2 instances")
+    parser.add_argument('--tag', action='append', metavar='KEY=VALUE[,VALUE]',
+                        help="Only include instances with this tag (repeatable)")
+    parser.add_argument('--summary', action='store_true',
+                        help="Fleet totals from SSM compliance summaries; rows for non-compliant instances only")
+    parser.add_argument('--detail', action='store_true',
+                        help="List individual missing patches for non-compliant instances")
+    parser.add_argument('--severity', metavar='SEVERITY[,SEVERITY...]',
+                        help="With --detail, only list patches of these severities (e.g. Critical,Important)")
+    parser.add_argument('--classification', metavar='CLASS[,CLASS...]',
+                        help="With --detail, only list patches of these classifications (e.g. SecurityUpdates)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help="Concurrent patch state requests per region")
+    parser.add_argument('--rate', type=float, default=DEFAULT_SSM_RATE,
+                        help="Maximum SSM API calls per second per account/region")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, metavar='PATH',
+                        help="SQLite patch state cache")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Fetch every patch state instead of only changed ones")
+    parser.add_argument('--max-age', type=float, default=0, metavar='SECONDS',
+                        help="Reuse cached patch states this recent without any call; older ones are "
+                             "checked with a compliance sweep (1 call per 100 instances)")
+    parser.add_argument('--trust-events', action='store_true',
+                        help="Reuse cached patch states until compliance_events.py marks them stale, "
+                             "skipping the compliance sweep")
+    parser.add_argument('--output', action='append', metavar='PATH|s3://BUCKET/KEY',
+                        help="Stream rows to a .csv, .ndjson/.jsonl or .parquet file or S3 object (repeatable)")
+    parser.add_argument('--table', action='store_true',
+                        help="Print the console table even when writing --output files")
+    parser.add_argument('--history', default=DEFAULT_HISTORY_PATH, metavar='PATH',
+                        help="SQLite history store this run is appended to")
+    parser.add_argument('--no-history', action='store_true',
+                        help="Don't record this run in the history store")
+    parser.add_argument('--accounts', metavar='ID[,ID...]',
+                        help="Account IDs to scan by assuming --role-name in each")
+    parser.add_argument('--role-name', default=DEFAULT_ROLE_NAME,
+                        help="Role to assume in each account")
+    parser.add_argument('--regions', metavar='REGION[,REGION...]|all',
+                        help="Regions to scan; 'all' means every enabled region")
+    parser.add_argument('--max-accounts', type=int, default=DEFAULT_MAX_ACCOUNTS,
+                        help="Accounts scanned in parallel")
+    parser.add_argument('--max-regions', type=int, default=DEFAULT_MAX_REGIONS_PER_ACCOUNT,
+                        help="Regions scanned in parallel within each account")
+    args = parser.parse_args()
+    if args.summary and args.tag:
+        parser.error("--summary covers every managed instance and can't be combined with --tag")
+
+    regions = split_values(args.regions)
+    if regions == ['all']:
+        # An empty list means enumerate enabled regions per account
+        regions = []
+    generate_patch_compliance_report(parse_tag_filters(args.tag), detail=args.detail,
+                                     workers=args.workers, rate=args.rate,
+                                     accounts=split_values(args.accounts), role_name=args.role_name,
+                                     regions=regions, max_accounts=args.max_accounts,
+                                     max_regions=args.max_regions,
+                                     cache_path=None if args.no_cache else args.cache,
+                                     max_age=args.max_age, outputs=args.output,
+                                     show_table=True if args.table else None,
+                                     history_path=None if args.no_history else args.history,
+                                     patch_filters=build_patch_filters(
+                                         severities=split_values(args.severity),
+                                         classifications=split_values(args.classification)),
+                                     summary_only=args.summary, trust_events=args.trust_events)
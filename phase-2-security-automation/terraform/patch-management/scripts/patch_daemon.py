@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Unattended patching for EC2PatchManager
+
+PatchPolicy (loaded from JSON) replaces the interactive yes/no prompt: it
+decides which instances may be patched automatically, how many per cycle,
+how the rollout is split into waves and which maintenance windows installs
+are allowed in. run_daemon repeats scan -> select -> install cycles with a
+jittered interval, reusing one EC2PatchManager so the clients, the adaptive
+rate limiter and the patch state cache persist across cycles. SIGINT and
+SIGTERM finish the current cycle and stop.
+
+Example policy (see ../policies/example_policy.json):
+
+    {
+      "auto_approve": true,
+      "min_missing_patches": 1,
+      "max_instances_per_cycle": 200,
+      "include_tags": {"Environment": ["dev", "staging"]},
+      "exclude_tags": {"PatchHold": ["true"]},
+      "maintenance_windows": [
+        {"days": ["Sat", "Sun"], "start": "02:00", "end": "05:00", "timezone": "UTC"}
+      ],
+      "rollout": {"wave_by": "az", "wave_size": 50, "max_concurrency": "25%", "max_errors": "1"}
+    }
+"""
+
+import json
+import random
+import signal
+import threading
+import time
+from datetime import datetime, time as dt_time, timezone
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:
+    ZoneInfo = None
+
+from command_tracker import print_summary
+from patch_rollout import (
+    DEFAULT_COMMAND_TIMEOUT,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_MAX_ERRORS,
+    DEFAULT_WAVE_BY,
+    MAX_COMMAND_TARGETS,
+    get_tag
+)
+
+DEFAULT_INTERVAL = 6 * 3600
+DEFAULT_JITTER = 0.1
+
+DAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+POLICY_KEYS = {'auto_approve', 'min_missing_patches', 'max_instances_per_cycle', 'include_tags',
+               'exclude_tags', 'maintenance_windows', 'rollout'}
+ROLLOUT_DEFAULTS = {
+    'wave_by': DEFAULT_WAVE_BY,
+    'wave_size': MAX_COMMAND_TARGETS,
+    'tag_targets': False,
+    'timeout': DEFAULT_COMMAND_TIMEOUT,
+    'max_concurrency': DEFAULT_MAX_CONCURRENCY,
+    'max_errors': DEFAULT_MAX_ERRORS
+}
+
+
+def parse_clock(value):
+    hours, _, minutes = value.partition(':')
+    return dt_time(int(hours), int(minutes or 0))
+
+
+class MaintenanceWindow:
+    """Weekly window such as Sat/Sun 02:00-05:00 in a timezone.
+
+    A window whose end is before its start runs past midnight; days name the
+    day it starts on.
+    """
+
+    def __init__(self, days=DAY_NAMES, start='00:00', end='23:59', timezone_name='UTC'):
+        unknown = [day for day in days if day not in DAY_NAMES]
+        if unknown:
+            raise ValueError(f"Unknown maintenance window days {unknown}, expected {', '.join(DAY_NAMES)}")
+        self.days = {DAY_NAMES.index(day) for day in days}
+        self.start = parse_clock(start)
+        self.end = parse_clock(end)
+        if timezone_name == 'UTC':
+            self.tz = timezone.utc
+        elif ZoneInfo is None:
+            raise ValueError("Maintenance window timezones other than UTC need Python 3.9+")
+        else:
+            self.tz = ZoneInfo(timezone_name)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('days', DAY_NAMES), data.get('start', '00:00'), data.get('end', '23:59'),
+                   data.get('timezone', 'UTC'))
+
+    def contains(self, now):
+        local = now.astimezone(self.tz)
+        clock = local.time()
+        weekday = local.weekday()
+        if self.start <= self.end:
+            return weekday in self.days and self.start <= clock < self.end
+        # Overnight: the evening part starts today, the morning part started yesterday
+        if clock >= self.start:
+            return weekday in self.days
+        return clock < self.end and (weekday - 1) % 7 in self.days
+
+
+class PatchPolicy:
+    """Rules for unattended patch approval"""
+
+    def __init__(self, auto_approve=False, min_missing_patches=1, max_instances_per_cycle=None,
+                 include_tags=None, exclude_tags=None, maintenance_windows=None, rollout=None):
+        self.auto_approve = auto_approve
+        self.min_missing_patches = min_missing_patches
+        self.max_instances_per_cycle = max_instances_per_cycle
+        self.include_tags = include_tags or {}
+        self.exclude_tags = exclude_tags or {}
+        self.maintenance_windows = [MaintenanceWindow.from_dict(w) for w in maintenance_windows or []]
+        unknown = set(rollout or {}) - set(ROLLOUT_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown rollout settings: {', '.join(sorted(unknown))}")
+        self.rollout = dict(ROLLOUT_DEFAULTS, **(rollout or {}))
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        unknown = set(data) - POLICY_KEYS
+        if unknown:
+            raise ValueError(f"Unknown policy settings in {path}: {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+    def in_maintenance_window(self, now=None):
+        """True if installs are allowed now (always, when no windows are set)"""
+        if not self.maintenance_windows:
+            return True
+        now = now or datetime.now(timezone.utc)
+        return any(window.contains(now) for window in self.maintenance_windows)
+
+    def allows(self, instance, missing_count):
+        if missing_count < self.min_missing_patches:
+            return False
+        for key, values in self.include_tags.items():
+            if get_tag(instance, key) not in values:
+                return False
+        for key, values in self.exclude_tags.items():
+            if get_tag(instance, key) in values:
+                return False
+        return True
+
+    def select(self, report):
+        """Instances from a generate_patch_report result that may be patched now"""
+        selected = [instance for instance in report['managed_instances']
+                    if self.allows(instance, report['missing_counts'].get(instance['InstanceId'], 0))]
+        if self.max_instances_per_cycle is not None:
+            selected = selected[:self.max_instances_per_cycle]
+        return selected
+
+
+def jittered(interval, jitter):
+    """interval scaled by a random factor in [1 - jitter, 1 + jitter]"""
+    return max(0.0, interval * (1 + random.uniform(-jitter, jitter)))
+
+
+def run_cycle(manager, policy, detail=False, verbose=False):
+    """One scan -> select -> install cycle; returns a small result dict"""
+    manager.get_ssm_instances(refresh=True)
+    if manager.cache:
+        manager.cache.start_pass()
+    report = manager.generate_patch_report(manager.iter_instances(), detail=detail, verbose=verbose)
+    result = {'instances': report['instance_count'], 'managed': len(report['managed_instances']),
+              'selected': 0, 'waves': 0, 'waves_succeeded': 0, 'installed': False}
+
+    if not policy.auto_approve:
+        print("ℹ️  Policy does not auto-approve installs")
+        return result
+    selected = policy.select(report)
+    result['selected'] = len(selected)
+    if not selected:
+        print("✅ Nothing to patch under the policy")
+        return result
+    if not policy.in_maintenance_window():
+        print(f"⏸️  {len(selected)} instances need patching; outside maintenance windows")
+        return result
+
+    # Checked again before every wave so a long rollout stops when the window closes
+    waves, summary = manager.install_patches_in_waves(selected, before_wave=policy.in_maintenance_window,
+                                                      **policy.rollout)
+    print_summary(summary)
+    result.update(installed=True, waves=len(waves),
+                  waves_succeeded=len([w for w in waves if w['status'] == 'Success']))
+    return result
+
+
+def run_daemon(manager, policy, interval=DEFAULT_INTERVAL, jitter=DEFAULT_JITTER,
+               max_cycles=None, detail=False, verbose=False, stop=None, initial_delay=None):
+    """Run cycles until stopped (SIGINT/SIGTERM, stop.set() or max_cycles).
+
+    initial_delay is the wait in seconds before the first cycle; by default
+    a random share of interval * jitter, or none for a single cycle.
+    """
+    stop = stop or threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+
+    # Spread the first cycle so many daemons started together don't scan
+    # together; a one-shot run (max_cycles=1) starts straight away
+    if initial_delay is None:
+        initial_delay = 0.0 if max_cycles == 1 else random.uniform(0, interval * jitter)
+    stop.wait(initial_delay)
+    cycles = 0
+    while not stop.is_set() and (max_cycles is None or cycles < max_cycles):
+        cycles += 1
+        started = time.monotonic()
+        print(f"\n🔁 Cycle {cycles} at {datetime.now(timezone.utc).isoformat(timespec='seconds')}")
+        try:
+            result = run_cycle(manager, policy, detail, verbose)
+            print(f"📋 Cycle {cycles}: {result['instances']} instances, {result['managed']} managed, "
+                  f"{result['selected']} selected, {result['waves_succeeded']}/{result['waves']} waves succeeded "
+                  f"in {time.monotonic() - started:.0f}s")
+        except Exception as e:
+            # Keep the daemon alive; the next cycle starts from a fresh scan
+            print(f"❌ Cycle {cycles} failed: {e}")
+        if max_cycles is not None and cycles >= max_cycles:
+            break
+        delay = jittered(interval, jitter)
+        print(f"💤 Next cycle in {delay / 60:.0f} min")
+        stop.wait(delay)
+    print("👋 Patch daemon stopped")
+    return cycles
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Patch compliance history
+
+Every compliance report run is appended to a SQLite store: one row in runs
+with the fleet totals, and one compact row per instance in instance_history
+(status codes rather than strings, no per-patch detail). Trend, mean time to
+patch and regression queries run against indexes on that store, so they
+answer fleet-wide questions without calling AWS.
+
+Each run records its scope (accounts, regions and tag filters, see
+run_scope) and every query only compares runs with the same scope, so a
+tag-filtered run next to a full-fleet one doesn't read as a compliance drop
+or a wave of regressions. Queries default to the scope of the latest
+finished run; --scope picks another (see scopes).
+
+    python patch_history.py scopes
+    python patch_history.py trend --limit 30
+    python patch_history.py mttp
+    python patch_history.py regressions
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+DEFAULT_HISTORY_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'patch-compliance', 'history.db')
+
+STATUS_CODES = {
+    'COMPLIANT': 0,
+    'NON_COMPLIANT': 1,
+    'UNKNOWN': 2,
+    'NO_PATCH_DATA': 3,
+    'NOT_MANAGED': 4
+}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+INSERT_BATCH_SIZE = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    total INTEGER,
+    managed INTEGER,
+    compliant INTEGER
+);
+CREATE TABLE IF NOT EXISTS instance_history (
+    instance_id TEXT NOT NULL,
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    account_id TEXT,
+    region TEXT,
+    status INTEGER NOT NULL,
+    missing INTEGER,
+    PRIMARY KEY (instance_id, run_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS instance_history_run ON instance_history (run_id, status);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started_at);
+"""
+
+# Applied in order on open; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    # 1: what each run covered; runs from before this are left with ''
+    [
+        "ALTER TABLE runs ADD COLUMN scope TEXT NOT NULL DEFAULT ''",
+        "CREATE INDEX IF NOT EXISTS runs_scope ON runs (scope, run_id)"
+    ]
+]
+
+
+def format_time(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def run_scope(tag_filters=None, accounts=None, regions=None):
+    """Canonical text for what a report run covered.
+
+    accounts None is the current credentials' account; regions None or []
+    is every enabled region. Order doesn't matter, so the same options
+    always give the same scope:
+    'accounts=current;regions=us-east-1;tags=Env=prod|staging'.
+    """
+    parts = [f"accounts={','.join(sorted(accounts)) if accounts else 'current'}",
+             f"regions={','.join(sorted(regions)) if regions else 'all'}"]
+    if tag_filters:
+        parts.append('tags=' + ','.join(f"{key}={'|'.join(sorted(set(values)))}"
+                                        for key, values in sorted(tag_filters.items())))
+    return ';'.join(parts)
+
+
+class PatchHistory:
+    """Append-only store of report runs with trend queries"""
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(SCHEMA)
+        self._migrate()
+        self._db.commit()
+        self.run_id = None
+        self._pending = []
+
+    def _migrate(self):
+        version = self._db.execute('PRAGMA user_version').fetchone()[0]
+        for number, statements in enumerate(MIGRATIONS[version:], version + 1):
+            for statement in statements:
+                self._db.execute(statement)
+            self._db.execute(f'PRAGMA user_version = {number}')
+
+    def close(self):
+        self._db.close()
+
+    # Recording
+
+    def start_run(self, scope=''):
+        """Open a new run covering scope (see run_scope); rows added afterwards belong to it"""
+        cursor = self._db.execute("INSERT INTO runs (started_at, scope) VALUES (?, ?)", (time.time(), scope))
+        self._db.commit()
+        self.run_id = cursor.lastrowid
+        return self.run_id
+
+    def add(self, row):
+        """Buffer one report row for the current run"""
+        missing = row.get('MissingPatches')
+        self._pending.append((
+            row['InstanceId'], self.run_id, row.get('AccountId'), row.get('Region'),
+            STATUS_CODES.get(row['ComplianceStatus'], STATUS_CODES['UNKNOWN']),
+            missing if isinstance(missing, int) else None
+        ))
+        if len(self._pending) >= INSERT_BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO instance_history "
+                "(instance_id, run_id, account_id, region, status, missing) VALUES (?, ?, ?, ?, ?, ?)",
+                self._pending
+            )
+            self._pending = []
+
+    def finish_run(self, summary):
+        """Store the run totals from a ReportSummary and commit"""
+        self._flush()
+        self._db.execute(
+            "UPDATE runs SET finished_at = ?, total = ?, managed = ?, compliant = ? WHERE run_id = ?",
+            (time.time(), summary.total, summary.managed, summary.compliant, self.run_id)
+        )
+        self._db.commit()
+
+    # Queries. scope None means the scope of the latest finished run.
+
+    def latest_scope(self):
+        row = self._db.execute(
+            "SELECT scope FROM runs WHERE finished_at IS NOT NULL ORDER BY run_id DESC LIMIT 1"
+        ).fetchone()
+        return row[0] if row else None
+
+    def scopes(self):
+        """[(scope, runs, last started_at)], most recently run first"""
+        return self._db.execute(
+            "SELECT scope, COUNT(*), MAX(started_at) FROM runs WHERE finished_at IS NOT NULL "
+            "GROUP BY scope ORDER BY MAX(run_id) DESC"
+        ).fetchall()
+
+    def latest_runs(self, count=2, scope=None):
+        scope = self.latest_scope() if scope is None else scope
+        rows = self._db.execute(
+            "SELECT run_id FROM runs WHERE finished_at IS NOT NULL AND scope = ? "
+            "ORDER BY run_id DESC LIMIT ?", (scope, count)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def compliance_trend(self, limit=30, scope=None):
+        """[(started_at, total, compliant, rate)] for the last limit runs, oldest first"""
+        scope = self.latest_scope() if scope is None else scope
+        rows = self._db.execute(
+            "SELECT started_at, total, compliant FROM runs WHERE finished_at IS NOT NULL AND scope = ? "
+            "ORDER BY started_at DESC LIMIT ?", (scope, limit)
+        ).fetchall()
+        return [(started, total, compliant, compliant / total * 100 if total else 0.0)
+                for started, total, compliant in reversed(rows)]
+
+    def mean_time_to_patch(self, instance_id=None, scope=None):
+        """Mean seconds from first NON_COMPLIANT run to the next COMPLIANT run.
+
+        Returns {instance_id: (mean_seconds, episodes)} over completed
+        episodes; instances still non-compliant are not included. Only runs
+        in scope count, so a run that didn't cover an instance can't close
+        or open one of its episodes.
+        """
+        query = ("SELECT h.instance_id, h.status, r.started_at FROM instance_history h "
+                 "JOIN runs r ON r.run_id = h.run_id "
+                 "WHERE r.scope = ? AND h.status IN (?, ?)")
+        params = [self.latest_scope() if scope is None else scope,
+                  STATUS_CODES['COMPLIANT'], STATUS_CODES['NON_COMPLIANT']]
+        if instance_id:
+            query += " AND h.instance_id = ?"
+            params.append(instance_id)
+        query += " ORDER BY h.instance_id, h.run_id"
+
+        durations = {}
+        current, opened = None, None
+        for row_instance, status, started_at in self._db.execute(query, params):
+            if row_instance != current:
+                current, opened = row_instance, None
+            if status == STATUS_CODES['NON_COMPLIANT']:
+                if opened is None:
+                    opened = started_at
+            elif opened is not None:
+                durations.setdefault(row_instance, []).append(started_at - opened)
+                opened = None
+        return {i: (sum(d) / len(d), len(d)) for i, d in durations.items()}
+
+    def regressions(self, run_id=None, previous_run_id=None, scope=None):
+        """Instances COMPLIANT in the previous run and NON_COMPLIANT in run_id.
+
+        Defaults to the two most recent finished runs in scope. Returns
+        [(instance_id, account_id, region, missing)].
+        """
+        if run_id is None or previous_run_id is None:
+            latest = self.latest_runs(2, scope)
+            if len(latest) < 2:
+                return []
+            run_id, previous_run_id = latest
+        return self._db.execute(
+            "SELECT cur.instance_id, cur.account_id, cur.region, cur.missing "
+            "FROM instance_history cur JOIN instance_history prev "
+            "ON prev.instance_id = cur.instance_id AND prev.run_id = ? "
+            "WHERE cur.run_id = ? AND cur.status = ? AND prev.status = ? "
+            "ORDER BY cur.account_id, cur.region, cur.instance_id",
+            (previous_run_id, run_id, STATUS_CODES['NON_COMPLIANT'], STATUS_CODES['COMPLIANT'])
+        ).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query patch compliance history")
+    parser.add_argument('--db', default=DEFAULT_HISTORY_PATH, help="History database")
+    parser.add_argument('--scope', help="Only compare runs with this scope (default: the latest run's)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('scopes', help="Scopes with recorded runs")
+    trend = commands.add_parser('trend', help="Compliance rate per run")
+    trend.add_argument('--limit', type=int, default=30)
+    mttp = commands.add_parser('mttp', help="Mean time to patch per instance")
+    mttp.add_argument('--instance')
+    mttp.add_argument('--limit', type=int, default=20, help="Slowest instances to show")
+    commands.add_parser('regressions', help="Instances that fell out of compliance since the last run")
+    args = parser.parse_args()
+
+    history = PatchHistory(args.db)
+    started = time.perf_counter()
+    scope = history.latest_scope() if args.scope is None else args.scope
+    if args.command != 'scopes':
+        print(f"🔎 Scope: {scope or '(not recorded)'}")
+    if args.command == 'scopes':
+        print(f"{'Runs':>6} {'Last run':<20} Scope")
+        for run_scope_text, runs, last_started in history.scopes():
+            print(f"{runs:>6} {format_time(last_started):<20} {run_scope_text or '(not recorded)'}")
+    elif args.command == 'trend':
+        print(f"{'Run':<20} {'Total':>7} {'Compliant':>10} {'Rate':>7}")
+        for started_at, total, compliant, rate in history.compliance_trend(args.limit, scope):
+            print(f"{format_time(started_at):<20} {total:>7} {compliant:>10} {rate:>6.1f}%")
+    elif args.command == 'mttp':
+        results = history.mean_time_to_patch(args.instance, scope)
+        if results:
+            episodes = sum(count for _, count in results.values())
+            fleet_mean = sum(mean * count for mean, count in results.values()) / episodes
+            print(f"📈 Fleet mean time to patch: {fleet_mean / 3600:.1f}h over {episodes} episodes")
+        slowest = sorted(results.items(), key=lambda item: item[1][0], reverse=True)[:args.limit]
+        for instance_id, (mean, count) in slowest:
+            print(f"   {instance_id:<20} {mean / 3600:>8.1f}h ({count} episodes)")
+    else:
+        regressions = history.regressions(scope=scope)
+        print(f"⚠️  {len(regressions)} instances regressed since the previous run")
+        for instance_id, account_id, region, missing in regressions:
+            location = f"{account_id}/{region} " if account_id else ""
+            print(f"   {location}{instance_id}: {missing if missing is not None else '?'} missing patches")
+    print(f"⏱️  {(time.perf_counter() - started) * 1000:.1f} ms")
+    history.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Streaming exports for the patch compliance report
+
+Each writer takes report rows one at a time and writes them straight to a
+local file or to S3, so memory use does not grow with the fleet: CSV and
+NDJSON write every row immediately, Parquet buffers one row group at a time,
+and S3 destinations are uploaded in 8 MiB multipart chunks as they fill.
+ReportSummary keeps running totals for the console summary.
+"""
+
+import csv
+import io
+import json
+import os
+
+import boto3
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+REPORT_FIELDS = [
+    'AccountId',
+    'Region',
+    'InstanceId',
+    'InstanceName',
+    'SSMManaged',
+    'PingStatus',
+    'PlatformType',
+    'MissingPatches',
+    'ComplianceStatus',
+    'OperationEndTime',
+    'LastChecked',
+    'MissingPatchDetail'
+]
+
+FORMAT_EXTENSIONS = {
+    '.csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.parquet': 'parquet'
+}
+
+# S3 multipart parts must be at least 5 MiB (except the last)
+S3_PART_SIZE = 8 * 1024 * 1024
+
+PARQUET_ROW_GROUP_SIZE = 10000
+
+
+class S3MultipartWriter(io.RawIOBase):
+    """Binary file object that uploads to s3://bucket/key in parts as it is written.
+
+    Objects smaller than one part are sent with a single put_object. Call
+    abort() instead of close() to discard a failed upload.
+    """
+
+    def __init__(self, bucket, key, s3=None, part_size=S3_PART_SIZE):
+        self.s3 = s3 or boto3.client('s3')
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.upload_id = None
+        self.parts = []
+        self.position = 0
+        self._buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def write(self, data):
+        self._buffer.extend(data)
+        self.position += len(data)
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+        return len(data)
+
+    def _upload_part(self, body):
+        if self.upload_id is None:
+            self.upload_id = self.s3.create_multipart_upload(Bucket=self.bucket, Key=self.key)['UploadId']
+        number = len(self.parts) + 1
+        response = self.s3.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                       PartNumber=number, Body=body)
+        self.parts.append({'PartNumber': number, 'ETag': response['ETag']})
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self.upload_id is None:
+                self.s3.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer))
+            else:
+                if self._buffer:
+                    self._upload_part(bytes(self._buffer))
+                self.s3.complete_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                                  MultipartUpload={'Parts': self.parts})
+        finally:
+            self._buffer = bytearray()
+            super().close()
+
+    def abort(self):
+        """Discard everything written so far"""
+        if self.upload_id is not None:
+            self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+        self._buffer = bytearray()
+        super().close()
+
+
+def open_destination(destination):
+    """Binary file object for a local path or s3://bucket/key"""
+    if destination.startswith('s3://'):
+        bucket, _, key = destination[5:].partition('/')
+        if not bucket or not key:
+            raise ValueError(f"Invalid S3 destination '{destination}', expected s3://bucket/key")
+        return S3MultipartWriter(bucket, key)
+    directory = os.path.dirname(os.path.abspath(destination))
+    os.makedirs(directory, exist_ok=True)
+    return open(destination, 'wb')
+
+
+class CsvReportWriter:
+    """One CSV line per row; patch detail is joined with '; '"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.text = io.TextIOWrapper(stream, encoding='utf-8', newline='', write_through=True)
+        self.writer = csv.DictWriter(self.text, fieldnames=REPORT_FIELDS, extrasaction='ignore')
+        self.writer.writeheader()
+
+    def write(self, row):
+        detail = row.get('MissingPatchDetail')
+        self.writer.writerow(dict(row, MissingPatchDetail='; '.join(detail) if detail else ''))
+
+    def close(self):
+        self.text.close()
+
+
+class NdjsonReportWriter:
+    """One JSON object per line"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, row):
+        self.stream.write(json.dumps(row, default=str).encode('utf-8') + b'\n')
+
+    def close(self):
+        self.stream.close()
+
+
+class ParquetReportWriter:
+    """Parquet with one row group per PARQUET_ROW_GROUP_SIZE rows.
+
+    MissingPatches is stored as a nullable integer: 'N/A' and 'Unknown'
+    become null, with the reason in ComplianceStatus.
+    """
+
+    def __init__(self, stream, row_group_size=PARQUET_ROW_GROUP_SIZE):
+        if pa is None:
+            raise ImportError("Parquet export requires pyarrow (pip install pyarrow)")
+        self.stream = stream
+        self.row_group_size = row_group_size
+        self.schema = pa.schema([
+            ('AccountId', pa.string()),
+            ('Region', pa.string()),
+            ('InstanceId', pa.string()),
+            ('InstanceName', pa.string()),
+            ('SSMManaged', pa.bool_()),
+            ('PingStatus', pa.string()),
+            ('PlatformType', pa.string()),
+            ('MissingPatches', pa.int64()),
+            ('ComplianceStatus', pa.string()),
+            ('OperationEndTime', pa.string()),
+            ('LastChecked', pa.string()),
+            ('MissingPatchDetail', pa.list_(pa.string()))
+        ])
+        self.writer = pq.ParquetWriter(pa.PythonFile(stream, mode='w'), self.schema)
+        self._rows = []
+
+    def write(self, row):
+        missing = row.get('MissingPatches')
+        self._rows.append(dict(
+            {field: row.get(field) for field in REPORT_FIELDS},
+            MissingPatches=missing if isinstance(missing, int) else None
+        ))
+        if len(self._rows) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            self.writer.write_table(pa.Table.from_pylist(self._rows, schema=self.schema))
+            self._rows = []
+
+    def close(self):
+        self._flush()
+        self.writer.close()
+        self.stream.close()
+
+
+WRITERS = {
+    'csv': CsvReportWriter,
+    'ndjson': NdjsonReportWriter,
+    'parquet': ParquetReportWriter
+}
+
+
+def open_report_writer(destination, report_format=None):
+    """Open a streaming writer, inferring the format from the extension"""
+    if not report_format:
+        extension = os.path.splitext(destination)[1].lower()
+        report_format = FORMAT_EXTENSIONS.get(extension)
+        if not report_format:
+            raise ValueError(f"Cannot infer report format for '{destination}', "
+                             f"use one of {', '.join(sorted(FORMAT_EXTENSIONS))}")
+    if report_format not in WRITERS:
+        raise ValueError(f"Unknown report format '{report_format}'")
+    if report_format == 'parquet' and pa is None:
+        raise ImportError("Parquet export requires pyarrow (pip install pyarrow)")
+    return WRITERS[report_format](open_destination(destination))
+
+
+def abort_report_writer(writer):
+    """Discard a writer's partial output where the destination supports it"""
+    stream = writer.stream
+    if isinstance(stream, S3MultipartWriter):
+        stream.abort()
+    else:
+        stream.close()
+
+
+class ReportSummary:
+    """Running totals for the report, overall and per account/region"""
+
+    def __init__(self):
+        self.total = 0
+        self.managed = 0
+        self.compliant = 0
+        self.by_status = {}
+        self.locations = {}
+
+    def add(self, row):
+        self.total += 1
+        managed = bool(row['SSMManaged'])
+        compliant = row['ComplianceStatus'] == 'COMPLIANT'
+        self.managed += managed
+        self.compliant += compliant
+        self.by_status[row['ComplianceStatus']] = self.by_status.get(row['ComplianceStatus'], 0) + 1
+
+        if 'AccountId' in row:
+            location = self.location(row['AccountId'], row['Region'])
+            location['Total'] += 1
+            location['Managed'] += managed
+            location['Compliant'] += compliant
+
+    def location(self, account_id, region):
+        return self.locations.setdefault((account_id, region),
+                                         {'Total': 0, 'Managed': 0, 'Compliant': 0})
+
+    @property
+    def compliance_rate(self):
+        return self.compliant / self.total * 100 if self.total else 0.0
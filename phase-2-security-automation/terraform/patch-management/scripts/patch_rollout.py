@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Wave-based patch rollout
+
+plan_waves groups instances by availability zone, patch group or any tag
+and splits each group into waves of at most 50 instances, the send_command
+InstanceIds limit. Each wave is one AWS-RunPatchBaseline command with
+MaxConcurrency/MaxErrors, and run_rollout only starts the next wave once the
+previous one has succeeded, so a bad patch never reaches a whole tier.
+Progress is followed with a CommandTracker shared across waves.
+"""
+
+import time
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, HTTPClientError
+
+from command_tracker import (
+    COMMAND_TERMINAL_STATUSES,
+    DEFAULT_POLL_INTERVAL,
+    TERMINAL_STATUSES,
+    CommandTracker,
+    format_event
+)
+from concurrent_scan import call_with_backoff, is_transient_error, paginate_with_backoff
+
+# send_command accepts at most 50 InstanceIds per call
+MAX_COMMAND_TARGETS = 50
+
+DEFAULT_WAVE_BY = 'az'
+DEFAULT_MAX_CONCURRENCY = '25%'
+DEFAULT_MAX_ERRORS = '1'
+DEFAULT_COMMAND_TIMEOUT = 3600
+
+PATCH_GROUP_TAGS = ('Patch Group', 'PatchGroup')
+
+# A send that fails with a transient error is only repeated after checking
+# (SEND_CHECK_DELAY seconds later) that SSM did not create the command
+SEND_ATTEMPTS = 3
+SEND_CHECK_DELAY = 5.0
+
+Wave = namedtuple('Wave', ['name', 'instance_ids', 'targets'])
+
+
+def get_tag(instance, key):
+    """Value of tag key on an instance, or None"""
+    for tag in instance.get('Tags', []):
+        if tag['Key'] == key:
+            return tag['Value']
+    return None
+
+
+def wave_tag(instance, wave_by):
+    """(tag key, value) that put an instance in its wave group, or None"""
+    if wave_by == 'patch-group':
+        for key in PATCH_GROUP_TAGS:
+            value = get_tag(instance, key)
+            if value:
+                return key, value
+        return None
+    if wave_by.startswith('tag:'):
+        value = get_tag(instance, wave_by[4:])
+        return (wave_by[4:], value) if value else None
+    return None
+
+
+def wave_group_key(instance, wave_by):
+    """Group name for an instance under wave_by ('az', 'patch-group' or 'tag:KEY')"""
+    if wave_by == 'az':
+        return instance.get('Placement', {}).get('AvailabilityZone') or 'unknown-az'
+    if wave_by == 'patch-group':
+        tag = wave_tag(instance, wave_by)
+        return tag[1] if tag else 'default'
+    if wave_by.startswith('tag:'):
+        tag = wave_tag(instance, wave_by)
+        return tag[1] if tag else 'untagged'
+    raise ValueError(f"Invalid wave grouping '{wave_by}', expected az, patch-group or tag:KEY")
+
+
+def plan_waves(instances, wave_by=DEFAULT_WAVE_BY, wave_size=MAX_COMMAND_TARGETS, tag_targets=False,
+               tag_members=None):
+    """Split instances into ordered rollout waves.
+
+    Groups are ordered by name and each is split into waves of up to
+    wave_size instances. With tag_targets=True and a tag:KEY or patch-group
+    grouping, a group becomes a single wave addressed by tag Targets
+    instead of InstanceIds, which has no 50-instance limit. That is only
+    done when the tag reaches exactly the group's instances:
+    tag_members(key, value) must return the IDs of every SSM-managed node
+    carrying the tag, and any group it doesn't match (instances filtered
+    out, untagged instances, a value shared by both patch group tags) is
+    sent by InstanceIds as usual.
+    """
+    if not 1 <= wave_size <= MAX_COMMAND_TARGETS:
+        raise ValueError(f"Wave size must be between 1 and {MAX_COMMAND_TARGETS}")
+    if tag_targets and wave_by == 'az':
+        raise ValueError("Tag targets need a tag:KEY or patch-group grouping")
+    if tag_targets and tag_members is None:
+        raise ValueError("Tag targets need tag_members to check which instances a tag reaches")
+
+    groups = {}
+    group_tags = {}
+    for instance in instances:
+        group = wave_group_key(instance, wave_by)
+        groups.setdefault(group, []).append(instance['InstanceId'])
+        group_tags.setdefault(group, set()).add(wave_tag(instance, wave_by))
+
+    waves = []
+    for group in sorted(groups):
+        instance_ids = groups[group]
+        tags = group_tags[group]
+        if tag_targets and len(tags) == 1 and None not in tags:
+            tag_key, value = next(iter(tags))
+            if set(tag_members(tag_key, value)) == set(instance_ids):
+                waves.append(Wave(group, instance_ids, [{'Key': f'tag:{tag_key}', 'Values': [value]}]))
+                continue
+            print(f"ℹ️  Tag {tag_key}={value} reaches other instances too; sending wave {group} by instance ID")
+        batches = [instance_ids[i:i + wave_size] for i in range(0, len(instance_ids), wave_size)]
+        for index, batch in enumerate(batches, 1):
+            name = group if len(batches) == 1 else f"{group} ({index}/{len(batches)})"
+            waves.append(Wave(name, batch, None))
+    return waves
+
+
+def find_sent_command(ssm, comment, sent_after, limiter=None):
+    """ID of the AWS-RunPatchBaseline command with this comment invoked after sent_after, or None"""
+    filters = [
+        {'key': 'DocumentName', 'value': 'AWS-RunPatchBaseline'},
+        {'key': 'InvokedAfter', 'value': sent_after.strftime('%Y-%m-%dT%H:%M:%SZ')}
+    ]
+    for page in paginate_with_backoff(limiter, ssm.list_commands, Filters=filters):
+        for command in page.get('Commands', []):
+            if command.get('Comment') == comment:
+                return command['CommandId']
+    return None
+
+
+def send_wave(ssm, wave, operation='Install', timeout=DEFAULT_COMMAND_TIMEOUT,
+              max_concurrency=DEFAULT_MAX_CONCURRENCY, max_errors=DEFAULT_MAX_ERRORS,
+              limiter=None):
+    """Start AWS-RunPatchBaseline for one wave and return the command ID.
+
+    send_command is not idempotent, so only throttled sends are retried
+    directly. After a transient failure (a timeout, a 5xx) SSM may still
+    have accepted the command: it is looked up by the wave's unique
+    comment and only sent again if it isn't there.
+    """
+    kwargs = {
+        'DocumentName': 'AWS-RunPatchBaseline',
+        'Parameters': {'Operation': [operation]},
+        'TimeoutSeconds': timeout,
+        'MaxConcurrency': max_concurrency,
+        'MaxErrors': max_errors,
+        'Comment': f"Patch rollout wave {wave.name}"[:87] + f" {uuid.uuid4().hex[:12]}"
+    }
+    if wave.targets:
+        kwargs['Targets'] = wave.targets
+    else:
+        kwargs['InstanceIds'] = wave.instance_ids
+    # Allow for clock skew against SSM's invocation time
+    sent_after = datetime.now(timezone.utc) - timedelta(minutes=5)
+    for attempt in range(SEND_ATTEMPTS):
+        try:
+            response = call_with_backoff(limiter, ssm.send_command, idempotent=False, **kwargs)
+            return response['Command']['CommandId']
+        except (ClientError, BotoConnectionError, HTTPClientError) as e:
+            if not is_transient_error(e) or attempt == SEND_ATTEMPTS - 1:
+                raise
+            time.sleep(SEND_CHECK_DELAY)
+            command_id = find_sent_command(ssm, kwargs['Comment'], sent_after, limiter)
+            if command_id:
+                print(f"ℹ️  Wave {wave.name} was sent before the error ({e}), Command ID: {command_id}")
+                return command_id
+            print(f"⚠️  Sending wave {wave.name} failed ({e}) and no command was created; sending again")
+
+
+def run_rollout(ssm, waves, operation='Install', timeout=DEFAULT_COMMAND_TIMEOUT,
+                max_concurrency=DEFAULT_MAX_CONCURRENCY, max_errors=DEFAULT_MAX_ERRORS,
+                poll_interval=DEFAULT_POLL_INTERVAL, limiter=None, tracker=None, before_wave=None):
+    """Run waves in order, stopping at the first wave that does not succeed.
+
+    Instances are printed as the tracker sees them finish; pass a
+    tracker to read its summary afterwards. before_wave, if given, is
+    called before each wave is sent and a False return stops the rollout
+    there (e.g. when a maintenance window closes). Returns a list of
+    {'wave', 'instance_count', 'command_id', 'status'}; waves after a failure
+    or a stop are reported with status 'Skipped'.
+    """
+    tracker = tracker or CommandTracker(ssm, limiter, poll_interval)
+    results = []
+    halted = False
+    for number, wave in enumerate(waves, 1):
+        result = {'wave': wave.name, 'instance_count': len(wave.instance_ids),
+                  'command_id': None, 'status': 'Skipped'}
+        results.append(result)
+        if halted:
+            continue
+        if before_wave and not before_wave():
+            print(f"⏸️  Stopping before wave {number}/{len(waves)}: {wave.name}")
+            halted = True
+            continue
+
+        print(f"🌊 Wave {number}/{len(waves)}: {wave.name} ({len(wave.instance_ids)} instances)")
+        try:
+            result['command_id'] = send_wave(ssm, wave, operation, timeout,
+                                             max_concurrency, max_errors, limiter)
+            tracker.track(result['command_id'], [] if wave.targets else wave.instance_ids)
+            # Allow for delivery on top of the document's execution timeout
+            for event in tracker.events(timeout=timeout * 2):
+                if event.status in TERMINAL_STATUSES:
+                    print(format_event(event))
+            result['status'] = tracker.command_status(result['command_id'])
+            if result['status'] not in COMMAND_TERMINAL_STATUSES:
+                result['status'] = 'TimedOut'
+        except Exception as e:
+            print(f"❌ Error running wave {wave.name}: {e}")
+            result['status'] = 'Error'
+
+        if result['status'] == 'Success':
+            print(f"✅ Wave {wave.name} succeeded, Command ID: {result['command_id']}")
+        else:
+            print(f"🛑 Wave {wave.name} ended with {result['status']}, halting rollout")
+            halted = True
+    return results
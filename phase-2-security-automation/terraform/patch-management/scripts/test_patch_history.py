@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+PatchHistory queries across runs with different scopes
+
+Records full-fleet and tag-filtered runs into one store and checks that
+trend, mean time to patch and regressions only compare runs with the same
+scope, and that a store from before scopes were recorded is migrated.
+
+    python -m unittest test_patch_history
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import patch_history
+from patch_history import SCHEMA, PatchHistory, run_scope
+
+FLEET = run_scope(regions=['us-east-1'])
+WEB = run_scope({'Role': ['web']}, regions=['us-east-1'])
+
+
+def row(instance_id, status):
+    return {'InstanceId': instance_id, 'ComplianceStatus': status,
+            'MissingPatches': 0 if status == 'COMPLIANT' else 3}
+
+
+class ScopeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.history = PatchHistory(':memory:')
+        self.clock = 0
+
+    def tearDown(self):
+        self.history.close()
+
+    def record(self, scope, statuses):
+        self.clock += 3600
+        with mock.patch.object(patch_history.time, 'time', return_value=self.clock):
+            self.history.start_run(scope)
+            for instance_id, status in statuses.items():
+                self.history.add(row(instance_id, status))
+            compliant = sum(status == 'COMPLIANT' for status in statuses.values())
+            self.history.finish_run(SimpleNamespace(total=len(statuses), managed=len(statuses),
+                                                    compliant=compliant))
+        return self.history.run_id
+
+    def test_scope_is_canonical(self):
+        self.assertEqual(run_scope({'Role': ['web', 'api'], 'Env': ['prod']}, ['2', '1'], ['us-west-2', 'us-east-1']),
+                         run_scope({'Env': ['prod'], 'Role': ['api', 'web']}, ['1', '2'], ['us-east-1', 'us-west-2']))
+        self.assertEqual(run_scope(), 'accounts=current;regions=all')
+        self.assertEqual(run_scope(regions=[]), run_scope())
+
+    def test_regressions_skip_runs_with_another_scope(self):
+        # i-1 is compliant fleet-wide, then a web-only run misses it and
+        # finds i-2 non-compliant; neither is a regression of the other
+        self.record(FLEET, {'i-1': 'COMPLIANT', 'i-2': 'COMPLIANT'})
+        self.record(WEB, {'i-2': 'NON_COMPLIANT'})
+        self.assertEqual(self.history.regressions(), [])
+        fleet_run = self.record(FLEET, {'i-1': 'NON_COMPLIANT', 'i-2': 'COMPLIANT'})
+        self.assertEqual(self.history.latest_runs(scope=FLEET)[0], fleet_run)
+        self.assertEqual([r[0] for r in self.history.regressions(scope=FLEET)], ['i-1'])
+        self.assertEqual(self.history.regressions(scope=WEB), [])
+
+    def test_trend_and_mttp_stay_in_scope(self):
+        self.record(FLEET, {'i-1': 'NON_COMPLIANT', 'i-2': 'COMPLIANT'})
+        self.record(WEB, {'i-1': 'COMPLIANT'})
+        self.record(FLEET, {'i-1': 'NON_COMPLIANT', 'i-2': 'COMPLIANT'})
+        self.record(FLEET, {'i-1': 'COMPLIANT', 'i-2': 'COMPLIANT'})
+
+        self.assertEqual([rate for *_, rate in self.history.compliance_trend(scope=FLEET)], [50.0, 50.0, 100.0])
+        self.assertEqual([rate for *_, rate in self.history.compliance_trend(scope=WEB)], [100.0])
+        # Without the web run closing it, i-1's one episode spans three hours
+        self.assertEqual(self.history.mean_time_to_patch(scope=FLEET), {'i-1': (3 * 3600, 1)})
+        self.assertEqual(self.history.mean_time_to_patch(), self.history.mean_time_to_patch(scope=FLEET))
+
+
+class MigrationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix='test-patch-history-')
+        self.path = os.path.join(self.work_dir, 'history.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_runs_from_before_scopes_are_kept_apart(self):
+        db = sqlite3.connect(self.path)
+        db.executescript(SCHEMA)
+        db.execute("INSERT INTO runs (started_at, finished_at, total, managed, compliant) VALUES (1, 2, 5, 5, 5)")
+        db.commit()
+        db.close()
+
+        history = PatchHistory(self.path)
+        self.addCleanup(history.close)
+        self.assertEqual(history._db.execute('PRAGMA user_version').fetchone()[0], len(patch_history.MIGRATIONS))
+        self.assertEqual(history.latest_scope(), '')
+        history.start_run(FLEET)
+        history.finish_run(SimpleNamespace(total=4, managed=4, compliant=2))
+        self.assertEqual(len(history.compliance_trend()), 1)
+        self.assertEqual([scope for scope, *_ in history.scopes()], [FLEET, ''])
+
+
+if __name__ == '__main__':
+    unittest.main()
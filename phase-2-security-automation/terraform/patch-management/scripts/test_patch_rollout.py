@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+send_wave when send_command fails after SSM may have accepted it
+
+Runs against a FleetSimulator region whose send_command times out, either
+after the command was created or before. No AWS calls are made.
+
+    python -m unittest test_patch_rollout
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+from botocore.exceptions import ReadTimeoutError
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+import patch_rollout  # noqa: E402
+from concurrent_scan import call_with_backoff  # noqa: E402
+from fleet_simulator import FakeSSM, FleetSimulator  # noqa: E402
+from patch_rollout import Wave, send_wave  # noqa: E402
+
+INSTANCE_IDS = ['i-00000000000000001', 'i-00000000000000002']
+
+
+class TimingOutSSM(FakeSSM):
+    """FakeSSM whose first send_command times out, after or before SSM accepts it"""
+
+    def __init__(self, simulator, accepted):
+        super().__init__(simulator)
+        self.accepted = accepted
+        self.timeouts = 1
+
+    def send_command(self, **kwargs):
+        if self.timeouts:
+            self.timeouts -= 1
+            if self.accepted:
+                super().send_command(**kwargs)
+            raise ReadTimeoutError(endpoint_url='https://ssm.us-east-1.amazonaws.com/')
+        return super().send_command(**kwargs)
+
+
+@mock.patch.object(patch_rollout, 'SEND_CHECK_DELAY', 0)
+class SendWaveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sim = FleetSimulator(size=10, api_tps=0, latency_ms=0)
+        self.wave = Wave('us-east-1a', INSTANCE_IDS, None)
+
+    def test_timeout_after_the_command_was_accepted_does_not_resend(self):
+        ssm = TimingOutSSM(self.sim, accepted=True)
+        command_id = send_wave(ssm, self.wave)
+        self.assertEqual(list(self.sim.commands), [command_id])
+        self.assertEqual(self.sim.calls['SendCommand'], 1)
+
+    def test_timeout_before_the_command_was_accepted_sends_again(self):
+        ssm = TimingOutSSM(self.sim, accepted=False)
+        command_id = send_wave(ssm, self.wave)
+        self.assertEqual(list(self.sim.commands), [command_id])
+        self.assertEqual(self.sim.calls['SendCommand'], 1)
+        self.assertEqual(self.sim.calls['ListCommands'], 1)
+
+    def test_other_waves_commands_are_not_mistaken_for_this_one(self):
+        send_wave(FakeSSM(self.sim), self.wave)
+        ssm = TimingOutSSM(self.sim, accepted=False)
+        command_id = send_wave(ssm, self.wave)
+        self.assertEqual(len(self.sim.commands), 2)
+        self.assertEqual(command_id, 'sim-00000002')
+
+    def test_non_idempotent_calls_are_not_retried_on_timeouts(self):
+        ssm = TimingOutSSM(self.sim, accepted=True)
+        with self.assertRaises(ReadTimeoutError):
+            call_with_backoff(None, ssm.send_command, idempotent=False,
+                              DocumentName='AWS-RunPatchBaseline', InstanceIds=INSTANCE_IDS)
+        self.assertEqual(len(self.sim.commands), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
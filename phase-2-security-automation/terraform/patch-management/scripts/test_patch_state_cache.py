@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+PatchStateCache.status_counts with events newer than the stored states
+
+Replays events/sample_events.ndjson over cached patch states and checks
+which source each instance is counted from, and how many SSM calls an
+online refresh costs against a FleetSimulator region. No AWS calls are
+made.
+
+    python -m unittest test_patch_state_cache
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+from compliance_events import ComplianceEventConsumer, read_events
+from patch_state_cache import PatchStateCache
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+from fleet_simulator import FakeSSM, FleetSimulator  # noqa: E402
+
+SAMPLE_EVENTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'events', 'sample_events.ndjson')
+SCOPE = '123456789012/us-east-1'
+INSTANCES = ['i-00000000000000001', 'i-00000000000000002']
+
+
+def patch_state(instance_id, missing):
+    return {'InstanceId': instance_id, 'MissingCount': missing, 'FailedCount': 0,
+            'OperationEndTime': '2024-05-01 09:00:00+00:00'}
+
+
+class StatusCountsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = PatchStateCache(':memory:', scope=SCOPE)
+        # Both instances were compliant when last fetched
+        self.cache._store(INSTANCES, {i: patch_state(i, 0) for i in INSTANCES},
+                          {i: '2024-05-01T09:00:00Z' for i in INSTANCES})
+        ComplianceEventConsumer(self.cache, offline=True).apply(read_events(SAMPLE_EVENTS))
+
+    def tearDown(self):
+        self.cache.close()
+
+    def test_stale_entries_use_the_event_status(self):
+        # i-...02 went non_compliant after its fetch; i-...03 is only known from events
+        self.assertEqual(self.cache.status_counts(), {'COMPLIANT': 1, 'NON_COMPLIANT': 2})
+
+    def test_state_fetched_after_the_event_wins(self):
+        self.cache._store(INSTANCES[1:], {INSTANCES[1]: patch_state(INSTANCES[1], 0)},
+                          {INSTANCES[1]: '2024-05-01T10:10:00Z'})
+        self.assertEqual(self.cache.status_counts(), {'COMPLIANT': 2, 'NON_COMPLIANT': 1})
+
+
+class RefreshCallsTest(unittest.TestCase):
+
+    def test_refresh_sweeps_execution_times_once(self):
+        sim = FleetSimulator(size=1000, api_tps=0, latency_ms=0)
+        cache = PatchStateCache(':memory:', scope=SCOPE)
+        consumer = ComplianceEventConsumer(cache, FakeSSM(sim))
+        events = read_events(SAMPLE_EVENTS)
+        consumer.apply(events)
+        sweep_calls = sim.calls['ListResourceComplianceSummaries']
+        consumer.apply(events)
+        swept = len(cache.execution_times(None))
+        cache.close()
+        # One sweep (100 instances per page) reused by both batches, one
+        # patch state call per batch and no per-instance calls
+        self.assertEqual(sweep_calls, -(-swept // 100))
+        self.assertEqual(sim.calls['ListResourceComplianceSummaries'], sweep_calls)
+        self.assertEqual(sim.calls['DescribeInstancePatchStates'], 2)
+        self.assertEqual(set(sim.calls), {'ListResourceComplianceSummaries', 'DescribeInstancePatchStates'})
+
+    def test_trusting_events_skips_the_sweep(self):
+        sim = FleetSimulator(size=1000, api_tps=0, latency_ms=0)
+        instance_ids = [sim.instance_id(i) for i in range(1, 101)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'patch_states.db')
+            cache = PatchStateCache(path, scope=SCOPE)
+            cache.get_patch_states(FakeSSM(sim), instance_ids)
+            cache.invalidate(instance_ids[:3])
+            cache.close()
+
+            sim.reset_counters()
+            trusting = PatchStateCache(path, scope=SCOPE, trust_events=True)
+            trusting.get_patch_states(FakeSSM(sim), instance_ids)
+            trusting.close()
+        # Only the three invalidated instances are fetched, in one call
+        self.assertEqual(dict(sim.calls), {'DescribeInstancePatchStates': 1})
+        self.assertEqual((trusting.hits, trusting.refreshed), (97, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
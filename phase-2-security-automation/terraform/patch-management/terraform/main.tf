@@ -110,3 +110,72 @@ resource "aws_instance" "non_ssm_instance" {
     Component   = "patch-management"
   }
 }
+
+# EventBridge -> SQS feed of SSM compliance and Run Command events, consumed
+# by scripts/compliance_events.py to keep the patch state cache current
+resource "aws_sqs_queue" "compliance_events" {
+  count = var.enable_compliance_events ? 1 : 0
+
+  name                      = "${var.project_name}-compliance-events"
+  message_retention_seconds = 345600
+  receive_wait_time_seconds = 20
+
+  tags = {
+    Environment = var.environment
+    Project     = var.project_name
+    Component   = "patch-management"
+  }
+}
+
+resource "aws_cloudwatch_event_rule" "ssm_compliance_events" {
+  count = var.enable_compliance_events ? 1 : 0
+
+  name        = "${var.project_name}-ssm-compliance-events"
+  description = "Patch compliance changes and AWS-RunPatchBaseline invocation status"
+
+  event_pattern = jsonencode({
+    source = ["aws.ssm"]
+    "detail-type" = [
+      "Configuration Compliance State Change",
+      "EC2 Command Invocation Status-change Notification"
+    ]
+  })
+
+  tags = {
+    Environment = var.environment
+    Project     = var.project_name
+    Component   = "patch-management"
+  }
+}
+
+resource "aws_cloudwatch_event_target" "ssm_compliance_events" {
+  count = var.enable_compliance_events ? 1 : 0
+
+  rule = aws_cloudwatch_event_rule.ssm_compliance_events[0].name
+  arn  = aws_sqs_queue.compliance_events[0].arn
+}
+
+resource "aws_sqs_queue_policy" "compliance_events" {
+  count = var.enable_compliance_events ? 1 : 0
+
+  queue_url = aws_sqs_queue.compliance_events[0].id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Principal = {
+          Service = "events.amazonaws.com"
+        }
+        Action   = "sqs:SendMessage"
+        Resource = aws_sqs_queue.compliance_events[0].arn
+        Condition = {
+          ArnEquals = {
+            "aws:SourceArn" = aws_cloudwatch_event_rule.ssm_compliance_events[0].arn
+          }
+        }
+      }
+    ]
+  })
+}
@@ -18,3 +18,8 @@ output "security_group_id" {
   description = "ID of the security group"
   value       = aws_security_group.demo_sg.id
 }
+
+output "compliance_events_queue_url" {
+  description = "SQS queue URL for scripts/compliance_events.py consume (if enabled)"
+  value       = var.enable_compliance_events ? aws_sqs_queue.compliance_events[0].id : null
+}
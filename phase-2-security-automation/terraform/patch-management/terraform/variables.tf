@@ -28,3 +28,9 @@ variable "environment" {
   type        = string
   default     = "demo"
 }
+
+variable "enable_compliance_events" {
+  description = "Route SSM compliance and Run Command events to an SQS queue for compliance_events.py"
+  type        = bool
+  default     = false
+}
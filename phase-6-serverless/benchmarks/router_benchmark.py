@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Cold-start and latency comparison: three route Lambdas vs order-api-router
+
+1. Init cost per function is measured by importing its handler module in a
+   fresh interpreter (this is the Python part of a Lambda cold start).
+2. Warm CPU time per route is measured by invoking the real handlers with the
+   event fixtures in events/ against in-memory tables.
+3. A seeded traffic trace is replayed through a container model (containers
+   are reclaimed after IDLE_TIMEOUT_MINUTES idle) for both layouts. DynamoDB
+   calls cost DYNAMODB_LATENCY_MS unless served from a container's product
+   cache, which the router shares across routes. Only GET /products/{id}
+   reads through the cache; create-order always reads products fresh.
+
+Requires boto3 (imported by the handlers); no AWS calls are made.
+"""
+
+import contextlib
+import importlib
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+LAMBDA_DIR = os.path.join(BENCH_DIR, '..', 'src', 'lambda-functions')
+EVENTS_DIR = os.path.join(BENCH_DIR, 'events')
+
+REQUESTS_PER_MINUTE = float(os.environ.get('REQUESTS_PER_MINUTE', '2'))
+SIMULATED_HOURS = float(os.environ.get('SIMULATED_HOURS', '24'))
+IDLE_TIMEOUT_MINUTES = float(os.environ.get('IDLE_TIMEOUT_MINUTES', '10'))
+RUNTIME_INIT_MS = float(os.environ.get('RUNTIME_INIT_MS', '150'))
+DYNAMODB_LATENCY_MS = float(os.environ.get('DYNAMODB_LATENCY_MS', '6'))
+PRODUCT_CACHE_TTL_SECONDS = float(os.environ.get('PRODUCT_CACHE_TTL_SECONDS', '30'))
+SEED = int(os.environ.get('SEED', '42'))
+
+# route fixture -> (traffic share, handler module)
+ROUTE_MIX = {
+    'get-products': (0.50, 'get-products'),
+    'get-product': (0.30, 'get-products'),
+    'create-order': (0.15, 'create-order'),
+    'get-order-status': (0.05, 'get-order-status')
+}
+
+ENV = {
+    'ORDERS_TABLE': 'bench-orders',
+    'PRODUCTS_TABLE': 'bench-products',
+    'AWS_DEFAULT_REGION': os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
+    'PRODUCT_CACHE_TTL_SECONDS': str(PRODUCT_CACHE_TTL_SECONDS)
+}
+
+
+class InMemoryTable:
+    """Just enough of a DynamoDB Table for the handlers"""
+
+    def __init__(self, key_name, items=()):
+        self.key_name = key_name
+        self.items = {item[key_name]: item for item in items}
+
+    def get_item(self, Key, ConsistentRead=False):
+        item = self.items.get(Key[self.key_name])
+        return {'Item': item} if item else {}
+
+    def put_item(self, Item):
+        self.items[Item[self.key_name]] = Item
+        return {}
+
+    def scan(self, **kwargs):
+        return {'Items': list(self.items.values())}
+
+    def query(self, **kwargs):
+        return {'Items': list(self.items.values())}
+
+
+def load_fixtures():
+    fixtures = {}
+    for route in ROUTE_MIX:
+        with open(os.path.join(EVENTS_DIR, f'{route}.json')) as f:
+            fixtures[route] = json.load(f)
+    return fixtures
+
+
+def measure_init_ms(module_names, runs=5):
+    """Median time to import the given handler modules in a fresh interpreter"""
+    code = (
+        "import importlib, sys, time\n"
+        f"sys.path.insert(0, {LAMBDA_DIR!r})\n"
+        "start = time.perf_counter()\n"
+        f"for name in {list(module_names)!r}:\n"
+        "    importlib.import_module(name)\n"
+        "print((time.perf_counter() - start) * 1000)\n"
+    )
+    env = dict(os.environ, **ENV)
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', code], env=env,
+                                capture_output=True, text=True, check=True).stdout
+        samples.append(float(output.strip()))
+    return statistics.median(samples)
+
+
+def measure_warm_cpu_ms(fixtures, runs=200):
+    """Median in-process handler time per route with zero-latency tables"""
+    os.environ.update(ENV)
+    sys.path.insert(0, LAMBDA_DIR)
+
+    import api_resources
+    api_resources._tables[ENV['PRODUCTS_TABLE']] = InMemoryTable('product_id', [
+        {'product_id': '1', 'name': 'Laptop', 'category': 'electronics', 'price': '999.99'},
+        {'product_id': '2', 'name': 'Mouse', 'category': 'electronics', 'price': '19.99'}
+    ])
+    api_resources._tables[ENV['ORDERS_TABLE']] = InMemoryTable('order_id', [
+        {'order_id': 'order-123', 'customer_id': 'customer-123', 'status': 'pending',
+         'total_amount': '1039.97', 'created_at': '2024-01-15T00:00:00', 'items': []}
+    ])
+
+    cpu_ms = {}
+    for route, (_, module_name) in ROUTE_MIX.items():
+        handler = importlib.import_module(module_name).lambda_handler
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                response = handler(fixtures[route], None)
+            samples.append((time.perf_counter() - start) * 1000)
+        assert response['statusCode'] < 500, (route, response)
+        cpu_ms[route] = statistics.median(samples)
+    return cpu_ms
+
+
+def dynamodb_calls(route, event):
+    """DynamoDB calls a route makes: (cacheable product ids, uncached calls)"""
+    if route == 'get-product':
+        return [event['pathParameters']['product_id']], 0
+    if route == 'create-order':
+        return [], len(json.loads(event['body'])['items']) + 1
+    return [], 1
+
+
+def build_trace():
+    """Poisson arrivals over the simulated window with the ROUTE_MIX weights"""
+    rng = random.Random(SEED)
+    routes = list(ROUTE_MIX)
+    weights = [ROUTE_MIX[route][0] for route in routes]
+    end = SIMULATED_HOURS * 3600
+    t, trace = 0.0, []
+    while True:
+        t += rng.expovariate(REQUESTS_PER_MINUTE / 60.0)
+        if t > end:
+            return trace
+        trace.append((t, rng.choices(routes, weights)[0]))
+
+
+def simulate(trace, fixtures, function_for_route, init_ms, cpu_ms):
+    """Replay the trace through per-function container pools"""
+    containers = {}
+    latencies, cold_starts = [], 0
+    idle_timeout = IDLE_TIMEOUT_MINUTES * 60
+
+    for arrival, route in trace:
+        function = function_for_route(route)
+        pool = [c for c in containers.get(function, []) if arrival - c['last_used'] <= idle_timeout]
+        containers[function] = pool
+
+        container = next((c for c in pool if c['busy_until'] <= arrival), None)
+        latency = 0.0
+        if container is None:
+            cold_starts += 1
+            latency += RUNTIME_INIT_MS + init_ms[function]
+            container = {'busy_until': 0.0, 'last_used': arrival, 'cache': {}}
+            pool.append(container)
+
+        product_ids, uncached_calls = dynamodb_calls(route, fixtures[route])
+        calls = uncached_calls
+        for product_id in product_ids:
+            if container['cache'].get(product_id, -1) < arrival:
+                calls += 1
+                if PRODUCT_CACHE_TTL_SECONDS > 0:
+                    container['cache'][product_id] = arrival + PRODUCT_CACHE_TTL_SECONDS
+        latency += cpu_ms[route] + calls * DYNAMODB_LATENCY_MS
+
+        container['busy_until'] = arrival + latency / 1000.0
+        container['last_used'] = container['busy_until']
+        latencies.append(latency)
+
+    return cold_starts, latencies
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def main():
+    print("🚦 Order API layout benchmark: three functions vs single router")
+    print(f"   {REQUESTS_PER_MINUTE} req/min over {SIMULATED_HOURS} h, "
+          f"idle timeout {IDLE_TIMEOUT_MINUTES} min, DynamoDB {DYNAMODB_LATENCY_MS} ms/call\n")
+
+    fixtures = load_fixtures()
+    modules = sorted({module for _, module in ROUTE_MIX.values()})
+
+    print("📏 Measuring init cost (fresh interpreter imports)...")
+    init_ms = {module: measure_init_ms([module]) for module in modules}
+    init_ms['order-api-router'] = measure_init_ms(['order-api-router'])
+    for name, value in init_ms.items():
+        print(f"   {name:<20} {value:8.1f} ms")
+
+    print("📏 Measuring warm handler time...")
+    cpu_ms = measure_warm_cpu_ms(fixtures)
+    for route, value in cpu_ms.items():
+        print(f"   {route:<20} {value:8.3f} ms")
+
+    trace = build_trace()
+    layouts = {
+        'three functions': lambda route: ROUTE_MIX[route][1],
+        'single router': lambda route: 'order-api-router'
+    }
+
+    print(f"\n{'Layout':<18} {'Requests':>9} {'Cold starts':>12} {'Cold %':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    print("-" * 68)
+    for name, function_for_route in layouts.items():
+        cold_starts, latencies = simulate(trace, fixtures, function_for_route, init_ms, cpu_ms)
+        print(f"{name:<18} {len(latencies):>9} {cold_starts:>12} "
+              f"{cold_starts / max(len(latencies), 1) * 100:>6.1f}% "
+              f"{percentile(latencies, 50):>8.1f} {percentile(latencies, 99):>8.1f}")
+    print("-" * 68)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: precompiled create-order validation vs the original checks
+
+The original handler validated fields one at a time and fetched each product
+from DynamoDB while walking the items, so a bad item late in the list was only
+rejected after the earlier lookups. The legacy path below reproduces that flow
+with a simulated products table; DYNAMODB_LATENCY_MS sets the per-read cost.
+"""
+
+import json
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'lambda-functions'))
+
+from order_validation import MAX_ITEMS, validate_create_order  # noqa: E402
+
+DYNAMODB_LATENCY_MS = float(os.environ.get('DYNAMODB_LATENCY_MS', '5'))
+PRODUCTS = {str(i): {'product_id': str(i), 'price': '9.99'} for i in range(1, 101)}
+
+
+class SimulatedProductsTable:
+    """Stand-in for the products table that counts reads and sleeps per call"""
+
+    def __init__(self, latency_ms):
+        self.latency = latency_ms / 1000.0
+        self.reads = 0
+
+    def get_item(self, Key):
+        self.reads += 1
+        if self.latency:
+            time.sleep(self.latency)
+        product = PRODUCTS.get(Key['product_id'])
+        return {'Item': product} if product else {}
+
+
+def legacy_validate(raw_body, products_table):
+    """The checks create-order.py performed before the schema validator"""
+    if not raw_body:
+        return 'Request body is required'
+    body = json.loads(raw_body)
+
+    for field in ['customer_id', 'items']:
+        if field not in body:
+            return f'Missing required field: {field}'
+
+    for item in body['items']:
+        if 'product_id' not in item or 'quantity' not in item:
+            return 'Each item must have product_id and quantity'
+        product_response = products_table.get_item(Key={'product_id': item['product_id']})
+        if 'Item' not in product_response:
+            return f"Product {item['product_id']} not found"
+    return None
+
+
+def build_payloads():
+    """Request bodies covering the valid path and typical rejections"""
+    good_items = [{'product_id': str(i), 'quantity': 2} for i in range(1, 6)]
+    return {
+        'valid (5 items)': {'customer_id': 'c-1', 'items': good_items},
+        'bad last item': {'customer_id': 'c-1', 'items': good_items + [{'product_id': '1'}]},
+        'bad quantity type': {'customer_id': 'c-1', 'items': good_items[:4] + [{'product_id': '5', 'quantity': 'ten'}]},
+        f'{MAX_ITEMS * 20} items (abusive)': {
+            'customer_id': 'c-1',
+            'items': [{'product_id': '1', 'quantity': 1}] * (MAX_ITEMS * 20)
+        },
+        'missing customer_id': {'items': good_items}
+    }
+
+
+def time_call(func, number):
+    """Average microseconds per call"""
+    return timeit.timeit(func, number=number) / number * 1_000_000
+
+
+def main():
+    print("⏱️  Create-order validation microbenchmark")
+    print(f"   Simulated DynamoDB read latency: {DYNAMODB_LATENCY_MS} ms\n")
+    print(f"{'Payload':<28} {'Legacy (µs)':>14} {'Legacy reads':>13} {'Schema (µs)':>12} {'Errors':>7}")
+    print("-" * 78)
+
+    for name, payload in build_payloads().items():
+        raw_body = json.dumps(payload)
+
+        table = SimulatedProductsTable(DYNAMODB_LATENCY_MS)
+        legacy_validate(raw_body, table)
+        reads_per_request = table.reads
+
+        legacy_runs = 20 if DYNAMODB_LATENCY_MS else 2000
+        legacy_us = time_call(lambda: legacy_validate(raw_body, table), legacy_runs)
+        schema_us = time_call(lambda: validate_create_order(raw_body), 2000)
+        _, errors = validate_create_order(raw_body)
+
+        print(f"{name:<28} {legacy_us:>14.1f} {reads_per_request:>13} {schema_us:>12.1f} {len(errors):>7}")
+
+    print("-" * 78)
+    print("💡 Schema validation performs no table reads; the legacy path reads once per item it reaches.")
+
+
+if __name__ == "__main__":
+    main()
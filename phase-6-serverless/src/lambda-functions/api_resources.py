@@ -0,0 +1,92 @@
+"""
+Shared DynamoDB resources for the order API handlers.
+
+Everything here is created lazily at module scope, so one client, one Table
+object per table and one product cache exist per Lambda container. When the
+handlers are deployed behind order-api-router they all share the same
+instances.
+
+The product cache only serves reads (GET /products/{id}). POST /orders
+prices and checks products with fresh, strongly consistent reads, so an
+order never uses a price up to PRODUCT_CACHE_TTL_SECONDS old; those reads
+refresh the cache for the read routes. The trade-off is one DynamoDB read
+per order item, at twice the capacity of an eventually consistent read.
+"""
+
+import os
+import time
+
+import boto3
+
+from tracing import span
+
+_dynamodb = None
+_tables = {}
+_product_cache = None
+
+
+def get_dynamodb():
+    """Return the container-wide DynamoDB resource"""
+    global _dynamodb
+    if _dynamodb is None:
+        _dynamodb = boto3.resource('dynamodb')
+    return _dynamodb
+
+
+def get_table(table_name):
+    """Return a cached Table object for table_name"""
+    table = _tables.get(table_name)
+    if table is None:
+        table = get_dynamodb().Table(table_name)
+        _tables[table_name] = table
+    return table
+
+
+class ProductCache:
+    """Time-bounded cache in front of products_table.get_item.
+
+    Only products that exist are cached, so newly added products are visible
+    immediately. A ttl_seconds of 0 disables caching. Writes should call
+    get(product_id, fresh=True) rather than trust a cached price.
+    """
+
+    def __init__(self, table, ttl_seconds, table_name=None):
+        self.table = table
+        self.table_name = table_name
+        self.ttl_seconds = ttl_seconds
+        self._items = {}
+
+    def get(self, product_id, fresh=False):
+        """Return the product item, or None if it does not exist.
+
+        fresh skips the cache and reads with ConsistentRead; the result still
+        replaces the cached entry.
+        """
+        now = time.monotonic()
+        cached = self._items.get(product_id)
+        if cached and cached[0] > now and not fresh:
+            return cached[1]
+
+        with span('dynamodb.get_item', self.table_name):
+            product = self.table.get_item(Key={'product_id': product_id}, ConsistentRead=fresh).get('Item')
+        if product and self.ttl_seconds > 0:
+            self._items[product_id] = (now + self.ttl_seconds, product)
+        elif cached:
+            del self._items[product_id]
+        return product
+
+    def clear(self):
+        self._items.clear()
+
+
+def get_product_cache():
+    """Return the container-wide product cache for PRODUCTS_TABLE"""
+    global _product_cache
+    if _product_cache is None:
+        table_name = os.environ['PRODUCTS_TABLE']
+        _product_cache = ProductCache(
+            get_table(table_name),
+            float(os.environ.get('PRODUCT_CACHE_TTL_SECONDS', '30')),
+            table_name
+        )
+    return _product_cache
@@ -1,59 +1,47 @@
 import json
-import boto3
 import os
 import uuid
 from datetime import datetime
 
-dynamodb = boto3.resource('dynamodb')
-orders_table = dynamodb.Table(os.environ['ORDERS_TABLE'])
-products_table = dynamodb.Table(os.environ['PRODUCTS_TABLE'])
+from api_resources import get_product_cache, get_table
+from order_validation import parse_request_body, validate_order_body
+from tracing import span, traced
 
+ORDERS_TABLE = os.environ['ORDERS_TABLE']
+orders_table = get_table(ORDERS_TABLE)
+product_cache = get_product_cache()
+
+@traced('create-order')
 def lambda_handler(event, context):
-    print("Received event: " + json.dumps(event))
+    # Log the request's size, not its body: bodies are caller-controlled and
+    # may be oversized or carry customer details
+    raw_body = event.get('body')
+    request_id = event.get('requestContext', {}).get('requestId') or getattr(context, 'aws_request_id', None)
+    print(f"Received request {request_id}: {len(raw_body or '')} character body")
     
     try:
-        # Parse request body
-        if event.get('body'):
-            body = json.loads(event['body'])
-        else:
+        # Validate the whole request up front, before any DynamoDB reads
+        with span('parse'):
+            body, errors = parse_request_body(raw_body)
+        if not errors:
+            with span('validate'):
+                errors = validate_order_body(body)
+        if errors:
             return {
                 'statusCode': 400,
                 'headers': {
                     'Content-Type': 'application/json',
                     'Access-Control-Allow-Origin': '*'
                 },
-                'body': json.dumps({'error': 'Request body is required'})
+                'body': json.dumps({'error': errors[0], 'errors': errors})
             }
         
-        # Validate required fields
-        required_fields = ['customer_id', 'items']
-        for field in required_fields:
-            if field not in body:
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({'error': f'Missing required field: {field}'})
-                }
-        
-        # Validate items and calculate total
+        # Look up prices and calculate total
         total_amount = 0
         for item in body['items']:
-            if 'product_id' not in item or 'quantity' not in item:
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({'error': 'Each item must have product_id and quantity'})
-                }
-            
-            # Get product price
-            product_response = products_table.get_item(Key={'product_id': item['product_id']})
-            if 'Item' not in product_response:
+            # Price from a fresh read: the product cache is for reads only
+            product = product_cache.get(item['product_id'], fresh=True)
+            if not product:
                 return {
                     'statusCode': 400,
                     'headers': {
@@ -63,7 +51,6 @@ def lambda_handler(event, context):
                     'body': json.dumps({'error': f"Product {item['product_id']} not found"})
                 }
             
-            product = product_response['Item']
             item['unit_price'] = float(product['price'])
             item['total_price'] = item['unit_price'] * item['quantity']
             total_amount += item['total_price']
@@ -85,7 +72,15 @@ def lambda_handler(event, context):
             order['shipping_address'] = body['shipping_address']
         
         # Save order to DynamoDB
-        orders_table.put_item(Item=order)
+        with span('dynamodb.put_item', ORDERS_TABLE):
+            orders_table.put_item(Item=order)
+        
+        with span('serialize'):
+            response_body = json.dumps({
+                'message': 'Order created successfully',
+                'order_id': order_id,
+                'total_amount': total_amount
+            })
         
         return {
             'statusCode': 201,
@@ -93,11 +88,7 @@ def lambda_handler(event, context):
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*'
             },
-            'body': json.dumps({
-                'message': 'Order created successfully',
-                'order_id': order_id,
-                'total_amount': total_amount
-            })
+            'body': response_body
         }
         
     except Exception as e:
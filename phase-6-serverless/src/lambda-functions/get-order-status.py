@@ -1,10 +1,13 @@
 import json
-import boto3
 import os
 
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ['ORDERS_TABLE'])
+from api_resources import get_table
+from tracing import span, traced
 
+ORDERS_TABLE = os.environ['ORDERS_TABLE']
+table = get_table(ORDERS_TABLE)
+
+@traced('get-order-status')
 def lambda_handler(event, context):
     print("Received event: " + json.dumps(event))
     
@@ -23,7 +26,8 @@ def lambda_handler(event, context):
         order_id = event['pathParameters']['order_id']
         
         # Get order from DynamoDB
-        response = table.get_item(Key={'order_id': order_id})
+        with span('dynamodb.get_item', ORDERS_TABLE):
+            response = table.get_item(Key={'order_id': order_id})
         order = response.get('Item')
         
         if not order:
@@ -50,13 +54,16 @@ def lambda_handler(event, context):
         if 'shipping_address' in order:
             order_response['shipping_address'] = order['shipping_address']
         
+        with span('serialize'):
+            response_body = json.dumps(order_response)
+        
         return {
             'statusCode': 200,
             'headers': {
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*'
             },
-            'body': json.dumps(order_response)
+            'body': response_body
         }
         
     except Exception as e:
@@ -1,11 +1,15 @@
 import json
-import boto3
 import os
 from boto3.dynamodb.conditions import Key
 
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ['PRODUCTS_TABLE'])
+from api_resources import get_product_cache, get_table
+from tracing import span, traced
 
+PRODUCTS_TABLE = os.environ['PRODUCTS_TABLE']
+table = get_table(PRODUCTS_TABLE)
+product_cache = get_product_cache()
+
+@traced('get-products')
 def lambda_handler(event, context):
     print("Received event: " + json.dumps(event))
     
@@ -13,8 +17,7 @@ def lambda_handler(event, context):
         # Check if specific product ID is requested
         if event.get('pathParameters') and event['pathParameters'].get('product_id'):
             product_id = event['pathParameters']['product_id']
-            response = table.get_item(Key={'product_id': product_id})
-            product = response.get('Item')
+            product = product_cache.get(product_id)
             
             if product:
                 return {
@@ -40,25 +43,30 @@ def lambda_handler(event, context):
         category = query_params.get('category')
         
         if category:
-            response = table.query(
-                IndexName='CategoryIndex',
-                KeyConditionExpression=Key('category').eq(category)
-            )
+            with span('dynamodb.query', PRODUCTS_TABLE):
+                response = table.query(
+                    IndexName='CategoryIndex',
+                    KeyConditionExpression=Key('category').eq(category)
+                )
         else:
-            response = table.scan()
+            with span('dynamodb.scan', PRODUCTS_TABLE):
+                response = table.scan()
         
         products = response.get('Items', [])
         
+        with span('serialize'):
+            response_body = json.dumps({
+                'products': products,
+                'count': len(products)
+            })
+        
         return {
             'statusCode': 200,
             'headers': {
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*'
             },
-            'body': json.dumps({
-                'products': products,
-                'count': len(products)
-            })
+            'body': response_body
         }
         
     except Exception as e:
@@ -0,0 +1,44 @@
+import importlib
+import json
+
+from tracing import traced
+
+# The route modules share api_resources, so one DynamoDB client and one
+# product cache serve every route in this container
+create_order = importlib.import_module('create-order')
+get_products = importlib.import_module('get-products')
+get_order_status = importlib.import_module('get-order-status')
+
+ROUTES = {
+    ('GET', '/products'): get_products.lambda_handler,
+    ('GET', '/products/{product_id}'): get_products.lambda_handler,
+    ('POST', '/orders'): create_order.lambda_handler,
+    ('GET', '/orders/{order_id}'): get_order_status.lambda_handler
+}
+
+KNOWN_RESOURCES = {resource for _, resource in ROUTES}
+
+
+@traced('order-api-router')
+def lambda_handler(event, context):
+    """Single entry point for the order API - dispatch on resource/httpMethod"""
+    method = event.get('httpMethod')
+    resource = event.get('resource')
+
+    handler = ROUTES.get((method, resource))
+    if handler:
+        return handler(event, context)
+
+    if resource in KNOWN_RESOURCES:
+        status_code, error = 405, f'Method {method} not allowed on {resource}'
+    else:
+        status_code, error = 404, f'No route for {method} {resource}'
+
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({'error': error})
+    }
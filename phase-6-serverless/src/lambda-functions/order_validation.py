@@ -0,0 +1,176 @@
+"""
+Request validation for the order API.
+
+The create-order schema is compiled once at import time into plain Python
+closures, so each request is checked without any I/O and every problem is
+reported in a single response instead of one error per round trip.
+"""
+
+import json
+
+# Limits for POST /orders
+MAX_BODY_BYTES = 16 * 1024
+MAX_ITEMS = 50
+MIN_QUANTITY = 1
+MAX_QUANTITY = 1000
+MAX_ID_LENGTH = 128
+
+CREATE_ORDER_SCHEMA = {
+    'type': 'object',
+    'required': ['customer_id', 'items'],
+    'properties': {
+        'customer_id': {'type': 'string', 'minLength': 1, 'maxLength': MAX_ID_LENGTH},
+        'items': {
+            'type': 'array',
+            'minItems': 1,
+            'maxItems': MAX_ITEMS,
+            'items': {
+                'type': 'object',
+                'required': ['product_id', 'quantity'],
+                'errorMessage': {'required': 'Each item must have product_id and quantity'},
+                'properties': {
+                    'product_id': {'type': 'string', 'minLength': 1, 'maxLength': MAX_ID_LENGTH},
+                    'quantity': {'type': 'integer', 'minimum': MIN_QUANTITY, 'maximum': MAX_QUANTITY}
+                }
+            }
+        },
+        'shipping_address': {'type': ['object', 'string']}
+    }
+}
+
+_TYPE_CHECKS = {
+    'object': lambda value: isinstance(value, dict),
+    'array': lambda value: isinstance(value, list),
+    'string': lambda value: isinstance(value, str),
+    'integer': lambda value: isinstance(value, int) and not isinstance(value, bool),
+    'number': lambda value: isinstance(value, (int, float)) and not isinstance(value, bool)
+}
+
+
+def _join(path, name):
+    return f'{path}.{name}' if path else name
+
+
+def compile_schema(schema):
+    """Compile a small JSON Schema subset into a validate(value, path, errors) function.
+
+    path is '' for the request body itself, so top-level messages keep the
+    API's original wording ('Missing required field: customer_id'). As in
+    ajv-errors, errorMessage['required'] replaces the per-field message for
+    missing required properties; it is reported once per request.
+    """
+    types = schema.get('type')
+    if isinstance(types, str):
+        types = [types]
+    type_checks = tuple(_TYPE_CHECKS[name] for name in types or [])
+    type_label = ' or '.join(types or [])
+
+    checks = []
+
+    if 'minLength' in schema or 'maxLength' in schema:
+        min_length = schema.get('minLength', 0)
+        max_length = schema.get('maxLength')
+
+        def check_length(value, path, errors):
+            if isinstance(value, str):
+                if len(value) < min_length:
+                    errors.append(f'{path} must be at least {min_length} characters')
+                elif max_length is not None and len(value) > max_length:
+                    errors.append(f'{path} must be at most {max_length} characters')
+        checks.append(check_length)
+
+    if 'minimum' in schema or 'maximum' in schema:
+        minimum = schema.get('minimum')
+        maximum = schema.get('maximum')
+
+        def check_range(value, path, errors):
+            if minimum is not None and value < minimum:
+                errors.append(f'{path} must be >= {minimum}')
+            elif maximum is not None and value > maximum:
+                errors.append(f'{path} must be <= {maximum}')
+        checks.append(check_range)
+
+    if 'required' in schema or 'properties' in schema:
+        required = tuple(schema.get('required', []))
+        required_message = schema.get('errorMessage', {}).get('required')
+        properties = tuple(
+            (name, compile_schema(sub_schema))
+            for name, sub_schema in schema.get('properties', {}).items()
+        )
+
+        def check_object(value, path, errors):
+            missing = [name for name in required if name not in value]
+            if missing and required_message:
+                if required_message not in errors:
+                    errors.append(required_message)
+            else:
+                errors.extend(f'Missing required field: {_join(path, name)}' for name in missing)
+            for name, validate_property in properties:
+                if name in value:
+                    validate_property(value[name], _join(path, name), errors)
+        checks.append(check_object)
+
+    if 'minItems' in schema or 'maxItems' in schema or 'items' in schema:
+        min_items = schema.get('minItems', 0)
+        max_items = schema.get('maxItems')
+        validate_item = compile_schema(schema['items']) if 'items' in schema else None
+
+        def check_array(value, path, errors):
+            if len(value) < min_items:
+                errors.append(f'{path} must contain at least {min_items} item(s)')
+                return
+            if max_items is not None and len(value) > max_items:
+                # Don't walk oversized arrays - report once and stop
+                errors.append(f'{path} must contain at most {max_items} items')
+                return
+            if validate_item:
+                for index, item in enumerate(value):
+                    validate_item(item, f'{path}[{index}]', errors)
+        checks.append(check_array)
+
+    checks = tuple(checks)
+
+    def validate(value, path, errors):
+        if type_checks and not any(check(value) for check in type_checks):
+            errors.append(f'{path or "Request body"} must be of type {type_label}')
+            return
+        for check in checks:
+            check(value, path, errors)
+
+    return validate
+
+
+_validate_create_order = compile_schema(CREATE_ORDER_SCHEMA)
+
+
+def parse_request_body(raw_body):
+    """Size-check and JSON-decode a request body. Returns (body, errors)"""
+    if not raw_body:
+        return None, ['Request body is required']
+
+    if len(raw_body) > MAX_BODY_BYTES or len(raw_body.encode('utf-8')) > MAX_BODY_BYTES:
+        return None, [f'Request body exceeds {MAX_BODY_BYTES} bytes']
+
+    try:
+        return json.loads(raw_body), []
+    except ValueError:
+        return None, ['Request body must be valid JSON']
+
+
+def validate_order_body(body):
+    """Check a decoded POST /orders body against the schema. Returns all errors"""
+    errors = []
+    _validate_create_order(body, '', errors)
+    return errors
+
+
+def validate_create_order(raw_body):
+    """Parse and validate a POST /orders body.
+
+    Returns (body, errors). When errors is non-empty the request must be
+    rejected and body may be None.
+    """
+    body, errors = parse_request_body(raw_body)
+    if errors:
+        return body, errors
+    return body, validate_order_body(body)
@@ -0,0 +1,162 @@
+"""
+Per-invocation timing breakdown for the order API handlers.
+
+Wrap a handler with @traced('name') and time its phases with
+`with span('parse'):`. With TRACE_ENABLED=true each invocation prints one
+structured JSON log line listing every span; with TRACE_XRAY=true as well the
+spans are also sent to the X-Ray daemon as subsegments of the Lambda segment
+(requires active tracing on the function).
+
+When TRACE_ENABLED is off, traced() returns the handler unchanged and span()
+returns a shared no-op context manager, so the instrumentation costs one
+function call per span.
+"""
+
+import json
+import os
+import socket
+import time
+
+TRACE_ENABLED = os.environ.get('TRACE_ENABLED', 'false').lower() == 'true'
+XRAY_ENABLED = TRACE_ENABLED and os.environ.get('TRACE_XRAY', 'false').lower() == 'true'
+
+_XRAY_HEADER = b'{"format": "json", "version": 1}\n'
+
+_current = None
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ('trace', 'name', 'resource', 'start', 'wall_start')
+
+    def __init__(self, trace, name, resource):
+        self.trace = trace
+        self.name = name
+        self.resource = resource
+
+    def __enter__(self):
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter()
+        record = {
+            'name': self.name,
+            'offset_ms': round((self.start - self.trace.start) * 1000, 3),
+            'duration_ms': round((end - self.start) * 1000, 3)
+        }
+        if self.resource:
+            record['resource'] = self.resource
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        self.trace.spans.append(record)
+        if XRAY_ENABLED:
+            self.trace.subsegments.append((self.name, self.resource, self.wall_start,
+                                           self.wall_start + (end - self.start), exc_type is not None))
+        return False
+
+
+class _Trace:
+    def __init__(self, name, request_id):
+        self.name = name
+        self.request_id = request_id
+        self.spans = []
+        self.subsegments = []
+        self.start = time.perf_counter()
+
+
+def span(name, resource=None):
+    """Time a block within the current invocation (no-op when tracing is off)"""
+    if _current is None:
+        return _NOOP_SPAN
+    return _Span(_current, name, resource)
+
+
+def traced(name):
+    """Decorator that records a trace for each invocation of a Lambda handler"""
+    def decorator(handler):
+        if not TRACE_ENABLED:
+            return handler
+
+        def wrapper(event, context):
+            global _current
+            # Nested handler (e.g. behind order-api-router) - record as a span
+            if _current is not None:
+                with span(name):
+                    return handler(event, context)
+
+            _current = trace = _Trace(name, getattr(context, 'aws_request_id', None))
+            response = None
+            try:
+                response = handler(event, context)
+                return response
+            finally:
+                _current = None
+                _emit(trace, response)
+
+        wrapper.__name__ = handler.__name__
+        wrapper.__doc__ = handler.__doc__
+        return wrapper
+    return decorator
+
+
+def _emit(trace, response):
+    """Print the structured trace line and optionally export to X-Ray"""
+    total_ms = round((time.perf_counter() - trace.start) * 1000, 3)
+    print(json.dumps({
+        'trace': trace.name,
+        'request_id': trace.request_id,
+        'status_code': response.get('statusCode') if isinstance(response, dict) else None,
+        'total_ms': total_ms,
+        'spans': trace.spans
+    }))
+    if XRAY_ENABLED and trace.subsegments:
+        _send_xray_subsegments(trace.subsegments)
+
+
+def _parse_trace_header(header):
+    fields = dict(part.split('=', 1) for part in header.split(';') if '=' in part)
+    return fields.get('Root'), fields.get('Parent'), fields.get('Sampled') == '1'
+
+
+def _send_xray_subsegments(subsegments):
+    """Send spans to the X-Ray daemon as subsegments of the function segment"""
+    root, parent, sampled = _parse_trace_header(os.environ.get('_X_AMZN_TRACE_ID', ''))
+    if not (root and parent and sampled):
+        return
+
+    host, _, port = os.environ.get('AWS_XRAY_DAEMON_ADDRESS', '127.0.0.1:2000').partition(':')
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            for name, resource, start_time, end_time, failed in subsegments:
+                document = {
+                    'name': name,
+                    'id': os.urandom(8).hex(),
+                    'trace_id': root,
+                    'parent_id': parent,
+                    'type': 'subsegment',
+                    'start_time': start_time,
+                    'end_time': end_time
+                }
+                if name.startswith('dynamodb.'):
+                    document['namespace'] = 'aws'
+                    document['aws'] = {'operation': name.split('.', 1)[1], 'table_name': resource}
+                if failed:
+                    document['fault'] = True
+                sock.sendto(_XRAY_HEADER + json.dumps(document).encode('utf-8'), (host, int(port)))
+        finally:
+            sock.close()
+    except OSError as e:
+        print(f"X-Ray export failed: {str(e)}")
@@ -19,6 +19,12 @@ provider "aws" {
 locals {
   project_name = "secure-governance-demo"
   environment  = "demo"
+
+  # Per-invocation span timings (see src/lambda-functions/tracing.py)
+  tracing_env = {
+    TRACE_ENABLED = var.enable_tracing ? "true" : "false"
+    TRACE_XRAY    = var.enable_xray_tracing ? "true" : "false"
+  }
 }
 
 # DynamoDB Tables
@@ -112,6 +118,14 @@ resource "aws_iam_role_policy" "lambda_policy" {
           aws_dynamodb_table.orders.arn,
           "${aws_dynamodb_table.orders.arn}/index/*"
         ]
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "xray:PutTraceSegments",
+          "xray:PutTelemetryRecords"
+        ]
+        Resource = "*"
       }
     ]
   })
@@ -120,20 +134,108 @@ resource "aws_iam_role_policy" "lambda_policy" {
 # Data sources to zip Lambda functions
 data "archive_file" "get_products" {
   type        = "zip"
-  source_file = "${path.module}/../src/lambda-functions/get-products.py"
   output_path = "${path.module}/../src/lambda-functions/get-products.zip"
+
+  source {
+    content  = file("${path.module}/../src/lambda-functions/get-products.py")
+    filename = "get-products.py"
+  }
+
+  source {
+    content  = file("${path.module}/../src/lambda-functions/api_resources.py")
+    filename = "api_resources.py"
+  }
+
+  source {
+    content  = file("${path.module}/../src/lambda-functions/tracing.py")
+    filename = "tracing.py"
+  }
 }
 
 data "archive_file" "create_order" {
   type        = "zip"
-  source_file = "${path.module}/../src/lambda-functions/create-order.py"
   output_path = "${path.module}/../src/lambda-functions/create-order.zip"
+
+  source {
+    content  = file("${path.module}/../src/lambda-functions/create-order.py")
+    filename = "create-order.py"
+  }
+
+  source {
+    content  = file("${path.module}/../src/lambda-functions/order_validation.py")
+    filename = "order_validation.py"
+  }
+
+  source {
+    content  = file("${path.module}/../src/lambda-functions/api_resources.py")
+    filename = "api_resources.py"
+  }
+
+  source {
+    content  = file("${path.module}/../src/lambda-functions/tracing.py")
+    filename = "tracing.py"
+  }
 }
 
 data "archive_file" "get_order_status" {
   type        = "zip"
-  source_file = "${path.module}/../src/lambda-functions/get-order-status.py"
   output_path = "${path.module}/../src/lambda-functions/get-order-status.zip"
+
+  source {
+    content  = file("${path.module}/../src/lambda-functions/get-order-status.py")
+    filename = "get-order-status.py"
+  }
+
+  source {
+    content  = file("${path.module}/../src/lambda-functions/api_resources.py")
+    filename = "api_resources.py"
+  }
+
+  source {
+    content  = file("${path.module}/../src/lambda-functions/tracing.py")
+    filename = "tracing.py"
+  }
+}
+
+# Single-function router bundles every route handler
+data "archive_file" "order_api_router" {
+  type        = "zip"
+  output_path = "${path.module}/../src/lambda-functions/order-api-router.zip"
+
+  source {
+    content  = file("${path.module}/../src/lambda-functions/order-api-router.py")
+    filename = "order-api-router.py"
+  }
+
+  source {
+    content  = file("${path.module}/../src/lambda-functions/get-products.py")
+    filename = "get-products.py"
+  }
+
+  source {
+    content  = file("${path.module}/../src/lambda-functions/create-order.py")
+    filename = "create-order.py"
+  }
+
+  source {
+    content  = file("${path.module}/../src/lambda-functions/get-order-status.py")
+    filename = "get-order-status.py"
+  }
+
+  source {
+    content  = file("${path.module}/../src/lambda-functions/api_resources.py")
+    filename = "api_resources.py"
+  }
+
+  source {
+    content  = file("${path.module}/../src/lambda-functions/tracing.py")
+    filename = "tracing.py"
+  }
+
+  source {
+    content  = file("${path.module}/../src/lambda-functions/order_validation.py")
+    filename = "order_validation.py"
+  }
 }
 
 # Get Products Lambda Function
@@ -145,10 +247,14 @@ resource "aws_lambda_function" "get_products" {
   runtime       = "python3.9"
   timeout       = 30
 
+  tracing_config {
+    mode = var.enable_xray_tracing ? "Active" : "PassThrough"
+  }
+
   environment {
-    variables = {
+    variables = merge({
       PRODUCTS_TABLE = aws_dynamodb_table.products.name
-    }
+    }, local.tracing_env)
   }
 
   tags = {
@@ -169,11 +275,15 @@ resource "aws_lambda_function" "create_order" {
   runtime       = "python3.9"
   timeout       = 30
 
+  tracing_config {
+    mode = var.enable_xray_tracing ? "Active" : "PassThrough"
+  }
+
   environment {
-    variables = {
+    variables = merge({
       ORDERS_TABLE   = aws_dynamodb_table.orders.name
       PRODUCTS_TABLE = aws_dynamodb_table.products.name
-    }
+    }, local.tracing_env)
   }
 
   tags = {
@@ -194,10 +304,14 @@ resource "aws_lambda_function" "get_order_status" {
   runtime       = "python3.9"
   timeout       = 30
 
+  tracing_config {
+    mode = var.enable_xray_tracing ? "Active" : "PassThrough"
+  }
+
   environment {
-    variables = {
+    variables = merge({
       ORDERS_TABLE = aws_dynamodb_table.orders.name
-    }
+    }, local.tracing_env)
   }
 
   tags = {
@@ -209,6 +323,37 @@ resource "aws_lambda_function" "get_order_status" {
   depends_on = [data.archive_file.get_order_status]
 }
 
+# Order API Router Lambda Function (optional single-function layout)
+resource "aws_lambda_function" "order_api_router" {
+  count = var.enable_api_router ? 1 : 0
+
+  filename      = data.archive_file.order_api_router.output_path
+  function_name = "${local.project_name}-order-api-router"
+  role          = aws_iam_role.lambda_role.arn
+  handler       = "order-api-router.lambda_handler"
+  runtime       = "python3.9"
+  timeout       = 30
+
+  tracing_config {
+    mode = var.enable_xray_tracing ? "Active" : "PassThrough"
+  }
+
+  environment {
+    variables = merge({
+      ORDERS_TABLE   = aws_dynamodb_table.orders.name
+      PRODUCTS_TABLE = aws_dynamodb_table.products.name
+    }, local.tracing_env)
+  }
+
+  tags = {
+    Environment = local.environment
+    Project     = local.project_name
+    Component   = "lambda"
+  }
+
+  depends_on = [data.archive_file.order_api_router]
+}
+
 # API Gateway
 resource "aws_api_gateway_rest_api" "ecom_api" {
   name        = "${local.project_name}-api"
@@ -264,7 +409,7 @@ resource "aws_api_gateway_integration" "get_products" {
   http_method             = aws_api_gateway_method.get_products.http_method
   integration_http_method = "POST"
   type                    = "AWS_PROXY"
-  uri                     = aws_lambda_function.get_products.invoke_arn
+  uri                     = var.enable_api_router ? aws_lambda_function.order_api_router[0].invoke_arn : aws_lambda_function.get_products.invoke_arn
 }
 
 # GET /products/{product_id} - Get specific product
@@ -281,7 +426,7 @@ resource "aws_api_gateway_integration" "get_product" {
   http_method             = aws_api_gateway_method.get_product.http_method
   integration_http_method = "POST"
   type                    = "AWS_PROXY"
-  uri                     = aws_lambda_function.get_products.invoke_arn
+  uri                     = var.enable_api_router ? aws_lambda_function.order_api_router[0].invoke_arn : aws_lambda_function.get_products.invoke_arn
 }
 
 # POST /orders - Create new order
@@ -298,7 +443,7 @@ resource "aws_api_gateway_integration" "create_order" {
   http_method             = aws_api_gateway_method.create_order.http_method
   integration_http_method = "POST"
   type                    = "AWS_PROXY"
-  uri                     = aws_lambda_function.create_order.invoke_arn
+  uri                     = var.enable_api_router ? aws_lambda_function.order_api_router[0].invoke_arn : aws_lambda_function.create_order.invoke_arn
 }
 
 # GET /orders/{order_id} - Get order status
@@ -315,7 +460,7 @@ resource "aws_api_gateway_integration" "get_order" {
   http_method             = aws_api_gateway_method.get_order.http_method
   integration_http_method = "POST"
   type                    = "AWS_PROXY"
-  uri                     = aws_lambda_function.get_order_status.invoke_arn
+  uri                     = var.enable_api_router ? aws_lambda_function.order_api_router[0].invoke_arn : aws_lambda_function.get_order_status.invoke_arn
 }
 
 # Lambda Permissions for API Gateway
@@ -343,6 +488,16 @@ resource "aws_lambda_permission" "get_order_status" {
   source_arn    = "${aws_api_gateway_rest_api.ecom_api.execution_arn}/*/*"
 }
 
+resource "aws_lambda_permission" "order_api_router" {
+  count = var.enable_api_router ? 1 : 0
+
+  statement_id  = "AllowExecutionFromAPIGateway"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.order_api_router[0].function_name
+  principal     = "apigateway.amazonaws.com"
+  source_arn    = "${aws_api_gateway_rest_api.ecom_api.execution_arn}/*/*"
+}
+
 # API Deployment
 resource "aws_api_gateway_deployment" "ecom_api" {
   depends_on = [
@@ -355,6 +510,16 @@ resource "aws_api_gateway_deployment" "ecom_api" {
   rest_api_id = aws_api_gateway_rest_api.ecom_api.id
   stage_name  = local.environment
 
+  # Redeploy when the integrations are switched to or from the router
+  triggers = {
+    redeployment = sha1(jsonencode([
+      aws_api_gateway_integration.get_products.uri,
+      aws_api_gateway_integration.get_product.uri,
+      aws_api_gateway_integration.create_order.uri,
+      aws_api_gateway_integration.get_order.uri
+    ]))
+  }
+
   lifecycle {
     create_before_destroy = true
   }
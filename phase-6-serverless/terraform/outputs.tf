@@ -19,6 +19,7 @@ output "lambda_functions" {
     get_products     = aws_lambda_function.get_products.arn
     create_order     = aws_lambda_function.create_order.arn
     get_order_status = aws_lambda_function.get_order_status.arn
+    order_api_router = var.enable_api_router ? aws_lambda_function.order_api_router[0].arn : null
   }
 }
 
@@ -37,3 +37,21 @@ variable "get_order_status_lambda_arn_invoke" {
   description = "Invoke ARN of the get order status Lambda function"
   type        = string
 }
+
+variable "enable_api_router" {
+  description = "Route every API method to a single order-api-router Lambda instead of one function per route"
+  type        = bool
+  default     = false
+}
+
+variable "enable_tracing" {
+  description = "Log a per-invocation span timing breakdown from the order API handlers"
+  type        = bool
+  default     = false
+}
+
+variable "enable_xray_tracing" {
+  description = "Enable X-Ray active tracing and export handler spans as subsegments (requires enable_tracing)"
+  type        = bool
+  default     = false
+}
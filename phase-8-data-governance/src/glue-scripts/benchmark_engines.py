@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Rows/sec and peak memory for the ecom_etl pipeline: Spark vs local pyarrow
+
+Writes synthetic raw CSVs (files of --rows-per-file rows, with a share of
+unparseable and blank values), then runs both engines end to end from CSV
+to a partitioned Parquet dataset:
+
+1. spark - the Glue job's transform (ecom_transforms: declared-schema read,
+   prepare_batch, merge_products, partitioned write) on local[*]
+2. arrow - ecom_local.run, streaming record batches
+
+Each run is a separate process so its peak RSS is its own; for Spark the
+JVM's peak is reported too. On the smallest size the two outputs are
+compared row for row (ingested_at aside) before timings are printed.
+Needs local pyspark and pyarrow installs; no AWS or Glue libraries are used.
+
+    python benchmark_engines.py --rows 1000000 10000000 100000000 --work-dir /mnt/bench
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import time
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+
+import ecom_local
+
+CATEGORIES = ['Electronics', 'Furniture', 'Clothing', 'Books', 'Toys']
+ENGINES = ('spark', 'arrow')
+
+
+def synthetic_chunk(start, rows, bad_ratio, seed):
+    """rows raw product records with ids from start, all text"""
+    ids = pa.array(range(start, start + rows), pa.int64())
+
+    def bad(offset):
+        return pc.less(pc.random(rows, initializer=seed + offset), bad_ratio)
+
+    price = pc.cast(pc.round(pc.multiply(pc.random(rows, initializer=seed + 1), 1000), 2), pa.string())
+    bad_price = pc.if_else(pc.equal(pc.bit_wise_and(ids, 1), 0), pa.scalar('N/A'), pa.scalar(''))
+    stock = pc.floor(pc.multiply(pc.random(rows, initializer=seed + 3), 500))
+    stock = pc.cast(pc.cast(stock, pa.int32()), pa.string())
+    days = pc.cast(pc.add(pc.remainder(ids, 365), 19723), pa.int32())  # 19723 is 2024-01-01
+    created = pc.cast(pc.cast(days, pa.date32()), pa.string())
+    return pa.table({
+        'product_id': pc.cast(ids, pa.string()),
+        'name': pc.binary_join_element_wise('Product ', pc.cast(ids, pa.string()), ''),
+        'category': pc.take(pa.array(CATEGORIES), pc.remainder(ids, len(CATEGORIES))),
+        'price': pc.if_else(bad(0), bad_price, price),
+        'stock': pc.if_else(bad(2), pa.scalar('many'), stock),
+        'created_date': pc.if_else(bad(4), pa.scalar('2024-13-45'), created)
+    })
+
+
+def write_synthetic_csv(directory, rows, rows_per_file, bad_ratio):
+    """Write rows raw records as CSV files under directory, one chunk at a time"""
+    os.makedirs(directory, exist_ok=True)
+    for number, start in enumerate(range(0, rows, rows_per_file)):
+        chunk = synthetic_chunk(start, min(rows_per_file, rows - start), bad_ratio, seed=number * 10)
+        pacsv.write_csv(chunk, os.path.join(directory, f"products-{number:05d}.csv"))
+
+
+def run_spark(input_dir, output_dir, compression):
+    from pyspark.sql import SparkSession
+    from ecom_transforms import (CORRUPT_RECORD, CSV_OPTIONS, PARTITION_COLUMNS, READ_SCHEMA, batch_metrics,
+                                 drop_flags, merge_products, prepare_batch, with_source_position)
+
+    spark = (SparkSession.builder.master('local[*]').appName('benchmark-engines')
+             .config('spark.sql.session.timeZone', 'UTC').getOrCreate())
+    spark.sparkContext.setLogLevel('WARN')
+    started = time.perf_counter()
+    raw_df = with_source_position(
+        spark.read.schema(READ_SCHEMA).options(**CSV_OPTIONS).option('header', True)
+        .option('mode', 'PERMISSIVE').option('columnNameOfCorruptRecord', CORRUPT_RECORD).csv(input_dir)
+    ).localCheckpoint()
+    batch_df = prepare_batch(raw_df)
+    metrics = batch_metrics(batch_df)
+    merged_df = merge_products(None, drop_flags(batch_df).localCheckpoint()).localCheckpoint()
+    metrics['OutputRows'] = merged_df.count()
+    (merged_df.repartition(*PARTITION_COLUMNS).write.mode('overwrite')
+     .option('compression', compression).partitionBy(*PARTITION_COLUMNS).parquet(output_dir))
+    elapsed = time.perf_counter() - started
+
+    # Peak resident memory of the JVM, while it is still running (Linux only)
+    jvm_peak_kb = None
+    try:
+        with open(f"/proc/{spark.sparkContext._gateway.proc.pid}/status") as status:
+            jvm_peak_kb = next(int(line.split()[1]) for line in status if line.startswith('VmHWM:'))
+    except (AttributeError, OSError, StopIteration):
+        pass
+    spark.stop()
+    return elapsed, metrics, jvm_peak_kb
+
+
+def run_arrow(input_dir, output_dir, compression):
+    started = time.perf_counter()
+    metrics = ecom_local.run([input_dir], output_dir, compression=compression)
+    return time.perf_counter() - started, metrics, None
+
+
+def run_one(engine, input_dir, output_dir, compression):
+    """Child process: run one engine and print its result as JSON"""
+    shutil.rmtree(output_dir, ignore_errors=True)
+    elapsed, metrics, jvm_peak_kb = (run_spark if engine == 'spark' else run_arrow)(input_dir, output_dir,
+                                                                                   compression)
+    print(json.dumps({'seconds': elapsed, 'metrics': metrics, 'jvm_peak_kb': jvm_peak_kb,
+                      'peak_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+
+
+def run_child(engine, input_dir, output_dir, compression):
+    result = subprocess.run([sys.executable, __file__, '--run-one', engine, input_dir, output_dir,
+                             '--compression', compression],
+                            check=True, capture_output=True, text=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def read_output(path):
+    """Processed rows without ingested_at, in a stable order"""
+    dataset = ds.dataset(path, format='parquet', partitioning=ecom_local.PARTITIONING)
+    columns = [name for name in ecom_local.FILE_SCHEMA.names if name != ecom_local.INGESTED_AT]
+    columns += list(ecom_local.PARTITION_COLUMNS)
+    table = dataset.to_table(columns=columns)
+    table = table.cast(pa.schema([ecom_local.FILE_SCHEMA.field(n) if n in ecom_local.FILE_SCHEMA.names
+                                  else ecom_local.PARTITION_SCHEMA.field(n) for n in columns]))
+    return table.sort_by([('product_id', 'ascending')])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Spark and local pyarrow ETL engines")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000000],
+                        help="Raw row counts to run, e.g. 1000000 10000000 100000000")
+    parser.add_argument('--rows-per-file', type=int, default=1000000)
+    parser.add_argument('--bad-ratio', type=float, default=0.05,
+                        help="Share of unparseable or blank values per column")
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES))
+    parser.add_argument('--compression', choices=ecom_local.COMPRESSION_CODECS, default='snappy')
+    parser.add_argument('--work-dir', default='benchmark-engines',
+                        help="Where the synthetic CSVs and outputs go (100M rows is about 6 GB of CSV)")
+    parser.add_argument('--keep', action='store_true', help="Keep the generated data")
+    parser.add_argument('--run-one', nargs=3, metavar=('ENGINE', 'INPUT', 'OUTPUT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        run_one(*args.run_one, args.compression)
+        return
+
+    print(f"{'Rows':>12} {'Engine':<7} {'Seconds':>9} {'Rows/sec':>12} {'Peak MiB':>9} {'JVM MiB':>8}")
+    try:
+        for number, rows in enumerate(sorted(args.rows)):
+            input_dir = os.path.join(args.work_dir, f"raw-{rows}")
+            if not os.path.isdir(input_dir):
+                write_synthetic_csv(input_dir, rows, args.rows_per_file, args.bad_ratio)
+            results = {}
+            for engine in args.engines:
+                output_dir = os.path.join(args.work_dir, f"processed-{rows}-{engine}")
+                results[engine] = result = run_child(engine, input_dir, output_dir, args.compression)
+                jvm = f"{result['jvm_peak_kb'] / 1024:>8.0f}" if result['jvm_peak_kb'] else f"{'-':>8}"
+                print(f"{rows:>12,} {engine:<7} {result['seconds']:>9.2f} {rows / result['seconds']:>12,.0f} "
+                      f"{result['peak_kb'] / 1024:>9.0f} {jvm}")
+
+            if number == 0 and len(results) == len(ENGINES):
+                outputs = [read_output(os.path.join(args.work_dir, f"processed-{rows}-{engine}"))
+                           for engine in ENGINES]
+                if not outputs[0].equals(outputs[1]):
+                    raise SystemExit(f"❌ Spark and pyarrow outputs differ on {rows} rows")
+                for name in ('OutputRows', 'CoercedPrices', 'NulledFieldRows'):
+                    if results['spark']['metrics'][name] != results['arrow']['metrics'][name]:
+                        raise SystemExit(f"❌ {name} differs: {results['spark']['metrics'][name]} (spark) vs "
+                                         f"{results['arrow']['metrics'][name]} (arrow)")
+                print(f"✅ Spark and pyarrow outputs agree on {rows:,} rows")
+    finally:
+        if not args.keep:
+            shutil.rmtree(args.work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
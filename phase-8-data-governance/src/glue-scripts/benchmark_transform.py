@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Rows/sec for the ecom_etl transform: per-record Python vs native columns
+
+Generates synthetic product rows (all strings, like the CSV reader
+produces, with a share of unparseable and blank values), then times:
+
+1. python - the old Map.apply-style function applied to every record
+   through a Python worker (rdd.map), doing the same typing work
+2. native - ecom_transforms.transform_products
+
+Both results are written to Spark's no-op sink so only the transform is
+measured, and they are compared row for row before timings are printed.
+Needs a local pyspark install; no AWS or Glue libraries are used.
+
+    python benchmark_transform.py --rows 2000000 --repeat 3
+"""
+
+import argparse
+import time
+from datetime import date
+
+from pyspark.sql import SparkSession, functions as F
+
+from ecom_transforms import PRODUCT_SCHEMA, transform_products
+
+CATEGORIES = ['Electronics', 'Furniture', 'Clothing', 'Books', 'Toys']
+
+
+def transform_record(rec):
+    """The old per-record price conversion, plus the stock/date typing"""
+    if rec.get('price') and rec['price'].strip():
+        try:
+            rec['price'] = float(rec['price'])
+        except ValueError:
+            rec['price'] = 0.0
+    else:
+        rec['price'] = None
+    try:
+        rec['stock'] = int(rec['stock'])
+    except (TypeError, ValueError):
+        rec['stock'] = None
+    try:
+        rec['created_date'] = date.fromisoformat(rec['created_date'].strip())
+    except (AttributeError, ValueError):
+        rec['created_date'] = None
+    return rec
+
+
+def synthetic_products(spark, rows, partitions, bad_ratio):
+    """rows raw product records, cached so generation isn't timed"""
+    bad = F.rand(7) < bad_ratio
+    df = spark.range(0, rows, numPartitions=partitions).select(
+        F.col('id').cast('string').alias('product_id'),
+        F.concat(F.lit('Product '), F.col('id')).alias('name'),
+        F.element_at(F.array(*[F.lit(c) for c in CATEGORIES]),
+                     (F.col('id') % len(CATEGORIES) + 1).cast('int')).alias('category'),
+        F.when(bad, F.when(F.col('id') % 2 == 0, F.lit('N/A')).otherwise(F.lit('')))
+         .otherwise(F.format_number(F.rand(1) * 1000, 2)).alias('price'),
+        F.when(F.rand(2) < bad_ratio, F.lit('many'))
+         .otherwise((F.rand(3) * 500).cast('int').cast('string')).alias('stock'),
+        F.when(F.rand(4) < bad_ratio, F.lit('2024-13-45'))
+         .otherwise(F.date_format(F.date_add(F.lit('2024-01-01'), (F.col('id') % 365).cast('int')),
+                                  'yyyy-MM-dd')).alias('created_date')
+    )
+    # format_number adds thousands separators; strip them so good prices parse
+    df = df.withColumn('price', F.regexp_replace('price', ',', ''))
+    df.cache().count()
+    return df
+
+
+def run_python(spark, df):
+    return spark.createDataFrame(df.rdd.map(lambda row: transform_record(row.asDict())), PRODUCT_SCHEMA)
+
+
+def run_native(spark, df):
+    return transform_products(df)
+
+
+def time_transform(spark, df, transform, repeat):
+    """Best wall time over repeat runs of transform written to the no-op sink"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        transform(spark, df).write.format('noop').mode('overwrite').save()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ecom_etl transform")
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--partitions', type=int, default=8)
+    parser.add_argument('--bad-ratio', type=float, default=0.05,
+                        help="Share of unparseable or blank values per column")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    spark = (SparkSession.builder.master('local[*]').appName('benchmark-transform')
+             .config('spark.sql.shuffle.partitions', args.partitions).getOrCreate())
+    spark.sparkContext.setLogLevel('WARN')
+    df = synthetic_products(spark, args.rows, args.partitions, args.bad_ratio)
+
+    mismatched = run_python(spark, df).exceptAll(run_native(spark, df).select(*PRODUCT_SCHEMA.names)).count()
+    if mismatched:
+        raise SystemExit(f"❌ {mismatched} rows differ between the Python and native transforms")
+    print(f"✅ Python and native transforms agree on {args.rows} rows")
+
+    print(f"\n{'Transform':<10} {'Best s':>8} {'Rows/sec':>12}")
+    results = {}
+    for name, transform in (('python', run_python), ('native', run_native)):
+        elapsed = time_transform(spark, df, transform, args.repeat)
+        results[name] = elapsed
+        print(f"{name:<10} {elapsed:>8.2f} {args.rows / elapsed:>12,.0f}")
+    print(f"\n⚡ Native is {results['python'] / results['native']:.1f}x faster")
+    spark.stop()
+
+
+if __name__ == "__main__":
+    main()
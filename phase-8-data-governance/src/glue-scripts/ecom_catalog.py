@@ -0,0 +1,113 @@
+"""
+Glue Data Catalog partitions for the processed products table
+
+ecom_etl.py writes processed/products/ partitioned by category and created
+year/month, then registers the partitions it wrote here so Athena and Glue
+consumers see them without running a crawler. Partitions a merge left
+empty are deleted from S3 and the catalog. ecom_compact.py uses
+get_partitions() and set_partition_location() to swap a partition to its
+compacted copy. Shipped to Glue with --extra-py-files.
+
+Both jobs rewrite the processed zone by path, so they must never overlap.
+Each calls active_job_runs() for the other job after its own run has
+started and stops if it finds one: whichever checks second always sees
+the first, so at most one of them goes ahead.
+"""
+
+# Spark writes null partition values as this directory name
+HIVE_DEFAULT_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+# batch_create_partition takes up to 100 partitions, batch_delete_partition 25
+CREATE_BATCH_SIZE = 100
+DELETE_BATCH_SIZE = 25
+
+# Job run states that may still be reading or writing the processed zone
+ACTIVE_RUN_STATES = {'STARTING', 'RUNNING', 'STOPPING', 'WAITING'}
+# Runs are listed newest first; with max_concurrent_runs = 1 an active run
+# is always among the latest few
+RECENT_RUNS = 25
+
+# Characters Spark escapes in partition directory names
+ESCAPED_CHARS = set('"#%\'*/:=?\\\x7f{[]^') | {chr(c) for c in range(0x01, 0x20)}
+
+
+def escape_path_name(value):
+    return ''.join(f'%{ord(c):02X}' if c in ESCAPED_CHARS else c for c in value)
+
+
+def partition_values(row, columns):
+    """Catalog values for one partition row, as Spark names its directories"""
+    return [HIVE_DEFAULT_PARTITION if row[name] is None else str(row[name]) for name in columns]
+
+
+def partition_location(base_path, columns, values):
+    parts = [f"{name}={escape_path_name(value)}" for name, value in zip(columns, values)]
+    return base_path.rstrip('/') + '/' + '/'.join(parts) + '/'
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def register_partitions(glue, database, table, base_path, columns, partitions):
+    """Add partitions (lists of values) to the table; existing ones are left alone.
+
+    Each partition copies the table's storage descriptor with its own
+    location. Returns how many were created.
+    """
+    descriptor = glue.get_table(DatabaseName=database, Name=table)['Table']['StorageDescriptor']
+    created = 0
+    for batch in chunked(partitions, CREATE_BATCH_SIZE):
+        response = glue.batch_create_partition(
+            DatabaseName=database, TableName=table,
+            PartitionInputList=[{
+                'Values': values,
+                'StorageDescriptor': dict(descriptor, Location=partition_location(base_path, columns, values))
+            } for values in batch]
+        )
+        errors = [e for e in response.get('Errors', [])
+                  if e['ErrorDetail'].get('ErrorCode') != 'AlreadyExistsException']
+        for error in errors:
+            print("Could not register partition ", error['PartitionValues'], ": ",
+                  error['ErrorDetail'].get('ErrorMessage'))
+        created += len(batch) - len(response.get('Errors', []))
+    return created
+
+
+def delete_partitions(glue, database, table, partitions):
+    """Remove partitions (lists of values) from the table; missing ones are ignored"""
+    for batch in chunked(partitions, DELETE_BATCH_SIZE):
+        response = glue.batch_delete_partition(
+            DatabaseName=database, TableName=table,
+            PartitionsToDelete=[{'Values': values} for values in batch]
+        )
+        for error in response.get('Errors', []):
+            if error['ErrorDetail'].get('ErrorCode') != 'EntityNotFoundException':
+                print("Could not delete partition ", error['PartitionValues'], ": ",
+                      error['ErrorDetail'].get('ErrorMessage'))
+
+
+def get_partitions(glue, database, table):
+    """Yield every partition of the table"""
+    pages = glue.get_paginator('get_partitions').paginate(DatabaseName=database, TableName=table)
+    for page in pages:
+        yield from page['Partitions']
+
+
+def set_partition_location(glue, database, table, partition, location):
+    """Point one partition at location, keeping the rest of its definition"""
+    glue.update_partition(
+        DatabaseName=database, TableName=table, PartitionValueList=partition['Values'],
+        PartitionInput={
+            'Values': partition['Values'],
+            'StorageDescriptor': dict(partition['StorageDescriptor'], Location=location),
+            'Parameters': partition.get('Parameters', {})
+        }
+    )
+
+
+def active_job_runs(glue, job_name):
+    """IDs of the job's runs that are still active, from its most recent runs"""
+    runs = glue.get_job_runs(JobName=job_name, MaxResults=RECENT_RUNS)['JobRuns']
+    return [run['Id'] for run in runs if run['JobRunState'] in ACTIVE_RUN_STATES]
@@ -0,0 +1,190 @@
+import math
+import sys
+import time
+from datetime import datetime, timezone
+
+import boto3
+from awsglue.utils import getResolvedOptions
+from pyspark.context import SparkContext
+from pyspark.sql import functions as F
+from awsglue.context import GlueContext
+from awsglue.job import Job
+
+# Shipped alongside this script with --extra-py-files
+from ecom_catalog import active_job_runs, get_partitions, set_partition_location
+
+# Compacts the processed products table partition by partition. Each
+# partition with more files than its size needs is rewritten into files of
+# about target_file_mb:
+#
+# 1. the current files are read by explicit path (a fixed snapshot) and
+#    rewritten to a staging prefix, then row counts are compared
+# 2. the catalog partition is pointed at the staging copy
+# 3. the partition directory's files are replaced by the compacted ones
+# 4. the catalog partition is pointed back and the staging copy deleted
+#
+# Catalog readers (Athena, Glue tables) see the old or the new files, never
+# both. Readers of the partition path don't: between steps 3's copy and
+# delete the directory holds both sets and every row appears twice. The
+# only path reader that matters, ecom_etl's merge, is kept out by checking
+# job runs: this job stops if an ETL run is active, and the ETL job stops
+# if a compaction run is (see ecom_catalog.active_job_runs). Other path
+# readers must not run alongside compaction.
+
+METRICS_NAMESPACE = "EcomETL"
+STAGING_PREFIX = "processed/_compaction"
+# delete_objects takes up to 1000 keys
+DELETE_BATCH_SIZE = 1000
+
+COMPRESSION_CODECS = ('snappy', 'zstd')
+OPTIONAL_ARGS = {
+    'target_file_mb': '128',
+    # Partitions with fewer files than this are left alone
+    'min_files': '4',
+    'compression': 'snappy',
+    # ecom_etl.py's job; this run stops if it is running
+    'etl_job_name': None
+}
+
+
+def resolve_optional_args(defaults):
+    """Job arguments that may be omitted, with their defaults"""
+    present = [name for name in defaults if f'--{name}' in sys.argv]
+    resolved = getResolvedOptions(sys.argv, present) if present else {}
+    return {name: resolved.get(name, default) for name, default in defaults.items()}
+
+
+def split_s3_url(url):
+    bucket, _, prefix = url[len("s3://"):].partition('/')
+    return bucket, prefix.rstrip('/') + '/'
+
+
+def list_data_files(s3, bucket, prefix):
+    """[(key, size)] of the data files directly under prefix"""
+    files = []
+    for page in s3.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix, Delimiter='/'):
+        for obj in page.get('Contents', []):
+            name = obj['Key'][len(prefix):]
+            # Skip _SUCCESS and other marker files
+            if name and not name.startswith(('_', '.')):
+                files.append((obj['Key'], obj['Size']))
+    return files
+
+
+def delete_keys(s3, bucket, keys):
+    for start in range(0, len(keys), DELETE_BATCH_SIZE):
+        s3.delete_objects(Bucket=bucket, Delete={
+            'Objects': [{'Key': key} for key in keys[start:start + DELETE_BATCH_SIZE]], 'Quiet': True
+        })
+
+
+def time_query(paths):
+    """(seconds, rows) for a full scan of every column of paths"""
+    started = time.perf_counter()
+    df = spark.read.parquet(*paths)
+    row = df.agg(F.count(F.lit(1)).alias('_rows'), *[F.count(c) for c in df.columns]).first()
+    return time.perf_counter() - started, row['_rows']
+
+
+args = getResolvedOptions(sys.argv, ['JOB_NAME', 'catalog_database', 'catalog_table'])
+options = resolve_optional_args(OPTIONAL_ARGS)
+if options['compression'] not in COMPRESSION_CODECS:
+    raise ValueError(f"--compression must be one of {', '.join(COMPRESSION_CODECS)}")
+target_bytes = int(options['target_file_mb']) * 1024 * 1024
+min_files = int(options['min_files'])
+
+sc = SparkContext()
+glueContext = GlueContext(sc)
+spark = glueContext.spark_session
+job = Job(glueContext)
+job.init(args['JOB_NAME'], args)
+
+print("Starting compaction job...")
+
+glue = boto3.client('glue')
+# The ETL merge reads partitions by path; never compact alongside it
+if options['etl_job_name']:
+    running = active_job_runs(glue, options['etl_job_name'])
+    if running:
+        print("ETL run ", running[0], " is active; skipping compaction")
+        job.commit()
+        sys.exit(0)
+
+s3 = boto3.client('s3')
+database, table = args['catalog_database'], args['catalog_table']
+table_location = glue.get_table(DatabaseName=database, Name=table)['Table']['StorageDescriptor']['Location']
+_, table_prefix = split_s3_url(table_location)
+run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+totals = {'PartitionsScanned': 0, 'PartitionsCompacted': 0, 'FilesBefore': 0, 'FilesAfter': 0,
+          'QuerySecondsBefore': 0.0, 'QuerySecondsAfter': 0.0}
+print(f"{'Partition':<60} {'Files':>13} {'MiB':>8} {'Query s':>15}")
+
+for partition in get_partitions(glue, database, table):
+    totals['PartitionsScanned'] += 1
+    location = partition['StorageDescriptor']['Location']
+    bucket, prefix = split_s3_url(location)
+    files = list_data_files(s3, bucket, prefix)
+    total_bytes = sum(size for _, size in files)
+    target_count = max(1, math.ceil(total_bytes / target_bytes))
+    if len(files) < min_files or len(files) <= target_count:
+        continue
+
+    paths = [f"s3://{bucket}/{key}" for key, _ in files]
+    seconds_before, rows = time_query(paths)
+
+    # 1. Rewrite the snapshot to staging and check nothing was lost
+    relative = prefix[len(table_prefix):] if prefix.startswith(table_prefix) else prefix
+    staging_prefix = f"{STAGING_PREFIX}/{run_id}/{relative}"
+    staging = f"s3://{bucket}/{staging_prefix}"
+    (spark.read.parquet(*paths).repartition(target_count)
+     .write.mode("overwrite").option("compression", options['compression']).parquet(staging))
+    staged = list_data_files(s3, bucket, staging_prefix)
+    seconds_after, staged_rows = time_query([staging])
+    if staged_rows != rows:
+        print("Skipping ", relative, ": compacted copy has ", staged_rows, " rows, expected ", rows)
+        delete_keys(s3, bucket, [key for key, _ in staged])
+        continue
+
+    # 2. Catalog readers switch to the compacted copy in one call
+    set_partition_location(glue, database, table, partition, staging)
+
+    # 3. Replace the partition's files with the compacted ones
+    for key, _ in staged:
+        s3.copy_object(Bucket=bucket, Key=f"{prefix}compacted-{run_id}-{key[len(staging_prefix):]}",
+                       CopySource={'Bucket': bucket, 'Key': key})
+    delete_keys(s3, bucket, [key for key, _ in files])
+
+    # 4. Back to the canonical location; drop the staging copy
+    set_partition_location(glue, database, table, partition, location)
+    delete_keys(s3, bucket, [key for key, _ in staged])
+
+    totals['PartitionsCompacted'] += 1
+    totals['FilesBefore'] += len(files)
+    totals['FilesAfter'] += len(staged)
+    totals['QuerySecondsBefore'] += seconds_before
+    totals['QuerySecondsAfter'] += seconds_after
+    print(f"{relative:<60} {len(files):>6} -> {len(staged):<4} {total_bytes / 1024 / 1024:>8.1f} "
+          f"{seconds_before:>6.2f} -> {seconds_after:<6.2f}")
+
+print("Partitions compacted: ", totals['PartitionsCompacted'], " of ", totals['PartitionsScanned'])
+print("Files: ", totals['FilesBefore'], " -> ", totals['FilesAfter'])
+print("Query seconds: ", round(totals['QuerySecondsBefore'], 2), " -> ", round(totals['QuerySecondsAfter'], 2))
+
+# Publish the totals as custom job metrics
+try:
+    boto3.client('cloudwatch').put_metric_data(
+        Namespace=METRICS_NAMESPACE,
+        MetricData=[{
+            'MetricName': name,
+            'Dimensions': [{'Name': 'JobName', 'Value': args['JOB_NAME']}],
+            'Value': value,
+            'Unit': 'Seconds' if name.startswith('QuerySeconds') else 'Count'
+        } for name, value in totals.items()]
+    )
+except Exception as e:
+    # Metrics are best effort; the partitions are already compacted
+    print("Could not publish job metrics: ", e)
+
+print("Compaction job completed successfully!")
+job.commit()
@@ -1,11 +1,96 @@
+import json
 import sys
+from datetime import datetime, timedelta, timezone
+
+import boto3
 from awsglue.transforms import *
 from awsglue.utils import getResolvedOptions
 from pyspark.context import SparkContext
+from pyspark.sql import functions as F
+from pyspark.sql.utils import AnalysisException
 from awsglue.context import GlueContext
 from awsglue.job import Job
 
+# Shipped alongside this script with --extra-py-files
+from ecom_catalog import (
+    active_job_runs,
+    delete_partitions,
+    partition_location,
+    partition_values,
+    register_partitions
+)
+from ecom_rules import METRIC_NAMES
+from ecom_transforms import (
+    CORRUPT_RECORD,
+    CSV_OPTIONS,
+    INGESTED_AT,
+    PARTITION_COLUMNS,
+    READ_SCHEMA,
+    affected_partitions,
+    batch_metrics,
+    drop_flags,
+    merge_products,
+    prepare_batch,
+    rows_in_partitions,
+    with_partition_types,
+    with_source_position
+)
+
+METRICS_NAMESPACE = "EcomETL"
+DATA_BUCKET = "${data_bucket}"
+RAW_PATH = f"s3://{DATA_BUCKET}/raw/"
+PROCESSED_PATH = f"s3://{DATA_BUCKET}/processed/products/"
+# Original text of malformed raw lines, partitioned by ingest date
+MALFORMED_PATH = f"s3://{DATA_BUCKET}/rejected/products/"
+# Last-modified time up to which raw objects have been processed
+WATERMARK_KEY = "state/ecom_etl/watermark.json"
+
+COMPRESSION_CODECS = ('snappy', 'zstd')
+OPTIONAL_ARGS = {
+    # YYYY-MM-DD: ignore the watermark and re-read raw objects modified since then
+    'reprocess_from': None,
+    'compression': 'snappy',
+    # Caps rows per Parquet file; each partition is written by one task, so
+    # small partitions get one file instead of many tiny ones
+    'max_records_per_file': '1000000',
+    'catalog_database': None,
+    'catalog_table': 'processed_products',
+    # Read-side grouping: small raw files are packed into input partitions
+    # of up to read_partition_mb, each file costing file_open_cost_kb
+    'read_partition_mb': '128',
+    'file_open_cost_kb': '1024',
+    # Saved watermarks are moved back by this much, so clock skew between
+    # the driver and S3's LastModified can't skip objects
+    'watermark_margin_minutes': '15',
+    # ecom_compact.py's job; this run stops if it is running
+    'compaction_job_name': None
+}
+
+
+def resolve_optional_args(defaults):
+    """Job arguments that may be omitted, with their defaults"""
+    present = [name for name in defaults if f'--{name}' in sys.argv]
+    resolved = getResolvedOptions(sys.argv, present) if present else {}
+    return {name: resolved.get(name, default) for name, default in defaults.items()}
+
+
+def read_watermark(s3):
+    try:
+        body = s3.get_object(Bucket=DATA_BUCKET, Key=WATERMARK_KEY)['Body'].read()
+    except s3.exceptions.NoSuchKey:
+        return None
+    return json.loads(body)['modified_after']
+
+
+def write_watermark(s3, modified_after):
+    s3.put_object(Bucket=DATA_BUCKET, Key=WATERMARK_KEY,
+                  Body=json.dumps({'modified_after': modified_after}).encode())
+
+
 args = getResolvedOptions(sys.argv, ['JOB_NAME'])
+options = resolve_optional_args(OPTIONAL_ARGS)
+if options['compression'] not in COMPRESSION_CODECS:
+    raise ValueError(f"--compression must be one of {', '.join(COMPRESSION_CODECS)}")
 
 sc = SparkContext()
 glueContext = GlueContext(sc)
@@ -13,38 +98,140 @@ spark = glueContext.spark_session
 job = Job(glueContext)
 job.init(args['JOB_NAME'], args)
 
+# Partition values are read back as strings and cast by with_partition_types
+spark.conf.set("spark.sql.sources.partitionColumnTypeInference.enabled", "false")
+# modifiedAfter and the watermark are both UTC
+spark.conf.set("spark.sql.session.timeZone", "UTC")
+# Pack many small raw CSVs into few read tasks (the DataFrame reader's
+# equivalent of groupFiles/groupSize)
+spark.conf.set("spark.sql.files.maxPartitionBytes", str(int(options['read_partition_mb']) * 1024 * 1024))
+spark.conf.set("spark.sql.files.openCostInBytes", str(int(options['file_open_cost_kb']) * 1024))
+
 print("Starting ETL job...")
 
-# Read raw data from S3
-datasource0 = glueContext.create_dynamic_frame.from_options(
-    connection_type="s3",
-    connection_options={"paths": ["s3://${data_bucket}/raw/"]},
-    format="csv",
-    format_options={"withHeader": True}
-)
+# Compaction rewrites processed partitions by path; never merge alongside it
+if options['compaction_job_name']:
+    running = active_job_runs(boto3.client('glue'), options['compaction_job_name'])
+    if running:
+        print("Compaction run ", running[0], " is active; skipping this run (the watermark is unchanged)")
+        job.commit()
+        sys.exit(0)
 
-print("Raw data count: ", datasource0.count())
+# Read raw data from S3 with the declared products columns, as text: one
+# pass, no inference. Only objects modified after the watermark (or
+# --reprocess_from) are listed. The next watermark is taken before listing
+# and moved back by watermark_margin_minutes, so objects landing during the
+# run, or stamped by a clock slightly behind the driver's, are picked up
+# next time; re-reading one is harmless because the merge is idempotent.
+s3 = boto3.client('s3')
+margin = timedelta(minutes=int(options['watermark_margin_minutes']))
+next_watermark = (datetime.now(timezone.utc) - margin).strftime("%Y-%m-%dT%H:%M:%S")
+if options['reprocess_from']:
+    modified_after = f"{options['reprocess_from']}T00:00:00"
+    print("Reprocessing raw objects modified since ", options['reprocess_from'])
+else:
+    modified_after = read_watermark(s3)
+    print("Reading raw objects modified since ", modified_after or "the beginning")
 
-# Simple transformation - convert price to float
-def transform_data(rec):
-    if 'price' in rec and rec['price']:
-        try:
-            rec["price"] = float(rec["price"])
-        except:
-            rec["price"] = 0.0
-    return rec
+reader = (spark.read.schema(READ_SCHEMA)
+          .options(**CSV_OPTIONS)
+          .option("header", True)
+          .option("mode", "PERMISSIVE")
+          .option("columnNameOfCorruptRecord", CORRUPT_RECORD))
+if modified_after:
+    reader = reader.option("modifiedAfter", modified_after)
+# Materialised once; Spark also requires this before filtering on the
+# corrupt record column alone. Source positions are taken from the read
+# itself, for the merge's tiebreak between duplicates in the batch.
+raw_df = with_source_position(reader.csv(RAW_PATH)).localCheckpoint()
 
-transformed_data = Map.apply(frame=datasource0, f=transform_data)
+# Typed with the ecom_rules rules shared with ecom_local.py: price falls
+# back to 0.0 and stock/created_date to null
+batch_df = prepare_batch(raw_df)
+metrics = dict.fromkeys(METRIC_NAMES, 0)
+metrics.update(batch_metrics(batch_df))
 
-print("Transformed data count: ", transformed_data.count())
+if not metrics['InputRows']:
+    print("No new raw data since the last run")
+else:
+    # Side output: every malformed line (as read, or rebuilt from its fields
+    # when only a value failed to type)
+    if metrics['MalformedRows']:
+        (batch_df.filter(F.col(CORRUPT_RECORD).isNotNull())
+         .select(F.col(CORRUPT_RECORD).alias('line'), INGESTED_AT,
+                 F.to_date(INGESTED_AT).alias('ingest_date'))
+         .write.mode("append").partitionBy("ingest_date").json(MALFORMED_PATH))
 
-# Write processed data to processed folder
-glueContext.write_dynamic_frame.from_options(
-    frame=transformed_data,
-    connection_type="s3",
-    connection_options={"path": "s3://${data_bucket}/processed/"},
-    format="parquet"
-)
+    batch_df = drop_flags(batch_df).localCheckpoint()
+    try:
+        existing_df = with_partition_types(spark.read.parquet(PROCESSED_PATH))
+    except AnalysisException:
+        existing_df = None
+
+    # Only the partitions this batch touches are read, merged (one row per
+    # product_id) and rewritten. The merged rows are checkpointed so those
+    # partitions can be overwritten while they are also an input.
+    partitions = affected_partitions(existing_df, batch_df).collect()
+    partitions_df = spark.createDataFrame(partitions, batch_df.select(*PARTITION_COLUMNS).schema)
+    if existing_df is not None:
+        existing_df = rows_in_partitions(existing_df, partitions_df)
+    merged_df = merge_products(existing_df, batch_df).localCheckpoint()
+    metrics['OutputRows'] = merged_df.count()
+
+    # Write processed data to processed folder, replacing only the
+    # partitions present in merged_df
+    (merged_df.repartition(*PARTITION_COLUMNS)
+     .write.mode("overwrite")
+     .option("partitionOverwriteMode", "dynamic")
+     .option("compression", options['compression'])
+     .option("maxRecordsPerFile", int(options['max_records_per_file']))
+     .partitionBy(*PARTITION_COLUMNS)
+     .parquet(PROCESSED_PATH))
+
+    # Affected partitions with no rows left (every product moved out) are
+    # not touched by a dynamic overwrite, so remove them explicitly
+    written = {tuple(row) for row in merged_df.select(*PARTITION_COLUMNS).distinct().collect()}
+    emptied = [row for row in partitions if tuple(row) not in written]
+    hadoop_conf = sc._jsc.hadoopConfiguration()
+    for row in emptied:
+        path = sc._jvm.org.apache.hadoop.fs.Path(
+            partition_location(PROCESSED_PATH, PARTITION_COLUMNS, partition_values(row, PARTITION_COLUMNS)))
+        path.getFileSystem(hadoop_conf).delete(path, True)
+
+    # Register the partitions in the catalog so consumers see them
+    if options['catalog_database']:
+        glue = boto3.client('glue')
+        created = register_partitions(
+            glue, options['catalog_database'], options['catalog_table'], PROCESSED_PATH, PARTITION_COLUMNS,
+            [partition_values(row, PARTITION_COLUMNS) for row in partitions if tuple(row) in written])
+        delete_partitions(glue, options['catalog_database'], options['catalog_table'],
+                          [partition_values(row, PARTITION_COLUMNS) for row in emptied])
+        print("Registered ", created, " new partitions, removed ", len(emptied))
+
+if not options['reprocess_from']:
+    # Runs closer together than the margin never move it backwards
+    write_watermark(s3, max(next_watermark, modified_after or next_watermark))
+
+print("Raw data count: ", metrics['InputRows'])
+print("Malformed rows: ", metrics['MalformedRows'], " (original lines in ", MALFORMED_PATH, ")")
+print("Rows written to affected partitions: ", metrics['OutputRows'])
+print("Coerced prices: ", metrics['CoercedPrices'])
+print("Rows with nulled stock/created_date: ", metrics['NulledFieldRows'])
+
+# Publish the counts as custom job metrics
+try:
+    boto3.client('cloudwatch').put_metric_data(
+        Namespace=METRICS_NAMESPACE,
+        MetricData=[{
+            'MetricName': name,
+            'Dimensions': [{'Name': 'JobName', 'Value': args['JOB_NAME']}],
+            'Value': value,
+            'Unit': 'Count'
+        } for name, value in metrics.items()]
+    )
+except Exception as e:
+    # Metrics are best effort; the data is already written
+    print("Could not publish job metrics: ", e)
 
 print("ETL job completed successfully!")
 job.commit()
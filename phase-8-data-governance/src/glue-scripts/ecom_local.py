@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Local pyarrow engine for the e-commerce ETL
+
+Runs the ecom_etl.py pipeline on one machine, for development and small
+daily batches, without Spark or Glue:
+
+1. raw CSVs are streamed in record batches (pyarrow.csv.open_csv) with
+   every column read as text
+2. each batch is typed with vectorised pyarrow.compute kernels using the
+   rules in ecom_rules.py, the same ones ecom_transforms applies in Spark:
+   an unparseable price becomes 0.0, an invalid stock or created_date null
+3. typed batches are staged as a hive-partitioned dataset, then merged
+   into the processed dataset one affected partition at a time, keeping
+   the newest row per product_id (ties broken by source position, as
+   ecom_rules describes), and written as Parquet with the same
+   layout, columns and partition directory names as the Glue job
+
+Lines with the wrong number of columns are split with the csv module and
+kept, missing columns null and extra ones dropped, as Spark's PERMISSIVE
+read does. Every malformed line goes to the --malformed NDJSON side output:
+as read, or rebuilt from its fields when only a value failed to type.
+Input and output paths may be local or s3://. The watermark and the
+catalog registration stay with the Glue job. test_engines.py checks both
+engines give the same output.
+
+    python ecom_local.py raw/ --output processed/products/ --compression zstd
+"""
+
+import argparse
+import bisect
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs as pafs
+
+from ecom_catalog import partition_location, partition_values
+from ecom_rules import (
+    COERCED_PRICE,
+    INGESTED_AT,
+    INT_MAX,
+    INT_MIN,
+    METRIC_NAMES,
+    PARTITION_COLUMNS,
+    PRODUCT_COLUMN_NAMES,
+    PRODUCT_COLUMNS,
+    PRODUCT_KEY,
+    TEXT_PATTERNS,
+    TRIM_CHARACTERS
+)
+
+ARROW_TYPES = {'string': pa.string(), 'double': pa.float64(), 'int': pa.int32(), 'date': pa.date32()}
+TEXT_SCHEMA = pa.schema([(name, pa.string()) for name in PRODUCT_COLUMN_NAMES])
+
+# Columns of the processed Parquet files, as ecom_etl.py writes them
+FILE_SCHEMA = pa.schema([(name, ARROW_TYPES[kind]) for name, kind in PRODUCT_COLUMNS
+                         if name not in PARTITION_COLUMNS] + [(INGESTED_AT, pa.timestamp('us', tz='UTC'))])
+PARTITION_SCHEMA = pa.schema([
+    ('category', pa.string()),
+    ('created_year', pa.int32()),
+    ('created_month', pa.int32())
+])
+PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor='hive')
+
+# Staged only: input file number << SOURCE_FILE_SHIFT | CSV row number, the
+# merge's last tiebreak (see ecom_rules)
+SOURCE_POSITION = '_source_position'
+SOURCE_FILE_SHIFT = 40
+NEWEST_FIRST = [(PRODUCT_KEY, 'ascending', 'at_end'), (INGESTED_AT, 'descending', 'at_end'),
+                ('created_date', 'descending', 'at_end'), (SOURCE_POSITION, 'descending', 'at_end')]
+
+COMPRESSION_CODECS = ('snappy', 'zstd')
+DEFAULT_BLOCK_SIZE = 16 * 1024 * 1024
+DEFAULT_MAX_RECORDS_PER_FILE = 1000000
+
+
+def trimmed(text):
+    return pc.utf8_trim(text, characters=TRIM_CHARACTERS)
+
+
+def is_blank(text):
+    return pc.fill_null(pc.equal(trimmed(text), ''), True)
+
+
+def accepts(text, name):
+    """True where the text matches ecom_rules.TEXT_PATTERNS[name]"""
+    return pc.fill_null(pc.match_substring_regex(trimmed(text), TEXT_PATTERNS[name]), False)
+
+
+def accepted_text(text, name):
+    """Trimmed text where it is accepted, else null"""
+    return pc.if_else(accepts(text, name), trimmed(text), pa.scalar(None, pa.string()))
+
+
+def failed_parse(text, parsed):
+    """True where a non-blank value could not be parsed"""
+    return pc.and_(pc.invert(is_blank(text)), pc.is_null(parsed))
+
+
+def parse_price(text):
+    """price as a double: unparseable values become 0.0 and blank values stay null"""
+    parsed = pc.cast(pc.replace_substring_regex(accepted_text(text, 'price'), r'^\+', ''), pa.float64())
+    return pc.if_else(is_blank(text), pa.scalar(None, pa.float64()),
+                      pc.if_else(accepts(text, 'price'), parsed, pa.scalar(COERCED_PRICE, pa.float64())))
+
+
+def parse_stock(text):
+    """stock as an int (fractions truncate); null when blank, unparseable or out of range"""
+    whole = pc.replace_substring_regex(accepted_text(text, 'stock'), r'[.].*$', '')
+    wide = pc.cast(pc.replace_substring_regex(whole, r'^[+]', ''), pa.int64())
+    in_range = pc.and_(pc.greater_equal(wide, INT_MIN), pc.less_equal(wide, INT_MAX))
+    return pc.cast(pc.if_else(in_range, wide, pa.scalar(None, pa.int64())), pa.int32())
+
+
+def parse_created_date(text):
+    """created_date (yyyy-M-d) as a date; null when blank or invalid"""
+    accepted = accepted_text(text, 'created_date')
+    parsed = pc.cast(pc.strptime(accepted, format='%Y-%m-%d', unit='s', error_is_null=True), pa.date32())
+    # strptime rolls days past the month end over (2023-02-29 -> 03-01);
+    # Spark rejects them, so drop any date whose day changed
+    day = pc.cast(pc.replace_substring_regex(accepted, r'^.*-', ''), pa.int64())
+    return pc.if_else(pc.equal(pc.day(parsed), day), parsed, pa.scalar(None, pa.date32()))
+
+
+def transform_batch(batch, ingested_at, wrong_columns=False, positions=None):
+    """Typed, partitioned table, metrics and malformed mask for a batch of text columns"""
+    price = parse_price(batch.column('price'))
+    stock = parse_stock(batch.column('stock'))
+    created = parse_created_date(batch.column('created_date'))
+    coerced = pc.and_(pc.invert(is_blank(batch.column('price'))), pc.invert(accepts(batch.column('price'), 'price')))
+    nulled = pc.or_(failed_parse(batch.column('stock'), stock), failed_parse(batch.column('created_date'), created))
+    malformed = pc.or_(coerced, nulled)
+    if wrong_columns:
+        malformed = pa.nulls(batch.num_rows, pa.bool_()).fill_null(True)
+
+    rows = batch.num_rows
+    table = pa.table({
+        'product_id': batch.column('product_id'),
+        'name': batch.column('name'),
+        'price': price,
+        'stock': stock,
+        'created_date': created,
+        INGESTED_AT: pa.nulls(rows, FILE_SCHEMA.field(INGESTED_AT).type).fill_null(ingested_at),
+        'category': batch.column('category'),
+        'created_year': pc.cast(pc.year(created), pa.int32()),
+        'created_month': pc.cast(pc.month(created), pa.int32())
+    })
+    if positions is not None:
+        table = table.append_column(SOURCE_POSITION, positions)
+    metrics = {
+        'InputRows': rows,
+        'MalformedRows': pc.sum(pc.cast(malformed, pa.int64())).as_py() or 0,
+        'CoercedPrices': pc.sum(pc.cast(coerced, pa.int64())).as_py() or 0,
+        'NulledFieldRows': pc.sum(pc.cast(nulled, pa.int64())).as_py() or 0
+    }
+    return table, metrics, malformed
+
+
+def csv_lines(batch, mask):
+    """Rows of a text batch where mask is set, written back as CSV lines"""
+    lines = []
+    for row in pa.Table.from_batches([batch]).filter(mask).to_pylist():
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator='').writerow(['' if value is None else value for value in row.values()])
+        lines.append(buffer.getvalue())
+    return lines
+
+
+def list_input_files(filesystem, path):
+    """Data files at path, or directly inside it (like the Glue job's read)"""
+    info = filesystem.get_file_info(path)
+    if info.type == pafs.FileType.File:
+        return [path]
+    selector = pafs.FileSelector(path, allow_not_found=True)
+    return sorted(f.path for f in filesystem.get_file_info(selector)
+                  if f.type == pafs.FileType.File and not os.path.basename(f.path).startswith(('_', '.')))
+
+
+def text_batch(rows):
+    return pa.RecordBatch.from_pydict({name: [row[i] if i < len(row) else None for row in rows]
+                                       for i, name in enumerate(PRODUCT_COLUMN_NAMES)}, schema=TEXT_SCHEMA)
+
+
+def row_numbers(first, count, invalid_rows):
+    """CSV row numbers of count well-formed rows, from the first'th in the file.
+
+    invalid_rows holds the numbers of the rows the reader skipped so far;
+    it covers every skipped row before these, as blocks are parsed before
+    their batch is returned. The header is row 1.
+    """
+    if not count:
+        return pa.array([], pa.int64())
+    invalid_rows = sorted(invalid_rows)
+    # Well-formed rows before each skipped one; from there on the numbers shift by one more
+    steps = [number - 2 - index for index, number in enumerate(invalid_rows)]
+    shift = bisect.bisect_right(steps, first)
+    run_ends, shifts = [], []
+    for step in steps[shift:]:
+        if step >= first + count:
+            break
+        if not run_ends or run_ends[-1] != step - first:
+            run_ends.append(step - first)
+            shifts.append(shift)
+        shift += 1
+    run_ends.append(count)
+    shifts.append(shift)
+    offsets = pc.run_end_decode(pa.RunEndEncodedArray.from_arrays(pa.array(run_ends, pa.int32()),
+                                                                  pa.array(shifts, pa.int64())))
+    return pc.add(pa.array(range(first + 2, first + 2 + count), pa.int64()), offsets)
+
+
+def iter_text_batches(inputs, block_size=DEFAULT_BLOCK_SIZE):
+    """Yield (RecordBatch of text columns, original lines, source positions) for every raw CSV.
+
+    Original lines are None for well-formed batches. Lines with the wrong
+    number of columns are collected per file and yielded last, split with
+    the csv module: missing columns are null and extra ones are dropped.
+    Source positions are the file's number in input order and each row's
+    CSV row number, as SOURCE_POSITION values.
+    """
+    file_number = 0
+    for uri in inputs:
+        filesystem, path = pafs.FileSystem.from_uri(uri) if '://' in uri else (pafs.LocalFileSystem(), os.path.abspath(uri))
+        for file_path in list_input_files(filesystem, path):
+            file_number += 1
+            file_position = file_number << SOURCE_FILE_SHIFT
+            wrong_columns, well_formed = [], 0
+
+            def keep_invalid(row):
+                wrong_columns.append((row.number, row.text))
+                return 'skip'
+
+            with filesystem.open_input_stream(file_path) as stream:
+                reader = pacsv.open_csv(
+                    stream,
+                    read_options=pacsv.ReadOptions(block_size=block_size),
+                    parse_options=pacsv.ParseOptions(invalid_row_handler=keep_invalid),
+                    convert_options=pacsv.ConvertOptions(
+                        column_types=TEXT_SCHEMA, include_columns=list(PRODUCT_COLUMN_NAMES),
+                        include_missing_columns=True,
+                        # Only empty fields are null, as in Spark; 'N/A',
+                        # 'NaN' and 'NULL' stay text for the typing rules
+                        null_values=[''], strings_can_be_null=True
+                    )
+                )
+                for batch in reader:
+                    numbers = row_numbers(well_formed, batch.num_rows, [number for number, _ in wrong_columns])
+                    well_formed += batch.num_rows
+                    yield batch, None, pc.add(numbers, file_position)
+            if wrong_columns:
+                wrong_columns.sort()
+                lines = [line for _, line in wrong_columns]
+                positions = pa.array([file_position + number for number, _ in wrong_columns], pa.int64())
+                yield text_batch([next(csv.reader([line])) if line else [] for line in lines]), lines, positions
+
+
+def newest_first(table):
+    """table sorted by NEWEST_FIRST (the columns it has), and a mask of each product_id's first row"""
+    table = table.take(pc.sort_indices(table, sort_keys=[key for key in NEWEST_FIRST if key[0] in table.column_names]))
+    ids = table.column(PRODUCT_KEY)
+    previous = pa.concat_arrays([pa.nulls(1, pa.string()), ids.combine_chunks()[:-1]]) if len(ids) else ids
+    return table, pc.and_(pc.fill_null(pc.not_equal(ids, previous), True), pc.is_valid(ids))
+
+
+def superseded_in_batch(batch_ds):
+    """SOURCE_POSITIONs of batch rows another row with their product_id wins over, or None.
+
+    The merge runs one partition at a time, so a product listed under two
+    categories in the same batch is resolved here first, as the Glue job's
+    window over the whole batch does.
+    """
+    table = batch_ds.to_table(columns=[PRODUCT_KEY, 'created_date', SOURCE_POSITION],
+                              filter=ds.field(PRODUCT_KEY).is_valid())
+    if pc.count_distinct(table.column(PRODUCT_KEY)).as_py() == table.num_rows:
+        return None
+    table, first = newest_first(table)
+    return table.filter(pc.invert(first)).column(SOURCE_POSITION)
+
+
+def dedupe_latest(table):
+    """One row per product_id, newest first by NEWEST_FIRST"""
+    table, first = newest_first(table)
+    ids = table.column(PRODUCT_KEY)
+    keyed = table.filter(first)
+
+    # Rows without a product_id are only de-duplicated exactly
+    unkeyed = table.filter(pc.is_null(ids))
+    if unkeyed.num_rows:
+        keys = [name for name in FILE_SCHEMA.names if name != INGESTED_AT]
+        unkeyed = (unkeyed.group_by(keys, use_threads=False).aggregate([(INGESTED_AT, 'min')])
+                   .select(keys + [f'{INGESTED_AT}_min']).rename_columns(keys + [INGESTED_AT]))
+    return pa.concat_tables([keyed.select(FILE_SCHEMA.names), unkeyed.select(FILE_SCHEMA.names).cast(FILE_SCHEMA)])
+
+
+def partition_filter(values):
+    expression = None
+    for name, value in zip(PARTITION_COLUMNS, values):
+        term = ds.field(name).is_null() if value is None else ds.field(name) == value
+        expression = term if expression is None else expression & term
+    return expression
+
+
+def write_partition(filesystem, base, values, table, compression, max_records_per_file):
+    """Replace the partition directory's data files with table"""
+    directory = partition_location(base, PARTITION_COLUMNS,
+                                   partition_values(dict(zip(PARTITION_COLUMNS, values)), PARTITION_COLUMNS)).rstrip('/')
+    filesystem.create_dir(directory, recursive=True)
+    old_files = list_input_files(filesystem, directory)
+    written = 0
+    for start in range(0, table.num_rows, max_records_per_file):
+        part = table.slice(start, max_records_per_file)
+        path = f"{directory}/part-{uuid.uuid4().hex}.{compression}.parquet"
+        pq.write_table(part, path, filesystem=filesystem, compression=compression)
+        written += part.num_rows
+    for path in old_files:
+        filesystem.delete_file(path)
+    if not table.num_rows:
+        filesystem.delete_dir(directory)
+    return written
+
+
+def run(inputs, output, malformed_path=None, compression='snappy',
+        max_records_per_file=DEFAULT_MAX_RECORDS_PER_FILE, block_size=DEFAULT_BLOCK_SIZE):
+    """Process raw CSVs into the processed dataset at output; returns the job metrics"""
+    if compression not in COMPRESSION_CODECS:
+        raise ValueError(f"compression must be one of {', '.join(COMPRESSION_CODECS)}")
+    filesystem, base = pafs.FileSystem.from_uri(output) if '://' in output else (pafs.LocalFileSystem(), os.path.abspath(output))
+    metrics = dict.fromkeys(METRIC_NAMES, 0)
+    ingested_at = pa.scalar(datetime.now(timezone.utc), FILE_SCHEMA.field(INGESTED_AT).type)
+    staging = tempfile.mkdtemp(prefix='ecom-local-')
+    side_output = open(malformed_path, 'w') if malformed_path else None
+
+    try:
+        # 1-2. Stream, type and stage the batch, partitioned like the output
+        def typed_batches():
+            for batch, lines, positions in iter_text_batches(inputs, block_size):
+                table, batch_metrics, malformed = transform_batch(batch, ingested_at, lines is not None, positions)
+                for name, value in batch_metrics.items():
+                    metrics[name] += value
+                if side_output and batch_metrics['MalformedRows']:
+                    # Lines that split correctly are rebuilt from their fields
+                    lines = lines if lines is not None else csv_lines(batch, malformed)
+                    side_output.writelines(json.dumps({'line': line}) + '\n' for line in lines)
+                yield from table.to_batches()
+
+        staged_schema = pa.schema(list(FILE_SCHEMA) + list(PARTITION_SCHEMA) + [(SOURCE_POSITION, pa.int64())])
+        ds.write_dataset(typed_batches(), staging, schema=staged_schema, format='parquet',
+                         partitioning=PARTITIONING, existing_data_behavior='overwrite_or_ignore')
+        if not metrics['InputRows']:
+            return metrics
+
+        # 3. Affected partitions: the batch's own plus those its products were in
+        batch_ds = ds.dataset(staging, schema=staged_schema, format='parquet', partitioning=PARTITIONING)
+        batch_ids = pc.unique(batch_ds.to_table(columns=[PRODUCT_KEY]).column(PRODUCT_KEY)).drop_null()
+        partitions = batch_ds.to_table(columns=list(PARTITION_COLUMNS)).group_by(list(PARTITION_COLUMNS)).aggregate([])
+        existing_ds = None
+        if filesystem.get_file_info(base).type == pafs.FileType.Directory:
+            existing_ds = ds.dataset(base, schema=staged_schema, format='parquet', partitioning=PARTITIONING,
+                                     filesystem=filesystem)
+            previous = existing_ds.to_table(columns=list(PARTITION_COLUMNS),
+                                            filter=ds.field(PRODUCT_KEY).isin(batch_ids))
+            partitions = pa.concat_tables([partitions, previous.group_by(list(PARTITION_COLUMNS)).aggregate([])
+                                           .select(list(PARTITION_COLUMNS))])
+            partitions = partitions.group_by(list(PARTITION_COLUMNS)).aggregate([])
+
+        superseded = superseded_in_batch(batch_ds)
+        for values in zip(*(partitions.column(name).to_pylist() for name in PARTITION_COLUMNS)):
+            where = partition_filter(values)
+            batch_where = where if superseded is None else where & ~ds.field(SOURCE_POSITION).isin(superseded)
+            merged = batch_ds.to_table(columns=FILE_SCHEMA.names + [SOURCE_POSITION], filter=batch_where)
+            if existing_ds is not None:
+                # The batch is always newer, so existing rows are only kept
+                # for products the batch doesn't mention
+                kept = existing_ds.to_table(columns=FILE_SCHEMA.names,
+                                            filter=where & ~ds.field(PRODUCT_KEY).isin(batch_ids))
+                kept = kept.append_column(SOURCE_POSITION, pa.nulls(kept.num_rows, pa.int64()))
+                merged = pa.concat_tables([kept, merged])
+            merged = dedupe_latest(merged)
+            metrics['OutputRows'] += write_partition(filesystem, base, values, merged, compression,
+                                                     max_records_per_file)
+        return metrics
+    finally:
+        if side_output:
+            side_output.close()
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the ecom ETL locally with pyarrow")
+    parser.add_argument('inputs', nargs='+', help="Raw CSV files or directories (local or s3://)")
+    parser.add_argument('--output', required=True, help="Processed dataset directory (local or s3://)")
+    parser.add_argument('--malformed', metavar='PATH', help="NDJSON side output for malformed lines")
+    parser.add_argument('--compression', choices=COMPRESSION_CODECS, default='snappy')
+    parser.add_argument('--max-records-per-file', type=int, default=DEFAULT_MAX_RECORDS_PER_FILE)
+    parser.add_argument('--block-size-mb', type=int, default=DEFAULT_BLOCK_SIZE // (1024 * 1024),
+                        help="CSV bytes read per batch")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    metrics = run(args.inputs, args.output, args.malformed, args.compression,
+                  args.max_records_per_file, args.block_size_mb * 1024 * 1024)
+    elapsed = time.perf_counter() - started
+    print("Raw data count: ", metrics['InputRows'])
+    print("Malformed rows: ", metrics['MalformedRows'])
+    print("Rows written to affected partitions: ", metrics['OutputRows'])
+    print("Coerced prices: ", metrics['CoercedPrices'])
+    print("Rows with nulled stock/created_date: ", metrics['NulledFieldRows'])
+    print(f"Finished in {elapsed:.1f}s ({metrics['InputRows'] / elapsed if elapsed else 0:,.0f} rows/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Typing rules for the products feed, shared by both ETL engines
+
+ecom_transforms.py (Spark, the Glue job) and ecom_local.py (pyarrow) read
+every raw column as text and type it with these rules, so the two engines
+produce the same rows. Nothing here depends on Spark or pyarrow; it is
+shipped to Glue with --extra-py-files.
+
+Each typed column has the text it accepts after trimming TRIM_CHARACTERS.
+The patterns are written in the subset of regex syntax that Java (Spark's
+rlike) and RE2 (pyarrow's match_substring_regex) read the same way, and
+only text they accept is cast, so each engine's own cast only ever sees
+values both engines parse identically:
+
+- price: a decimal or exponent number, or inf/infinity/nan; anything else
+  non-blank becomes COERCED_PRICE, blank stays null
+- stock: an integer, optionally with a fractional part that is truncated,
+  within the int range; anything else is null
+- created_date: yyyy-M-d with a real calendar date; anything else is null
+
+Rows where price was coerced or stock/created_date nulled, and lines with
+the wrong number of columns, count as malformed and go to the side output.
+
+Merging keeps one row per product_id: the newest ingested_at, then the
+newest created_date, then the one from the later input file (by name) and
+the later row in it. Both engines track each raw row's source position for
+that last step, so duplicates within a batch resolve the same way however
+the batch is split or partitioned.
+"""
+
+PRODUCT_KEY = 'product_id'
+INGESTED_AT = 'ingested_at'
+PARTITION_COLUMNS = ('category', 'created_year', 'created_month')
+
+# The products feed, as in sample_products.csv: (column, type once typed)
+PRODUCT_COLUMNS = (
+    ('product_id', 'string'),
+    ('name', 'string'),
+    ('category', 'string'),
+    ('price', 'double'),
+    ('stock', 'int'),
+    ('created_date', 'date')
+)
+PRODUCT_COLUMN_NAMES = tuple(name for name, _ in PRODUCT_COLUMNS)
+
+# Spark's trim() removes spaces only
+TRIM_CHARACTERS = ' '
+
+DOUBLE_PATTERN = r'^[+-]?(([0-9]+[.]?[0-9]*|[.][0-9]+)([eE][+-]?[0-9]+)?|(?i:inf|infinity|nan))$'
+# Up to 10 significant digits; longer values can't fit an int anyway
+INT_PATTERN = r'^[+-]?0*[0-9]{1,10}([.][0-9]*)?$'
+DATE_PATTERN = r'^[0-9]{4}-[0-9]{1,2}-[0-9]{1,2}$'
+TEXT_PATTERNS = {
+    'price': DOUBLE_PATTERN,
+    'stock': INT_PATTERN,
+    'created_date': DATE_PATTERN
+}
+INT_MIN, INT_MAX = -2 ** 31, 2 ** 31 - 1
+
+COERCED_PRICE = 0.0
+
+METRIC_NAMES = ('InputRows', 'OutputRows', 'MalformedRows', 'CoercedPrices', 'NulledFieldRows')
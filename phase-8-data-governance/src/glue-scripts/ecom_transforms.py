@@ -0,0 +1,241 @@
+"""
+Column transforms for the e-commerce ETL job
+
+Shared by ecom_etl.py (shipped to Glue with --extra-py-files) and
+benchmark_transform.py. Every transform is a native Spark column
+expression, so rows are converted inside the JVM instead of being
+serialised through a Python worker one record at a time.
+
+flag_products() also marks coerced and nulled values so the job can
+count them from the batch it has already materialised, and
+merge_products() folds a batch into the processed data keeping one row
+per product_id, so re-running a batch never duplicates rows. The processed
+data is partitioned by category and created year/month
+(PARTITION_COLUMNS), and affected_partitions() narrows each merge to the
+partitions a batch touches.
+
+The raw feed is read with READ_SCHEMA and CSV_OPTIONS: its declared
+columns, all as text, so there is no inference and every value is typed
+here by the rules in ecom_rules.py, the same ones ecom_local.py applies
+with pyarrow.
+prepare_batch() flags the batch and keeps the original text of every
+malformed line (wrong column count, coerced price or nulled field) in
+CORRUPT_RECORD for the job's side output.
+"""
+
+from pyspark.sql import Window, functions as F
+from pyspark.sql.types import DateType, DoubleType, IntegerType, StringType, StructField, StructType
+
+from ecom_rules import (
+    COERCED_PRICE,
+    INGESTED_AT,
+    PARTITION_COLUMNS,
+    PRODUCT_COLUMN_NAMES,
+    PRODUCT_COLUMNS,
+    PRODUCT_KEY,
+    TEXT_PATTERNS
+)
+
+CORRUPT_RECORD = '_corrupt_record'
+FLAG_COLUMNS = ('_coerced_price', '_nulled_fields', CORRUPT_RECORD)
+# Where each raw row came from, for merge_products' last tiebreak
+SOURCE_FILE = '_source_file'
+SOURCE_ROW = '_source_row'
+SOURCE_COLUMNS = (SOURCE_FILE, SOURCE_ROW)
+
+SPARK_TYPES = {'string': StringType(), 'double': DoubleType(), 'int': IntegerType(), 'date': DateType()}
+
+# The products feed once typed
+PRODUCT_SCHEMA = StructType([StructField(name, SPARK_TYPES[kind]) for name, kind in PRODUCT_COLUMNS])
+
+# The feed's columns as text for a PERMISSIVE CSV read, keeping malformed lines
+READ_SCHEMA = StructType([StructField(name, StringType()) for name in PRODUCT_COLUMN_NAMES]
+                         + [StructField(CORRUPT_RECORD, StringType())])
+# Quotes inside quoted fields are doubled (RFC 4180, as pyarrow and the csv
+# module read and write them), not backslash-escaped as Spark assumes
+CSV_OPTIONS = {'escape': '"'}
+
+
+def as_text(column):
+    """Trimmed string form of a column, whatever type the reader inferred"""
+    return F.trim(column.cast('string'))
+
+
+def is_blank(column):
+    return column.isNull() | (as_text(column) == '')
+
+
+def accepts(column, name):
+    """True where the text matches ecom_rules.TEXT_PATTERNS[name]"""
+    return F.coalesce(as_text(column).rlike(TEXT_PATTERNS[name]), F.lit(False))
+
+
+def parse_price(column):
+    """price as a double: unparseable values become 0.0 and blank values stay null"""
+    return (F.when(is_blank(column), F.lit(None).cast('double'))
+            .when(accepts(column, 'price'), as_text(column).cast('double'))
+            .otherwise(F.lit(COERCED_PRICE)))
+
+
+def parse_stock(column):
+    """stock as an int; null when blank, unparseable or out of range"""
+    return F.when(accepts(column, 'stock'), as_text(column).cast('int'))
+
+
+def parse_created_date(column):
+    """created_date (yyyy-M-d) as a date; null when blank or invalid"""
+    return F.when(accepts(column, 'created_date'), as_text(column).cast('date'))
+
+
+COLUMN_PARSERS = {
+    'price': parse_price,
+    'stock': parse_stock,
+    'created_date': parse_created_date
+}
+
+
+def transform_products(df):
+    """Type the product columns of a raw (all-string) DataFrame.
+
+    Columns that are missing from the input are left out, like the old
+    per-record transform, and all other columns pass through unchanged.
+    """
+    for name, parse in COLUMN_PARSERS.items():
+        if name in df.columns:
+            df = df.withColumn(name, parse(F.col(name)))
+    return df
+
+
+def failed_parse(column, parse):
+    """True where a non-blank value could not be parsed"""
+    return ~is_blank(column) & parse(column).isNull()
+
+
+def flag_products(df):
+    """transform_products plus an ingested_at timestamp and flag columns.
+
+    _coerced_price marks prices replaced by 0.0 and _nulled_fields marks rows
+    with a stock or created_date that could not be typed; batch_metrics()
+    counts them and drop_flags() removes them before writing. Expects the
+    product columns as text. If df has CORRUPT_RECORD, flagged rows get
+    their fields written back as a CSV line there.
+    """
+    columns = set(df.columns)
+    coerced = F.lit(False)
+    if 'price' in columns:
+        coerced = ~is_blank(F.col('price')) & ~accepts(F.col('price'), 'price')
+    nulled = F.lit(False)
+    for name in ('stock', 'created_date'):
+        if name in columns:
+            nulled = nulled | failed_parse(F.col(name), COLUMN_PARSERS[name])
+
+    df = df.withColumn('_coerced_price', coerced).withColumn('_nulled_fields', nulled)
+    if CORRUPT_RECORD in columns:
+        fields = F.struct(*[F.col(name) for name in PRODUCT_COLUMN_NAMES if name in columns])
+        line = F.to_csv(fields, CSV_OPTIONS)
+        df = df.withColumn(CORRUPT_RECORD, F.coalesce(
+            F.col(CORRUPT_RECORD), F.when(F.col('_coerced_price') | F.col('_nulled_fields'), line)
+        ))
+    return add_partition_columns(transform_products(df)).withColumn(INGESTED_AT, F.current_timestamp())
+
+
+def with_source_position(raw_df):
+    """The raw read with each row's input file and a position within it.
+
+    Apply it to the read itself: input_file_name() is empty once the rows
+    are checkpointed. monotonically_increasing_id() grows with the offset
+    in a file, as Spark numbers a file's splits in offset order.
+    """
+    return raw_df.withColumn(SOURCE_FILE, F.input_file_name()).withColumn(SOURCE_ROW, F.monotonically_increasing_id())
+
+
+def prepare_batch(raw_df):
+    """Flagged, typed batch from a PERMISSIVE read with READ_SCHEMA.
+
+    Lines with the wrong number of columns keep the fields Spark could
+    split (missing ones null, extra ones dropped) and their original text
+    in CORRUPT_RECORD; rows with a coerced or nulled value get a CSV line
+    of their fields there too. CORRUPT_RECORD is null for clean rows.
+    """
+    return flag_products(raw_df)
+
+
+def add_partition_columns(df):
+    """created_year/created_month from the typed created_date (null when it is)"""
+    return (df.withColumn('created_year', F.year('created_date'))
+            .withColumn('created_month', F.month('created_date')))
+
+
+def with_partition_types(df):
+    """Partition columns read back from paths as strings, cast to the written types"""
+    return (df.withColumn('category', F.col('category').cast('string'))
+            .withColumn('created_year', F.col('created_year').cast('int'))
+            .withColumn('created_month', F.col('created_month').cast('int')))
+
+
+def affected_partitions(existing_df, batch_df):
+    """Distinct partitions a merge of batch_df has to rewrite.
+
+    These are the batch's own partitions plus the ones its products were
+    in before, so a product whose category or created_date changed is
+    removed from its old partition.
+    """
+    partitions = batch_df.select(*PARTITION_COLUMNS)
+    if existing_df is not None:
+        batch_keys = batch_df.select(PRODUCT_KEY).distinct()
+        previous = existing_df.join(batch_keys, PRODUCT_KEY, 'left_semi').select(*PARTITION_COLUMNS)
+        partitions = partitions.unionByName(previous)
+    return partitions.distinct()
+
+
+def rows_in_partitions(df, partitions):
+    """Rows of df whose partition values are in the partitions DataFrame"""
+    # Renamed so the join works when partitions was derived from df itself
+    wanted = partitions.select(*[F.col(name).alias(f'_wanted_{name}') for name in PARTITION_COLUMNS])
+    condition = F.lit(True)
+    for name in PARTITION_COLUMNS:
+        condition = condition & F.col(name).eqNullSafe(F.col(f'_wanted_{name}'))
+    return df.join(F.broadcast(wanted), condition, 'left_semi')
+
+
+def batch_metrics(df):
+    """InputRows, MalformedRows, CoercedPrices and NulledFieldRows of a flagged batch in one aggregation"""
+    malformed = F.col(CORRUPT_RECORD).isNotNull() if CORRUPT_RECORD in df.columns else F.lit(False)
+    row = df.agg(
+        F.count(F.lit(1)).alias('InputRows'),
+        F.sum(malformed.cast('long')).alias('MalformedRows'),
+        F.sum(F.col('_coerced_price').cast('long')).alias('CoercedPrices'),
+        F.sum(F.col('_nulled_fields').cast('long')).alias('NulledFieldRows')
+    ).first()
+    return {name: row[name] or 0 for name in ('InputRows', 'MalformedRows', 'CoercedPrices', 'NulledFieldRows')}
+
+
+def drop_flags(df):
+    return df.drop(*FLAG_COLUMNS)
+
+
+def merge_products(existing_df, batch_df):
+    """Latest row per product_id across the processed data and a new batch.
+
+    Batch rows win over existing ones (newest ingested_at first; rows from
+    before ingested_at was added sort last), so applying the same batch
+    twice gives the same result. Duplicates within the batch go to the
+    newest created_date, then the latest source position (the batch must
+    come from with_source_position), as in ecom_local. Rows without a
+    product_id can't be matched and are only de-duplicated exactly.
+    """
+    if existing_df is None:
+        merged = batch_df
+    else:
+        merged = existing_df.unionByName(batch_df, allowMissingColumns=True)
+
+    keyed = merged.filter(F.col(PRODUCT_KEY).isNotNull())
+    latest_first = Window.partitionBy(PRODUCT_KEY).orderBy(
+        F.col(INGESTED_AT).desc_nulls_last(), F.col('created_date').desc_nulls_last(),
+        F.col(SOURCE_FILE).desc_nulls_last(), F.col(SOURCE_ROW).desc_nulls_last()
+    )
+    latest = (keyed.withColumn('_version', F.row_number().over(latest_first))
+              .filter(F.col('_version') == 1).drop('_version'))
+    unkeyed = merged.filter(F.col(PRODUCT_KEY).isNull())
+    unkeyed = unkeyed.dropDuplicates([c for c in unkeyed.columns if c != INGESTED_AT and c not in SOURCE_COLUMNS])
+    return latest.unionByName(unkeyed).drop(*SOURCE_COLUMNS)
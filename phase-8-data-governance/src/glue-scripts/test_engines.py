@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Spark (ecom_transforms) and local pyarrow (ecom_local) engines on the same input
+
+Runs sample_products.csv, then a second batch of edge cases (quoted commas
+and quotes, blank and unparseable values, impossible dates, lines with the
+wrong number of columns, a product moving partition), and a batch listing
+products several times with the same created_date, through both engines
+into their own processed datasets, and checks the rows (ingested_at aside),
+the metrics and the malformed side output match. The Spark side follows
+ecom_etl.py's steps on local[1], without the Glue libraries, S3 or the
+catalog, and is skipped unless pyspark and a Java runtime are available.
+LocalEngineTest runs the same checks on the pyarrow engine alone, so they
+run wherever pyarrow is installed.
+
+    python -m unittest test_engines
+"""
+
+import json
+import math
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+
+try:
+    import pyarrow  # noqa: F401
+    HAVE_ARROW = True
+except ImportError:
+    HAVE_ARROW = False
+
+try:
+    from pyspark.sql import SparkSession
+    HAVE_ENGINES = HAVE_ARROW and bool(os.environ.get('JAVA_HOME') or shutil.which('java'))
+except ImportError:
+    HAVE_ENGINES = False
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_CSV = os.path.join(HERE, 'sample_products.csv')
+
+EDGE_CASES = '''product_id,name,category,price,stock,created_date
+1,Laptop Pro,Electronics,1099.99,40,2024-01-15
+4,Desk Chair,Office,189.99,30,2024-01-18
+10,"Desk, oak",Furniture,149.50,5,2024-02-01
+11,Lamp,Furniture,N/A,7,2024-02-02
+12,Mug,Kitchen,,3,2024-02-03
+13,"Pen ""fine""",Office,1.5,many,2024-02-04
+14,Notebook,Office, 2.25 ,+12.9,2024-2-5
+15,Chair,Furniture,49.99,10,2023-02-29
+16,Short,Office,3.50
+17,Long,Office,4.5,1,2024-03-01,extra
+18,Cable,Electronics,NaN,2147483648,2024-03-02
+,Orphan,Toys,1e1,1,2024-03-03
+19,Blank date,Toys,-2,2,
+20,NULL,Toys,inf,0,2024-04-30
+'''
+
+# Ties on created_date go to the later row, wrong column count or not
+DUPLICATES = '''product_id,name,category,price,stock,created_date
+30,Kettle,Kitchen,20.00,5,2024-05-01
+30,Kettle v2,Appliances,22.00,5,2024-05-01
+31,Toaster,Kitchen,15.00,5,2024-05-01
+30,Kettle short,Kitchen
+31,Toaster v2,Kitchen,16.00,4,2024-05-01,extra
+31,Toaster old,Kitchen,14.00,9,2024-04-01
+32,Grill,Kitchen,80.00,1,2024-05-01
+32,Grill,Kitchen,80.00,1,2024-05-01
+'''
+
+
+def run_spark(spark, input_path, output_dir, malformed_dir):
+    """One ecom_etl.py run on local paths; returns its metrics"""
+    from pyspark.sql import functions as F
+    from pyspark.sql.utils import AnalysisException
+    from ecom_rules import METRIC_NAMES
+    from ecom_transforms import (CORRUPT_RECORD, CSV_OPTIONS, INGESTED_AT, PARTITION_COLUMNS, READ_SCHEMA,
+                                 affected_partitions, batch_metrics, drop_flags, merge_products,
+                                 prepare_batch, rows_in_partitions, with_partition_types, with_source_position)
+    from ecom_catalog import partition_location, partition_values
+
+    raw_df = with_source_position(
+        spark.read.schema(READ_SCHEMA).options(**CSV_OPTIONS).option('header', True)
+        .option('mode', 'PERMISSIVE').option('columnNameOfCorruptRecord', CORRUPT_RECORD).csv(input_path)
+    ).localCheckpoint()
+    batch_df = prepare_batch(raw_df)
+    metrics = dict.fromkeys(METRIC_NAMES, 0)
+    metrics.update(batch_metrics(batch_df))
+    (batch_df.filter(F.col(CORRUPT_RECORD).isNotNull())
+     .select(F.col(CORRUPT_RECORD).alias('line'), INGESTED_AT)
+     .write.mode('append').json(malformed_dir))
+
+    batch_df = drop_flags(batch_df).localCheckpoint()
+    try:
+        existing_df = with_partition_types(spark.read.parquet(output_dir))
+    except AnalysisException:
+        existing_df = None
+    partitions = affected_partitions(existing_df, batch_df).collect()
+    partitions_df = spark.createDataFrame(partitions, batch_df.select(*PARTITION_COLUMNS).schema)
+    if existing_df is not None:
+        existing_df = rows_in_partitions(existing_df, partitions_df)
+    merged_df = merge_products(existing_df, batch_df).localCheckpoint()
+    metrics['OutputRows'] = merged_df.count()
+    (merged_df.repartition(*PARTITION_COLUMNS).write.mode('overwrite')
+     .option('partitionOverwriteMode', 'dynamic').partitionBy(*PARTITION_COLUMNS).parquet(output_dir))
+
+    written = {tuple(row) for row in merged_df.select(*PARTITION_COLUMNS).distinct().collect()}
+    for row in partitions:
+        if tuple(row) not in written:
+            shutil.rmtree(partition_location(output_dir, PARTITION_COLUMNS,
+                                             partition_values(row, PARTITION_COLUMNS)), ignore_errors=True)
+    return metrics
+
+
+def comparable_rows(table):
+    """Rows as dicts, with NaN prices as a string so equal rows compare equal"""
+    return [{name: 'NaN' if isinstance(value, float) and math.isnan(value) else value
+             for name, value in row.items()} for row in table.to_pylist()]
+
+
+def malformed_lines(path):
+    """Side output lines, sorted; path is a file or a directory of JSON parts"""
+    paths = [path] if os.path.isfile(path) else [os.path.join(path, name) for name in os.listdir(path)
+                                                 if name.endswith('.json')]
+    lines = []
+    for name in paths:
+        with open(name) as side_output:
+            lines += [json.loads(record)['line'] for record in side_output if record.strip()]
+    return sorted(lines)
+
+
+class EngineRuns:
+    """Batches through one engine into a temporary processed dataset, and the expected results"""
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix='test-engines-')
+        self.edge_csv = os.path.join(self.work_dir, 'edge_cases.csv')
+        with open(self.edge_csv, 'w') as edge_cases:
+            edge_cases.write(EDGE_CASES)
+        self.duplicates_csv = os.path.join(self.work_dir, 'duplicates.csv')
+        with open(self.duplicates_csv, 'w') as duplicates:
+            duplicates.write(DUPLICATES)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def run_batches(self, engine, inputs):
+        output = os.path.join(self.work_dir, f'processed-{engine}')
+        results = []
+        for number, path in enumerate(inputs):
+            malformed = os.path.join(self.work_dir, f'malformed-{engine}-{number}')
+            if engine == 'spark':
+                metrics = run_spark(self.spark, path, output, malformed)
+            else:
+                import ecom_local
+                metrics = ecom_local.run([path], output, malformed)
+            results.append((metrics, malformed_lines(malformed)))
+        return output, results
+
+    def check_sample_products(self, rows, metrics, lines):
+        self.assertEqual(rows.num_rows, 8)
+        self.assertEqual((metrics['InputRows'], metrics['MalformedRows']), (8, 0))
+        self.assertEqual(lines, [])
+
+    def check_edge_cases(self, rows, metrics, lines):
+        self.assertEqual(metrics, {'InputRows': 14, 'OutputRows': 20, 'MalformedRows': 6,
+                                   'CoercedPrices': 1, 'NulledFieldRows': 3})
+        self.assertIn('16,Short,Office,3.50', lines)
+        self.assertIn('13,"Pen ""fine""",Office,1.5,many,2024-02-04', lines)
+        by_id = {row['product_id']: row for row in rows.to_pylist()}
+        self.assertEqual(by_id['4']['category'], 'Office')
+        self.assertEqual(by_id['10']['name'], 'Desk, oak')
+        self.assertEqual(by_id['14']['stock'], 12)
+        self.assertIsNone(by_id['15']['created_date'])
+        # 8 sample products, 11 new ones and the row without a product_id
+        self.assertEqual(rows.num_rows, 20)
+
+    def check_duplicates(self, rows, metrics, lines):
+        self.assertEqual((metrics['InputRows'], metrics['OutputRows'], metrics['MalformedRows']), (8, 3, 2))
+        by_id = {row['product_id']: row for row in rows.to_pylist()}
+        self.assertEqual(rows.num_rows, 3)
+        self.assertEqual((by_id['30']['name'], by_id['30']['category']), ('Kettle v2', 'Appliances'))
+        self.assertEqual((by_id['31']['name'], by_id['31']['price']), ('Toaster v2', 16.0))
+
+
+@unittest.skipUnless(HAVE_ARROW, "needs pyarrow")
+class LocalEngineTest(EngineRuns, unittest.TestCase):
+
+    def run_arrow(self, inputs):
+        from benchmark_engines import read_output
+
+        # pyarrow deprecations (e.g. sort options) fail here first
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', FutureWarning)
+            output, results = self.run_batches('arrow', inputs)
+        return read_output(output), results
+
+    def test_sample_products(self):
+        rows, [(metrics, lines)] = self.run_arrow([SAMPLE_CSV])
+        self.check_sample_products(rows, metrics, lines)
+
+    def test_edge_cases_merged_into_the_sample(self):
+        rows, [_, (metrics, lines)] = self.run_arrow([SAMPLE_CSV, self.edge_csv])
+        self.check_edge_cases(rows, metrics, lines)
+
+    def test_duplicates_in_one_batch(self):
+        rows, [(metrics, lines)] = self.run_arrow([self.duplicates_csv])
+        self.check_duplicates(rows, metrics, lines)
+
+    def test_duplicates_read_in_small_blocks(self):
+        # Rows numbered across batches, with skipped lines in between
+        import ecom_local
+        from benchmark_engines import read_output
+
+        output = os.path.join(self.work_dir, 'processed-blocks')
+        metrics = ecom_local.run([self.duplicates_csv], output, block_size=64)
+        self.check_duplicates(read_output(output), metrics, None)
+
+
+@unittest.skipUnless(HAVE_ENGINES, "needs pyspark, pyarrow and Java")
+class EnginesAgreeTest(EngineRuns, unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.spark = (SparkSession.builder.master('local[1]').appName('test-engines')
+                     .config('spark.sql.session.timeZone', 'UTC')
+                     .config('spark.sql.shuffle.partitions', '4').getOrCreate())
+        cls.spark.sparkContext.setLogLevel('ERROR')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.spark.stop()
+
+    def assert_engines_agree(self, inputs):
+        from benchmark_engines import read_output
+
+        spark_output, spark_results = self.run_batches('spark', inputs)
+        arrow_output, arrow_results = self.run_batches('arrow', inputs)
+        for (spark_metrics, spark_lines), (arrow_metrics, arrow_lines) in zip(spark_results, arrow_results):
+            self.assertEqual(spark_metrics, arrow_metrics)
+            self.assertEqual(spark_lines, arrow_lines)
+        self.maxDiff = None
+        self.assertEqual(comparable_rows(read_output(spark_output)), comparable_rows(read_output(arrow_output)))
+        arrow_rows = read_output(arrow_output)
+        return arrow_rows, arrow_results
+
+    def test_sample_products(self):
+        rows, [(metrics, lines)] = self.assert_engines_agree([SAMPLE_CSV])
+        self.check_sample_products(rows, metrics, lines)
+
+    def test_edge_cases_merged_into_the_sample(self):
+        rows, [_, (metrics, lines)] = self.assert_engines_agree([SAMPLE_CSV, self.edge_csv])
+        self.check_edge_cases(rows, metrics, lines)
+
+    def test_duplicates_in_one_batch(self):
+        rows, [(metrics, lines)] = self.assert_engines_agree([self.duplicates_csv])
+        self.check_duplicates(rows, metrics, lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -17,3 +17,13 @@ output "glue_job_name" {
   description = "Glue ETL job name"
   value       = aws_glue_job.ecom_etl.name
 }
+
+output "processed_table_name" {
+  description = "Glue catalog table for the processed zone"
+  value       = aws_glue_catalog_table.processed_products.name
+}
+
+output "glue_compaction_job_name" {
+  description = "Glue compaction job name"
+  value       = aws_glue_job.ecom_compact.name
+}
@@ -17,3 +17,32 @@ variable "data_bucket_suffix" {
   description = "Suffix for data bucket"
   type        = string
 }
+
+variable "processed_compression" {
+  description = "Parquet codec for the processed zone (snappy or zstd)"
+  type        = string
+  default     = "snappy"
+
+  validation {
+    condition     = contains(["snappy", "zstd"], var.processed_compression)
+    error_message = "processed_compression must be snappy or zstd."
+  }
+}
+
+variable "processed_max_records_per_file" {
+  description = "Maximum rows per processed Parquet file"
+  type        = number
+  default     = 1000000
+}
+
+variable "compaction_target_file_mb" {
+  description = "Target Parquet file size for the compaction job"
+  type        = number
+  default     = 128
+}
+
+variable "compaction_schedule" {
+  description = "When the compaction job runs; keep it clear of ETL runs"
+  type        = string
+  default     = "cron(0 3 * * ? *)"
+}
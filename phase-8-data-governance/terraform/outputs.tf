@@ -17,3 +17,13 @@ output "glue_job_name" {
   description = "Glue ETL job name"
   value       = module.glue.glue_job_name
 }
+
+output "processed_table_name" {
+  description = "Glue catalog table for the processed zone"
+  value       = module.glue.processed_table_name
+}
+
+output "glue_compaction_job_name" {
+  description = "Glue compaction job name"
+  value       = module.glue.glue_compaction_job_name
+}